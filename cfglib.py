@@ -52,6 +52,9 @@ migrate_opts = [
                help='yes - keep ip, no - not keep ip'),
     cfg.StrOpt('speed_limit', default='10MB',
                help='speed limit for glance to glance'),
+    cfg.StrOpt('speed_limit_total', default='-',
+               help='common speed limit for all transfers: glance to glance '
+                    'and ssh pipes (needs pv on controllers), - no limit'),
     cfg.StrOpt('instances', default='key_name-qwerty',
                help='filter instance by parametrs'),
     cfg.StrOpt('file_compression', default='dd',
@@ -64,7 +67,26 @@ migrate_opts = [
     cfg.StrOpt('port', default='9990',
                help='interval ports for ssh tunnel'),
     cfg.BoolOpt('overwrite_user_passwords', default=False,
-                help='Overwrite password for exists users on destination')
+                help='Overwrite password for exists users on destination'),
+    cfg.StrOpt('scheduler_executor', default='process',
+               help='process - run every parallel branch in forked process, '
+                    'thread - run parallel branches in threads of one process'),
+    cfg.IntOpt('scheduler_workers', default=16,
+               help='max number of parallel branches executed at once'),
+    cfg.IntOpt('transfer_workers', default=4,
+               help='max number of volumes transferred at once'),
+    cfg.IntOpt('transfer_per_src_host', default=2,
+               help='max number of transfers from one source host'),
+    cfg.IntOpt('transfer_per_dst_host', default=2,
+               help='max number of transfers to one destination host'),
+    cfg.IntOpt('glance_chunk_size', default=0,
+               help='size of chunks in MB for resumable glance to glance '
+                    'copy, 0 - stream the whole image at once'),
+    cfg.StrOpt('glance_journal_dir', default='/tmp/cloudferry-images',
+               help='local directory for journals of chunked image copies'),
+    cfg.IntOpt('wait_timeout', default=3600,
+               help='seconds to wait for a resource to reach a status, '
+                    '0 - wait indefinitely')
 ]
 
 mail = cfg.OptGroup(name='mail',
@@ -38,7 +38,8 @@ class Cloud(object):
         cloud_config = utils.ext_dict(migrate=utils.ext_dict(),
                                       cloud=utils.ext_dict(),
                                       import_rules=utils.ext_dict(),
-                                      mail=utils.ext_dict())
+                                      mail=utils.ext_dict(),
+                                      mysql=utils.ext_dict())
         for k, v in config.migrate.iteritems():
             cloud_config['migrate'][k] = v
 
@@ -51,6 +52,9 @@ class Cloud(object):
         for k, v in config.mail.iteritems():
             cloud_config['mail'][k] = v
 
+        for k, v in getattr(config, '%s_mysql' % position).iteritems():
+            cloud_config['mysql'][k] = v
+
         return cloud_config
 
     @staticmethod
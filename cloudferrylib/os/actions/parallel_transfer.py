@@ -0,0 +1,94 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+from cloudferrylib.scheduler.dispatcher import Dispatcher
+from cloudferrylib.scheduler.executor import get_executor, PROCESS
+from cloudferrylib.utils import bandwidth
+from cloudferrylib.utils import utils
+
+LOG = utils.get_log(__name__)
+
+__author__ = 'mirrorcoder'
+
+
+class ParallelTransfer(object):
+
+    """
+        Runs transfer_* functions for several volumes at once.
+        Every transfer is a forked process (fabric env is global),
+        at most cfg.transfer_workers of them run together and at most
+        cfg.transfer_per_src_host/transfer_per_dst_host per host.
+        Tunnel ports are reserved here, in the parent, from the range
+        of up_ssh_tunnel: forked children don't see each other's ports.
+        A port is taken when the transfer starts and freed when it ends,
+        so only running transfers hold ports.
+        With a bandwidth manager every transfer reserves 1/transfer_workers
+        of the budget when it starts, the rate is given to the transfer
+        function as speed_limit for the throttling stage of its pipe.
+
+            transfer = ParallelTransfer(cfg.migrate)
+            transfer.add(utils.transfer_file_to_file, host_src, host_dst, True, *args)
+            transfer.join()
+    """
+
+    def __init__(self, cfg_migrate):
+        self.workers = cfg_migrate.transfer_workers
+        self.dispatcher = Dispatcher(get_executor(PROCESS, self.workers),
+                                     {'src': cfg_migrate.transfer_per_src_host,
+                                      'dst': cfg_migrate.transfer_per_dst_host},
+                                     self.__start)
+        self.transfers = []
+
+    def add(self, func, host_src, host_dst, use_tunnel, *args, **kwargs):
+        future = self.dispatcher.submit(func, {'src': host_src, 'dst': host_dst, 'tunnel': use_tunnel},
+                                        *args, **kwargs)
+        self.transfers.append((host_src, host_dst, future))
+        return future
+
+    def __start(self, keys, kwargs):
+        port = None
+        if keys['tunnel']:
+            port = utils.up_ssh_tunnel.get_free_port()
+            kwargs['port'] = port
+        try:
+            close_stream = self.__reserve_bandwidth(keys, kwargs)
+        except BaseException:
+            if port:
+                utils.up_ssh_tunnel.free_port(port)
+            raise
+
+        def on_done():
+            if close_stream:
+                close_stream()
+            if port:
+                utils.up_ssh_tunnel.free_port(port)
+        return on_done
+
+    def __reserve_bandwidth(self, keys, kwargs):
+        manager = bandwidth.get_manager()
+        if not manager:
+            return None
+        stream = manager.reserve("%s -> %s" % (keys['src'], keys['dst']),
+                                 1.0 / self.workers)
+        kwargs['speed_limit'] = stream.rate
+        return stream.close
+
+    def join(self):
+        self.dispatcher.join([t[2] for t in self.transfers])
+        failed = [t for t in self.transfers if t[2].exception() or t[2].result()]
+        for host_src, host_dst, future in failed:
+            LOG.error("Transfer %s -> %s failed", host_src, host_dst)
+        self.transfers = []
+        if failed:
+            raise RuntimeError("%s transfers failed" % len(failed))
@@ -14,6 +14,7 @@
 
 from cloudferrylib.base.action import transporter
 from cloudferrylib.os.actions import utils
+from cloudferrylib.os.actions.parallel_transfer import ParallelTransfer
 from cloudferrylib.utils import utils as utl
 __author__ = 'mirrorcoder'
 
@@ -28,14 +29,20 @@ class TransportCephToCephViaSsh(transporter.Transporter):
             resource_name=utl.VOLUMES_TYPE,
             resource_root_name=utl.VOLUME_BODY, **kwargs):
         data_for_trans = info[resource_type][resource_name]
+        transfer = ParallelTransfer(cfg.migrate)
         for item in data_for_trans:
             i = item[resource_root_name]
             path_src = i['path_src']
             path_dst = i['path_dst']
-            utils.transfer_from_ceph_to_ceph(cloud_src,
-                                             cloud_dst,
-                                             path_src.split("/")[0],
-                                             path_src.split("/")[1],
-                                             path_dst.split("/")[0],
-                                             path_dst.split("/")[1])
+            transfer.add(utils.transfer_from_ceph_to_ceph,
+                         cloud_src.getIpSsh(),
+                         cloud_dst.getIpSsh(),
+                         False,
+                         cloud_src,
+                         cloud_dst,
+                         path_src.split("/")[0],
+                         path_src.split("/")[1],
+                         path_dst.split("/")[0],
+                         path_dst.split("/")[1])
+        transfer.join()
         return {}
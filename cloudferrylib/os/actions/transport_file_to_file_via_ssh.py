@@ -14,6 +14,7 @@
 
 from cloudferrylib.base.action import transporter
 from cloudferrylib.os.actions import utils
+from cloudferrylib.os.actions.parallel_transfer import ParallelTransfer
 from cloudferrylib.utils import utils as utl
 __author__ = 'mirrorcoder'
 
@@ -28,11 +29,14 @@ class TransportFileToFileViaSsh(transporter.Transporter):
             resource_name=utl.VOLUMES_TYPE,
             resource_root_name=utl.VOLUME_BODY, **kwargs):
         data_for_trans = info[resource_type][resource_name]
+        transfer = ParallelTransfer(cfg.migrate)
         for item in data_for_trans:
             i = item[resource_root_name]
             host_src = i['host_src']
             host_dst = i['host_dst']
             path_src = i['path_src']
             path_dst = i['path_dst']
-            utils.transfer_file_to_file(cloud_src, cloud_dst, host_src, host_dst, path_src, path_dst, cfg.migrate)
+            transfer.add(utils.transfer_file_to_file, host_src, host_dst, True,
+                         cloud_src, cloud_dst, host_src, host_dst, path_src, path_dst, cfg.migrate)
+        transfer.join()
         return {}
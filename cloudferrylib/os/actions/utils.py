@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+from cloudferrylib.utils import bandwidth
 from cloudferrylib.utils import utils
 from fabric.api import run, settings, env
 import copy
@@ -21,22 +22,23 @@ LOG = utils.get_log(__name__)
 __author__ = 'mirrorcoder'
 
 
-def transfer_file_to_file(cloud_src, cloud_dst, host_src, host_dst, path_src, path_dst, cfg_migrate):
+def transfer_file_to_file(cloud_src, cloud_dst, host_src, host_dst, path_src, path_dst, cfg_migrate, port=None,
+                          speed_limit=None):
     LOG.debug("| | copy file")
     ssh_ip_src = cloud_src.getIpSsh()
     ssh_ip_dst = cloud_dst.getIpSsh()
     with settings(host_string=ssh_ip_src):
         with utils.forward_agent(cfg_migrate.key_filename):
-            with utils.up_ssh_tunnel(host_dst, ssh_ip_dst) as port:
+            with utils.up_ssh_tunnel(host_dst, ssh_ip_dst, port=port) as port:
                 if cfg_migrate.file_compression == "dd":
-                    run(("ssh -oStrictHostKeyChecking=no %s 'dd bs=1M if=%s' " +
-                         "| ssh -oStrictHostKeyChecking=no -p %s localhost 'dd bs=1M of=%s'") %
-                        (host_src, path_src, port, path_dst))
+                    run(("ssh -oStrictHostKeyChecking=no %s 'dd bs=1M if=%s' | %s" +
+                         "ssh -oStrictHostKeyChecking=no -p %s localhost 'dd bs=1M of=%s'") %
+                        (host_src, path_src, bandwidth.throttle_stage(speed_limit), port, path_dst))
                 elif cfg_migrate.file_compression == "gzip":
-                    run(("ssh -oStrictHostKeyChecking=no %s 'gzip -%s -c %s' " +
-                         "| ssh -oStrictHostKeyChecking=no -p %s localhost 'gunzip | dd bs=1M of=%s'") %
+                    run(("ssh -oStrictHostKeyChecking=no %s 'gzip -%s -c %s' | %s" +
+                         "ssh -oStrictHostKeyChecking=no -p %s localhost 'gunzip | dd bs=1M of=%s'") %
                         (host_src, cfg_migrate.level_compression,
-                         path_src, port, path_dst))
+                         path_src, bandwidth.throttle_stage(speed_limit), port, path_dst))
 
 
 def transfer_from_ceph_to_iscsi(cloud_src,
@@ -44,14 +46,17 @@ def transfer_from_ceph_to_iscsi(cloud_src,
                                 dst_host,
                                 dst_path,
                                 ceph_pool_src="volumes",
-                                name_file_src="volume-"):
+                                name_file_src="volume-",
+                                port=None,
+                                speed_limit=None):
     ssh_ip_src = cloud_src.getIpSsh()
     ssh_ip_dst = cloud_dst.getIpSsh()
     with settings(host_string=ssh_ip_src):
         with utils.forward_agent(env.key_filename):
-            with utils.up_ssh_tunnel(dst_host, ssh_ip_dst) as port:
-                run(("rbd export -p %s %s - | ssh -oStrictHostKeyChecking=no -p %s localhost " +
-                     "'dd bs=1M of=%s'") % (ceph_pool_src, name_file_src, port, dst_path))
+            with utils.up_ssh_tunnel(dst_host, ssh_ip_dst, port=port) as port:
+                run(("rbd export -p %s %s - | %sssh -oStrictHostKeyChecking=no -p %s localhost " +
+                     "'dd bs=1M of=%s'") % (ceph_pool_src, name_file_src,
+                                            bandwidth.throttle_stage(speed_limit), port, dst_path))
 
 
 def transfer_from_iscsi_to_ceph(cloud_src,
@@ -59,15 +64,17 @@ def transfer_from_iscsi_to_ceph(cloud_src,
                                 host_src,
                                 source_volume_path,
                                 ceph_pool_dst="volumes",
-                                name_file_dst="volume-"):
+                                name_file_dst="volume-",
+                                speed_limit=None):
     ssh_ip_src = cloud_src.getIpSsh()
     ssh_ip_dst = cloud_dst.getIpSsh()
     delete_file_from_rbd(ssh_ip_dst, ceph_pool_dst, name_file_dst)
     with settings(host_string=ssh_ip_src):
         with utils.forward_agent(env.key_filename):
-            run(("ssh -oStrictHostKeyChecking=no %s 'dd bs=1M if=%s' | " +
+            run(("ssh -oStrictHostKeyChecking=no %s 'dd bs=1M if=%s' | %s" +
                 "ssh -oStrictHostKeyChecking=no %s 'rbd import --image-format=2 - %s/%s'") %
-                (host_src, source_volume_path, ssh_ip_dst, ceph_pool_dst, name_file_dst))
+                (host_src, source_volume_path, bandwidth.throttle_stage(speed_limit),
+                 ssh_ip_dst, ceph_pool_dst, name_file_dst))
 
 
 def transfer_from_ceph_to_ceph(cloud_src,
@@ -75,15 +82,17 @@ def transfer_from_ceph_to_ceph(cloud_src,
                                ceph_pool_src="volumes",
                                name_file_src="volume-",
                                ceph_pool_dst="volumes",
-                               name_file_dst="volume-"):
+                               name_file_dst="volume-",
+                               speed_limit=None):
     ssh_ip_src = cloud_src.getIpSsh()
     ssh_ip_dst = cloud_dst.getIpSsh()
     delete_file_from_rbd(ssh_ip_dst, ceph_pool_dst, name_file_dst)
     with settings(host_string=ssh_ip_src):
         with utils.forward_agent(env.key_filename):
-            run(("rbd export -p %s volume-%s - | " +
+            run(("rbd export -p %s volume-%s - | %s" +
                  "ssh -oStrictHostKeyChecking=no %s 'rbd import --image-format=2 - %s/%s'") %
-                (ceph_pool_src, name_file_src, ssh_ip_dst, ceph_pool_dst, name_file_dst))
+                (ceph_pool_src, name_file_src, bandwidth.throttle_stage(speed_limit),
+                 ssh_ip_dst, ceph_pool_dst, name_file_dst))
 
 
 def delete_file_from_rbd(ssh_ip, ceph_pool, name_file):
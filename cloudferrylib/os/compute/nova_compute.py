@@ -12,12 +12,10 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
-
-import time
-
 from novaclient.v1_1 import client as nova_client
 
 from cloudferrylib.base import compute
+from cloudferrylib.utils import waiter
 from utils.utils import get_libvirt_block_info
 
 
@@ -117,9 +115,7 @@ class NovaCompute(compute.Compute):
         self.nova_client.flavors.delete(flavor_id)
 
     def wait_for_status(self, getter, id, status):
-        # FIXME(toha) What if it is infinite loop here?
-        while getter.get(id).status != status:
-            time.sleep(1)
+        waiter.wait_for_status(getter, id, status)
 
     def get_status(self, getter, id):
         return getter.get(id).status
@@ -12,11 +12,18 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+
 from cloudferrylib.base import identity
+from cloudferrylib.scheduler.executor import ThreadPoolExecutor
+from cloudferrylib.utils.catalog import Catalog
 from keystoneclient.v2_0 import client as keystone_client
-from utils import Postman, Templater, GeneratorPassword
+from utils import Postman, Templater, GeneratorPassword, get_log
 
 NOVA_SERVICE = 'nova'
+ROLES_SCAN_WORKERS = 16
+
+LOG = get_log(__name__)
 
 
 class KeystoneIdentity(identity.Identity):
@@ -26,6 +33,13 @@ class KeystoneIdentity(identity.Identity):
         super(KeystoneIdentity, self).__init__()
         self.config = config
         self.keystone_client = self.get_client()
+        self.tenants = Catalog(lambda: self.keystone_client.tenants.list())
+        self.users = Catalog(lambda: self.keystone_client.users.list())
+        self.roles = Catalog(lambda: self.keystone_client.roles.list())
+        self.services = Catalog(lambda: self.keystone_client.services.list(),
+                                ('id', 'name', 'type'))
+        self.endpoints = Catalog(
+            lambda: self.keystone_client.endpoints.list(), ('service_id',))
         self.mysql_connector = mysql_connector
         self.postman = None
         if self.config['mail']:
@@ -97,27 +111,30 @@ class KeystoneIdentity(identity.Identity):
             token=ks_client_for_token.auth_ref['token']['id'],
             endpoint="http://" + self.config['cloud']['host'] + ":35357/v2.0/")
 
+    def invalidate(self):
+        """ Drop cached tenants, users, roles, services and endpoints. """
+
+        for catalog in (self.tenants, self.users, self.roles,
+                        self.services, self.endpoints):
+            catalog.invalidate()
+
     def get_service_name_by_type(self, service_type):
         """Getting service_name from keystone. """
 
-        for service in self.get_services_list():
-            if service.type == service_type:
-                return service.name
-        return NOVA_SERVICE
+        service = self.services.get('type', service_type)
+        return service.name if service else NOVA_SERVICE
 
     def get_public_endpoint_service_by_id(self, service_id):
         """Getting endpoint public URL from keystone. """
 
-        for endpoint in self.keystone_client.endpoints.list():
-            if endpoint.service_id == service_id:
-                return endpoint.publicurl
+        endpoint = self.endpoints.get('service_id', service_id)
+        return endpoint.publicurl if endpoint else None
 
     def get_service_id(self, service_name):
         """Getting service_id from keystone. """
 
-        for service in self.get_services_list():
-            if service.name == service_name:
-                return service.id
+        service = self.services.get('name', service_name)
+        return service.id if service else None
 
     def get_endpoint_by_service_name(self, service_name):
         """ Getting endpoint public URL by service name from keystone. """
@@ -126,25 +143,20 @@ class KeystoneIdentity(identity.Identity):
         return self.get_public_endpoint_service_by_id(service_id)
 
     def get_tenants_func(self):
-        tenants = {tenant.id: tenant.name for tenant in self.get_tenants_list()}
-
         def func(tenant_id):
-            return getattr(tenants, tenant_id, 'admin')
+            tenant = self.tenants.get('id', tenant_id)
+            return tenant.name if tenant else 'admin'
 
         return func
 
     def get_tenant_id_by_name(self, name):
-        for tenant in self.get_tenants_list():
-            if tenant.name == name:
-                return tenant.id
-        return None
+        tenant = self.tenants.get('name', name)
+        return tenant.id if tenant else None
 
     def get_tenant_by_name(self, tenant_name):
         """ Getting tenant by name from keystone. """
 
-        for tenant in self.get_tenants_list():
-            if tenant.name == tenant_name:
-                return tenant
+        return self.tenants.get('name', tenant_name)
 
     def get_tenant_by_id(self, tenant_id):
         """ Getting tenant by id from keystone. """
@@ -154,22 +166,22 @@ class KeystoneIdentity(identity.Identity):
     def get_services_list(self):
         """ Getting list of available services from keystone. """
 
-        return self.keystone_client.services.list()
+        return self.services.list()
 
     def get_tenants_list(self):
         """ Getting list of tenants from keystone. """
 
-        return self.keystone_client.tenants.list()
+        return self.tenants.list()
 
     def get_users_list(self):
         """ Getting list of users from keystone. """
 
-        return self.keystone_client.users.list()
+        return self.users.list()
 
     def get_roles_list(self):
         """ Getting list of available roles from keystone. """
 
-        return self.keystone_client.roles.list()
+        return self.roles.list()
 
     def roles_for_user(self, user_id, tenant_id):
         """ Getting list of user roles for tenant """
@@ -179,29 +191,32 @@ class KeystoneIdentity(identity.Identity):
     def create_role(self, role_name):
         """ Create new role in keystone. """
 
-        return self.keystone_client.roles.create(role_name)
+        return self.roles.add(self.keystone_client.roles.create(role_name))
 
     def create_tenant(self, tenant_name, description=None, enabled=True):
         """ Create new tenant in keystone. """
 
-        return self.keystone_client.tenants.create(tenant_name=tenant_name,
-                                                   description=description,
-                                                   enabled=enabled)
+        return self.tenants.add(
+            self.keystone_client.tenants.create(tenant_name=tenant_name,
+                                                description=description,
+                                                enabled=enabled))
 
     def create_user(self, name, password=None, email=None, tenant_id=None,
                     enabled=True):
         """ Create new user in keystone. """
 
-        return self.keystone_client.users.create(name=name,
-                                                 password=password,
-                                                 email=email,
-                                                 tenant_id=tenant_id,
-                                                 enabled=enabled)
+        return self.users.add(
+            self.keystone_client.users.create(name=name,
+                                              password=password,
+                                              email=email,
+                                              tenant_id=tenant_id,
+                                              enabled=enabled))
 
     def update_tenant(self, tenant_id, tenant_name=None, description=None,
                       enabled=None):
         """Update a tenant with a new name and description."""
 
+        self.tenants.invalidate()
         return self.keystone_client.tenants.update(tenant_id,
                                                    tenant_name=tenant_name,
                                                    description=description,
@@ -213,6 +228,7 @@ class KeystoneIdentity(identity.Identity):
         Supported arguments include ``name``, ``email``, and ``enabled``.
         """
 
+        self.users.invalidate()
         return self.keystone_client.users.update(user, **kwargs)
 
     def get_auth_token_from_user(self):
@@ -278,38 +294,89 @@ class KeystoneIdentity(identity.Identity):
 
     def _get_user_passwords(self):
         info = {}
-        for user in self.get_users_list():
-            for password in self.mysql_connector.execute(
-                    "SELECT password FROM user WHERE id = :user_id",
-                    user_id=user.id):
-                info[user.name] = password[0]
+        users = self.get_users_list()
+        for user_id, password in self.mysql_connector.select_in(
+                "SELECT id, password FROM user WHERE id IN ({ids})",
+                [user.id for user in users]):
+            user = self.users.get('id', user_id)
+            if user:
+                info[user.name] = password
 
         return info
 
     def _get_user_tenants_roles(self):
+        """ Sparse map user name -> tenant name -> roles of the user. """
+
         user_tenants_roles = {}
-        tenants = self.get_tenants_list()
-        for user in self.get_users_list():
-            user_tenants_roles[user.name] = {}
-            for tenant in tenants:
-                roles = []
-                for role in self.roles_for_user(user.id, tenant.id):
-                    roles.append({'role': {'name': role.name, 'id': role.id}})
-                user_tenants_roles[user.name][tenant.name] = roles
+        for user_id, tenant_id, role_id in self._get_roles_assignments():
+            user = self.users.get('id', user_id)
+            tenant = self.tenants.get('id', tenant_id)
+            role = self.roles.get('id', role_id)
+            if not (user and tenant and role):
+                continue
+            roles = user_tenants_roles.setdefault(user.name, {}).setdefault(
+                tenant.name, [])
+            roles.append({'role': {'name': role.name, 'id': role.id}})
         return user_tenants_roles
 
+    def _get_roles_assignments(self):
+        """ All (user_id, tenant_id, role_id) role assignments. """
+
+        if self.mysql_connector:
+            for reader in (self._read_assignments_from_db,
+                           self._read_metadata_from_db):
+                try:
+                    return reader()
+                except Exception as e:
+                    LOG.warning("Can't read role assignments from db: %s", e)
+        return self._read_assignments_from_api()
+
+    def _read_assignments_from_db(self):
+        return [(row[0], row[1], row[2]) for row in self.mysql_connector.execute(
+            "SELECT actor_id, target_id, role_id FROM assignment "
+            "WHERE type = 'UserProject'")]
+
+    def _read_metadata_from_db(self):
+        # keystone before icehouse keeps roles of a user in a tenant as json
+        assignments = []
+        for user_id, tenant_id, data in self.mysql_connector.execute(
+                "SELECT user_id, project_id, data FROM user_project_metadata"):
+            for role in json.loads(data).get('roles', []):
+                role_id = role['id'] if isinstance(role, dict) else role
+                assignments.append((user_id, tenant_id, role_id))
+        return assignments
+
+    def _read_assignments_from_api(self):
+        """
+            Members of every tenant are listed first, so roles are asked
+            only for real (user, tenant) pairs, both steps in threads.
+        """
+
+        executor = ThreadPoolExecutor(ROLES_SCAN_WORKERS)
+        tenants = self.get_tenants_list()
+        members = executor.map(
+            lambda tenant: self.keystone_client.users.list(tenant_id=tenant.id),
+            tenants)
+        pairs = [(user.id, tenant.id)
+                 for tenant, users in zip(tenants, members) for user in users]
+        roles = executor.map(lambda pair: self.roles_for_user(*pair), pairs)
+        executor.shutdown()
+        return [(user_id, tenant_id, role.id)
+                for (user_id, tenant_id), user_roles in zip(pairs, roles)
+                for role in user_roles]
+
     def _upload_user_passwords(self, users, user_passwords):
-        for _user in users:
-            user = _user['user']
-            if not _user['meta']['overwrite_password']:
-                continue
-            self.mysql_connector.execute(
-                "UPDATE user SET password = :password WHERE id = :user_id",
-                user_id=_user['meta']['new_id'],
-                password=user_passwords[user['name']])
+        self.mysql_connector.execute_many(
+            "UPDATE user SET password = :password WHERE id = :user_id",
+            [{'user_id': _user['meta']['new_id'],
+              'password': user_passwords[_user['user']['name']]}
+             for _user in users if _user['meta']['overwrite_password']])
 
     def _upload_user_tenant_roles(self, user_tenants_roles, users, tenants):
         roles_id = {role.name: role.id for role in self.get_roles_list()}
+        tenants_id = {tenant['tenant']['name']: tenant['meta']['new_id']
+                      for tenant in tenants}
+        exists_roles = set(self._get_roles_assignments())
 
         for _user in users:
             user = _user['user']
@@ -317,18 +384,19 @@ class KeystoneIdentity(identity.Identity):
             # to change self role without logout
             if user['name'] == self.keystone_client.username:
                 continue
-            for _tenant in tenants:
-                tenant = _tenant['tenant']
-                exists_roles = [role.name for role in
-                                self.roles_for_user(_user['meta']['new_id'],
-                                                    _tenant['meta']['new_id'])]
-                for _role in user_tenants_roles[user['name']][tenant['name']]:
-                    role = _role['role']
-                    if role['name'] in exists_roles:
+            user_id = _user['meta']['new_id']
+            for tenant_name, _roles in user_tenants_roles.get(
+                    user['name'], {}).iteritems():
+                if tenant_name not in tenants_id:
+                    continue
+                tenant_id = tenants_id[tenant_name]
+                for _role in _roles:
+                    role_id = roles_id[_role['role']['name']]
+                    if (user_id, tenant_id, role_id) in exists_roles:
                         continue
                     self.keystone_client.roles.add_user_role(
-                        _user['meta']['new_id'], roles_id[role['name']],
-                        _tenant['meta']['new_id'])
+                        user_id, role_id, tenant_id)
+                    exists_roles.add((user_id, tenant_id, role_id))
 
     def _generate_password(self):
         return self.generator.get_random_password()
@@ -14,13 +14,16 @@
 
 
 import json
-import time
 
 from fabric.api import run
 from fabric.api import settings
 
 from cloudferrylib.base import image
+from cloudferrylib.utils.catalog import Catalog
+from cloudferrylib.utils import waiter
+from glanceclient import exc as glance_exc
 from glanceclient.v1 import client as glance_client
+from migrationlib.os.utils import ChunkedTransfer
 from migrationlib.os.utils import FileLikeProxy
 
 
@@ -28,6 +31,8 @@ class GlanceImage(image.Image):
 
     """
     The main class for working with Openstack Glance Image Service.
+    Listing of images is read once into a catalog indexed by id, name
+    and checksum, images created and deleted here update it.
 
     """
     def __init__(self, config, identity_client):
@@ -35,6 +40,8 @@ class GlanceImage(image.Image):
         self.host = config.cloud.host
         self.identity_client = identity_client
         self.glance_client = self.get_glance_client()
+        self.images = Catalog(lambda: self.glance_client.images.list(),
+                              ('id', 'name', 'checksum'))
         super(GlanceImage, self).__init__()
 
     def get_glance_client(self):
@@ -48,30 +55,33 @@ class GlanceImage(image.Image):
             token=self.identity_client.get_auth_token_from_user())
 
     def get_image_list(self):
-        return self.glance_client.images.list()
+        return self.images.list()
 
     def create_image(self, **kwargs):
-        return self.glance_client.images.create(**kwargs)
+        return self.images.add(self.glance_client.images.create(**kwargs))
 
     def delete_image(self, image_id):
         self.glance_client.images.delete(image_id)
+        self.images.remove('id', image_id)
 
     def get_image_by_id(self, image_id):
-        for glance_image in self.get_image_list():
-            if glance_image.id == image_id:
-                return glance_image
+        try:
+            glance_image = self.glance_client.images.get(image_id)
+        except glance_exc.HTTPNotFound:
+            return None
+        if glance_image.status != 'deleted':
+            return glance_image
 
     def get_image_by_name(self, image_name):
-        for glance_image in self.get_image_list():
-            if glance_image.name == image_name:
-                return glance_image
+        return self.images.get('name', image_name)
+
+    def get_image_by_checksum(self, checksum):
+        return self.images.get('checksum', checksum)
 
     def get_image(self, im):
         """ Get image by id or name. """
 
-        for glance_image in self.get_image_list():
-            if im in (glance_image.name, glance_image.id):
-                return glance_image
+        return self.images.get('id', im) or self.images.get('name', im)
 
     def get_image_status(self, image_id):
         return self.get_image_by_id(image_id).status
@@ -79,6 +89,12 @@ class GlanceImage(image.Image):
     def get_ref_image(self, image_id):
         return self.glance_client.images.data(image_id)._resp
 
+    def get_ref_image_range(self, image_id, start, end):
+        resp, body = self.glance_client.images.api.raw_request(
+            'GET', '/v1/images/%s' % image_id,
+            headers={'Range': 'bytes=%s-%s' % (start, end)})
+        return body._resp
+
     def get_image_checksum(self, image_id):
         return self.get_image_by_id(image_id).checksum
 
@@ -138,10 +154,18 @@ class GlanceImage(image.Image):
     def deploy(self, info):
         migrate_images_list = []
         for gl_image in info['image']['images'].itervalues():
-            if gl_image['image']['checksum'] in [x.checksum for x in
-                                                 self.get_image_list()]:
+            if self.get_image_by_checksum(gl_image['image']['checksum']):
                 continue
             gl_image['image']['resource_src'] = info['image']['resource']
+            transfer = self.get_chunked_transfer(gl_image['image'])
+            if transfer:
+                data = transfer.proxy(FileLikeProxy.callback_print_progress,
+                                      self.config['migrate']['speed_limit'])
+            else:
+                data = FileLikeProxy.FileLikeProxy(
+                    gl_image['image'],
+                    FileLikeProxy.callback_print_progress,
+                    self.config['migrate']['speed_limit'])
             migrate_image = self.create_image(
                 name=gl_image['image']['name'] + 'Migrate',
                 container_format=gl_image['image']['container_format'],
@@ -149,10 +173,9 @@ class GlanceImage(image.Image):
                 is_public=gl_image['image']['is_public'],
                 protected=gl_image['image']['protected'],
                 size=gl_image['image']['size'],
-                data=FileLikeProxy.FileLikeProxy(
-                    gl_image['image'],
-                    FileLikeProxy.callback_print_progress,
-                    self.config['migrate']['speed_limit']))
+                data=data)
+            if transfer:
+                transfer.cleanup()
 
             migrate_images_list.append(migrate_image)
 
@@ -163,9 +186,23 @@ class GlanceImage(image.Image):
 
         return {}
 
+    def get_chunked_transfer(self, gl_image):
+
+        """ Resumable transfer of the image if chunked mode is enabled. """
+
+        chunk_size = self.config['migrate']['glance_chunk_size']
+        if not chunk_size or not gl_image['size']:
+            return None
+        resource_src = gl_image['resource_src']
+        return ChunkedTransfer.ChunkedImageTransfer(
+            lambda start, end: resource_src.get_ref_image_range(
+                gl_image['id'], start, end),
+            gl_image,
+            self.config['migrate']['glance_journal_dir'],
+            chunk_size * 1024 * 1024)
+
     def wait_for_status(self, id_res, status):
-        while self.glance_client.images.get(id_res).status != status:
-            time.sleep(1)
+        waiter.wait_for_status(self.glance_client.images, id_res, status)
 
     @staticmethod
     def patch_image(backend_storage, cloud, image_id):
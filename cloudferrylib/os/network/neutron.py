@@ -12,7 +12,13 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+import contextlib
+
 from cloudferrylib.base import network
+from cloudferrylib.os.network.port_index import PortIndex
+from cloudferrylib.os.network.resource_index import ResourceIndex
+from cloudferrylib.os.network.resource_index import as_resource_index
+from cloudferrylib.utils.fingerprint import fingerprint
 from neutronclient.v2_0 import client as neutron_client
 from neutronclient.common.exceptions import IpAddressGenerationFailureClient
 from utils import get_log
@@ -24,7 +30,9 @@ DEFAULT_SECGR = 'default'
 class NeutronNetwork(network.Network):
 
     """
-    The main class for working with Openstack neutron client
+    The main class for working with Openstack neutron client.
+    Inside cached_listings() every collection is listed from the API once,
+    resources are joined in memory by id.
     """
 
     def __init__(self, config, identity_client):
@@ -32,6 +40,7 @@ class NeutronNetwork(network.Network):
         self.identity_client = identity_client
         # TODO: implement switch to quantumclient if we have quantum-server
         self.neutron_client = self.get_client()
+        self.listings = None
         super(NeutronNetwork, self).__init__()
 
     def get_client(self):
@@ -46,15 +55,43 @@ class NeutronNetwork(network.Network):
         """Get info about neutron resources:
         :rtype: Dictionary with all necessary neutron info
         """
-        info = {'network': {'resource': self,
-                            'networks': self.get_networks(),
-                            'subnets': self.get_subnets(),
-                            'routers': self.get_routers(),
-                            'floating_ips': self.get_floatingips(),
-                            'security_groups': self.get_security_groups(),
-                            'meta': {}}}
+        with self.cached_listings():
+            info = {'network': {'resource': self,
+                                'networks': self.get_networks(),
+                                'subnets': self.get_subnets(),
+                                'routers': self.get_routers(),
+                                'floating_ips': self.get_floatingips(),
+                                'security_groups': self.get_security_groups(),
+                                'meta': {}}}
         return info
 
+    @contextlib.contextmanager
+    def cached_listings(self):
+        self.listings = {}
+        try:
+            yield
+        finally:
+            self.listings = None
+
+    def list_resources(self, resources):
+
+        """ List of resources ('networks', 'subnets', ...), read once
+        inside cached_listings(). """
+
+        if self.listings is not None and resources in self.listings:
+            return self.listings[resources]
+        listing = getattr(self.neutron_client,
+                          'list_' + resources)()[resources]
+        if self.listings is not None:
+            self.listings[resources] = listing
+        return listing
+
+    def index_resources(self, resources):
+        return dict((res['id'], res) for res in self.list_resources(resources))
+
+    def get_port_index(self):
+        return PortIndex(lambda: self.list_resources('ports'))
+
     def deploy(self, info):
         self.upload_networks(info['networks'])
         self.upload_subnets(info['networks'], info['subnets'])
@@ -64,7 +101,8 @@ class NeutronNetwork(network.Network):
         self.upload_sec_group_rules(info['security_groups'])
 
     def get_networks(self):
-        networks = self.neutron_client.list_networks()['networks']
+        networks = self.list_resources('networks')
+        subnets = self.index_resources('subnets')
         get_tenant_name = self.identity_client.get_tenants_func()
         networks_info = []
         for network in networks:
@@ -77,8 +115,7 @@ class NeutronNetwork(network.Network):
             net_info['tenant_name'] = get_tenant_name(network['tenant_id'])
             net_info['subnet_names'] = list()
             for snet in network['subnets']:
-                name = self.neutron_client.show_subnet(snet)['subnet']['name']
-                net_info['subnet_names'].append(name)
+                net_info['subnet_names'].append(subnets[snet]['name'])
             net_info['router:external'] = network['router:external']
             net_info['provider:physical_network'] = \
                 network['provider:physical_network']
@@ -101,7 +138,8 @@ class NeutronNetwork(network.Network):
         return networks_info
 
     def get_subnets(self):
-        subnets = self.neutron_client.list_subnets()['subnets']
+        subnets = self.list_resources('subnets')
+        networks = self.index_resources('networks')
         get_tenant_name = self.identity_client.get_tenants_func()
         subnets_info = []
         for snet in subnets:
@@ -113,8 +151,8 @@ class NeutronNetwork(network.Network):
             snet_info['gateway_ip'] = snet['gateway_ip']
             snet_info['ip_version'] = snet['ip_version']
             snet_info['cidr'] = snet['cidr']
-            net = self.neutron_client.show_network(snet['network_id'])
-            snet_info['network_name'] = net['network']['name']
+            net = networks[snet['network_id']]
+            snet_info['network_name'] = net['name']
             snet_info['network_id'] = snet['network_id']
             snet_info['tenant_name'] = get_tenant_name(snet['tenant_id'])
             snet_info['res_hash'] = self.get_resource_hash(snet_info,
@@ -129,7 +167,9 @@ class NeutronNetwork(network.Network):
         return subnets_info
 
     def get_routers(self):
-        routers = self.neutron_client.list_routers()['routers']
+        routers = self.list_resources('routers')
+        networks = self.index_resources('networks')
+        ports = self.get_port_index()
         get_tenant_name = self.identity_client.get_tenants_func()
         routers_info = []
         for router in routers:
@@ -142,7 +182,7 @@ class NeutronNetwork(network.Network):
                 router['external_gateway_info']
             if router['external_gateway_info']:
                 ext_id = router['external_gateway_info']['network_id']
-                ext_net = self.neutron_client.show_network(ext_id)['network']
+                ext_net = networks[ext_id]
                 rinfo['ext_net_name'] = ext_net['name']
                 rinfo['ext_net_tenant_name'] = \
                     get_tenant_name(ext_net['tenant_id'])
@@ -153,12 +193,11 @@ class NeutronNetwork(network.Network):
             # we can't exactly determine a router
             rinfo['ips'] = list()
             rinfo['subnet_ids'] = list()
-            for port in self.neutron_client.list_ports()['ports']:
-                if port['device_id'] == router['id']:
-                    for ip_info in port['fixed_ips']:
-                        rinfo['ips'].append(ip_info['ip_address'])
-                        if ip_info['subnet_id'] not in rinfo['subnet_ids']:
-                            rinfo['subnet_ids'].append(ip_info['subnet_id'])
+            for port in ports.by_device(router['id']):
+                for ip_info in port['fixed_ips']:
+                    rinfo['ips'].append(ip_info['ip_address'])
+                    if ip_info['subnet_id'] not in rinfo['subnet_ids']:
+                        rinfo['subnet_ids'].append(ip_info['subnet_id'])
             rinfo['res_hash'] = self.get_resource_hash(rinfo,
                                                        'name',
                                                        'routes',
@@ -169,14 +208,14 @@ class NeutronNetwork(network.Network):
         return routers_info
 
     def get_floatingips(self):
-        floatings = self.neutron_client.list_floatingips()['floatingips']
+        floatings = self.list_resources('floatingips')
+        networks = self.index_resources('networks')
         get_tenant_name = self.identity_client.get_tenants_func()
         floatingips_info = []
         for floating in floatings:
             floatingip_info = dict()
             ext_id = floating['floating_network_id']
-            extnet = \
-                self.neutron_client.show_network(ext_id)['network']
+            extnet = networks[ext_id]
             floatingip_info['id'] = floating['id']
             floatingip_info['floating_network_id'] = ext_id
             floatingip_info['network_name'] = extnet['name']
@@ -192,7 +231,7 @@ class NeutronNetwork(network.Network):
         return floatingips_info
 
     def get_security_groups(self):
-        sec_grs = self.neutron_client.list_security_groups()['security_groups']
+        sec_grs = self.list_resources('security_groups')
         get_tenant_name = self.identity_client.get_tenants_func()
         sec_groups_info = []
         for sec_gr in sec_grs:
@@ -231,11 +270,10 @@ class NeutronNetwork(network.Network):
         return sec_groups_info
 
     def upload_neutron_security_groups(self, sec_groups):
-        exist_secgrs = self.get_security_groups()
-        exis_secgrs_hashlist = [ex_sg['res_hash'] for ex_sg in exist_secgrs]
+        exist_secgrs = ResourceIndex(self.get_security_groups())
         for sec_group in sec_groups:
             if sec_group['name'] != DEFAULT_SECGR:
-                if sec_group['res_hash'] not in exis_secgrs_hashlist:
+                if not exist_secgrs.has_hash(sec_group['res_hash']):
                     tenant_id = \
                         self.identity_client.get_tenant_id_by_name(
                             sec_group['tenant_name']
@@ -252,12 +290,12 @@ class NeutronNetwork(network.Network):
                     self.neutron_client.create_security_group(sec_group_info)
 
     def upload_sec_group_rules(self, sec_groups):
-        ex_secgrs = self.get_security_groups()
+        ex_secgrs = ResourceIndex(self.get_security_groups())
+        src_secgrs = ResourceIndex(sec_groups)
         for sec_gr in sec_groups:
-            ex_secgr = \
-                self.get_res_by_hash(ex_secgrs, sec_gr['res_hash'])
+            ex_secgr = ex_secgrs.get_by_hash(sec_gr['res_hash'])
             exrules_hlist = \
-                [r['rule_hash'] for r in ex_secgr['security_group_rules']]
+                set(r['rule_hash'] for r in ex_secgr['security_group_rules'])
             for rule in sec_gr['security_group_rules']:
                 if rule['protocol'] \
                         and (rule['rule_hash'] not in exrules_hlist):
@@ -272,18 +310,14 @@ class NeutronNetwork(network.Network):
                             'tenant_id': ex_secgr['tenant_id']}}
                     if rule['remote_group_id']:
                         remote_sghash = \
-                            self.get_res_hash_by_id(sec_groups,
-                                                    rule['remote_group_id'])
-                        rem_ex_sec_gr = \
-                            self.get_res_by_hash(ex_secgrs,
-                                                 remote_sghash)
+                            src_secgrs.get_hash_by_id(rule['remote_group_id'])
+                        rem_ex_sec_gr = ex_secgrs.get_by_hash(remote_sghash)
                         rinfo['security_group_rule']['remote_group_id'] = \
                             rem_ex_sec_gr['id']
                     self.neutron_client.create_security_group_rule(rinfo)
 
     def upload_networks(self, networks):
-        existing_nets_hashlist = \
-            [ex_net['res_hash'] for ex_net in self.get_networks()]
+        existing_nets = ResourceIndex(self.get_networks())
         for net in networks:
             tenant_id = \
                 self.identity_client.get_tenant_id_by_name(net['tenant_name'])
@@ -304,24 +338,25 @@ class NeutronNetwork(network.Network):
                 if net['provider:network_type'] == 'vlan':
                     network_info['network']['provider:segmentation_id'] = \
                         net['provider:segmentation_id']
-            if net['res_hash'] not in existing_nets_hashlist:
-                self.neutron_client.create_network(network_info)
+            if not existing_nets.has_hash(net['res_hash']):
+                new_net = \
+                    self.neutron_client.create_network(network_info)['network']
+                existing_nets.add({'id': new_net['id'],
+                                   'res_hash': net['res_hash']})
             else:
                 LOG.info("| Dst cloud already has the same network "
                          "with name %s in tenant %s" %
                          (net['name'], net['tenant_name']))
 
     def upload_subnets(self, networks, subnets):
-        existing_nets = self.get_networks()
-        existing_subnets_hashlist = \
-            [ex_snet['res_hash'] for ex_snet in self.get_subnets()]
+        src_nets = ResourceIndex(networks)
+        existing_nets = ResourceIndex(self.get_networks())
+        existing_subnets = ResourceIndex(self.get_subnets())
         for snet in subnets:
             tenant_id = \
                 self.identity_client.get_tenant_id_by_name(snet['tenant_name'])
-            net_hash = \
-                self.get_res_hash_by_id(networks, snet['network_id'])
-            network_id = \
-                self.get_res_by_hash(existing_nets, net_hash)['id']
+            net_hash = src_nets.get_hash_by_id(snet['network_id'])
+            network_id = existing_nets.get_by_hash(net_hash)['id']
             subnet_info = {
                 'subnet':
                     {'name': snet['name'],
@@ -332,19 +367,22 @@ class NeutronNetwork(network.Network):
                      'gateway_ip': snet['gateway_ip'],
                      'ip_version': snet['ip_version'],
                      'tenant_id': tenant_id}}
-            if snet['res_hash'] not in existing_subnets_hashlist:
-                self.neutron_client.create_subnet(subnet_info)
+            if not existing_subnets.has_hash(snet['res_hash']):
+                new_snet = \
+                    self.neutron_client.create_subnet(subnet_info)['subnet']
+                existing_subnets.add({'id': new_snet['id'],
+                                      'res_hash': snet['res_hash']})
             else:
                 LOG.info("| Dst cloud already has the same subnetwork "
                          "with name %s in tenant %s" %
                          (snet['name'], snet['tenant_name']))
 
     def upload_routers(self, networks, subnets, routers):
-        existing_nets = self.get_networks()
-        existing_subnets = self.get_subnets()
-        existing_routers = self.get_routers()
-        existing_routers_hashlist = \
-            [ex_router['res_hash'] for ex_router in existing_routers]
+        src_nets = ResourceIndex(networks)
+        src_subnets = ResourceIndex(subnets)
+        existing_nets = ResourceIndex(self.get_networks())
+        existing_subnets = ResourceIndex(self.get_subnets())
+        existing_routers = ResourceIndex(self.get_routers())
         for router in routers:
             tname = router['tenant_name']
             tenant_id = \
@@ -352,58 +390,48 @@ class NeutronNetwork(network.Network):
             r_info = {'router': {'name': router['name'],
                                  'tenant_id': tenant_id}}
             if router['external_gateway_info']:
-                ex_net_hash = \
-                    self.get_res_hash_by_id(networks, router['ext_net_id'])
-                ex_net_id = \
-                    self.get_res_by_hash(existing_nets, ex_net_hash)['id']
+                ex_net_hash = src_nets.get_hash_by_id(router['ext_net_id'])
+                ex_net_id = existing_nets.get_by_hash(ex_net_hash)['id']
                 r_info['router']['external_gateway_info'] = \
                     dict(network_id=ex_net_id)
-            if router['res_hash'] not in existing_routers_hashlist:
+            existing_router = existing_routers.get_by_hash(router['res_hash'])
+            if not existing_router or \
+                    not set(router['ips']).intersection(existing_router['ips']):
                 new_router = \
                     self.neutron_client.create_router(r_info)['router']
                 self.add_router_interfaces(router,
                                            new_router,
-                                           subnets,
+                                           src_subnets,
                                            existing_subnets)
             else:
-                existing_router = self.get_res_by_hash(existing_routers,
-                                                       router['res_hash'])
-                if not set(router['ips']).intersection(existing_router['ips']):
-                    new_router = \
-                        self.neutron_client.create_router(r_info)['router']
-                    self.add_router_interfaces(router,
-                                               new_router,
-                                               subnets,
-                                               existing_subnets)
-                else:
-                    LOG.info("| Dst cloud already has the same router "
-                             "with name %s in tenant %s" %
-                             (router['name'], router['tenant_name']))
+                LOG.info("| Dst cloud already has the same router "
+                         "with name %s in tenant %s" %
+                         (router['name'], router['tenant_name']))
 
     def add_router_interfaces(self, src_router, dst_router,
                               src_snets, dst_sets):
+        src_snets = as_resource_index(src_snets)
+        dst_sets = as_resource_index(dst_sets)
         for snet_id in src_router['subnet_ids']:
-            snet_hash = self.get_res_hash_by_id(src_snets, snet_id)
-            ex_snet_id = self.get_res_by_hash(dst_sets,
-                                              snet_hash)['id']
+            snet_hash = src_snets.get_hash_by_id(snet_id)
+            ex_snet_id = dst_sets.get_by_hash(snet_hash)['id']
             self.neutron_client.add_interface_router(dst_router['id'],
                                                      {"subnet_id": ex_snet_id})
 
     def upload_floatingips(self, networks, src_floats):
-        existing_nets = self.get_networks()
-        ext_nets_ids = []
+        src_nets = ResourceIndex(networks)
+        existing_nets = ResourceIndex(self.get_networks())
+        ext_nets_ids = set()
         # getting list of external networks with allocated floating ips
         for src_float in src_floats:
             ext_net_hash = \
-                self.get_res_hash_by_id(networks,
-                                        src_float['floating_network_id'])
-            ext_net_id = \
-                self.get_res_by_hash(existing_nets, ext_net_hash)['id']
+                src_nets.get_hash_by_id(src_float['floating_network_id'])
+            ext_net_id = existing_nets.get_by_hash(ext_net_hash)['id']
             if ext_net_id not in ext_nets_ids:
-                ext_nets_ids.append(ext_net_id)
+                ext_nets_ids.add(ext_net_id)
                 self.allocate_floatingips(ext_net_id)
         existing_floatingips = self.get_floatingips()
-        self.recreate_floatingips(src_floats, networks,
+        self.recreate_floatingips(src_floats, src_nets,
                                   existing_nets, existing_floatingips)
         self.delete_redundant_floatingips(src_floats, existing_floatingips)
 
@@ -425,54 +453,46 @@ class NeutronNetwork(network.Network):
         because we can't determine floating ip address
         during allocation process. """
 
+        src_nets = as_resource_index(src_nets)
+        existing_nets = as_resource_index(existing_nets)
+        floatings_by_address = dict()
+        for floating in existing_floatingips:
+            floatings_by_address.setdefault(floating['floating_ip_address'],
+                                            []).append(floating)
         for src_float in src_floats:
             tname = src_float['tenant_name']
             tenant_id = \
                 self.identity_client.get_tenant_id_by_name(tname)
             ext_net_hash = \
-                self.get_res_hash_by_id(src_nets,
-                                        src_float['floating_network_id'])
-            ext_net = self.get_res_by_hash(existing_nets, ext_net_hash)
-            for floating in existing_floatingips:
-                if floating['floating_ip_address'] == \
-                        src_float['floating_ip_address']:
-                    if floating['floating_network_id'] == ext_net['id']:
-                        if floating['tenant_id'] != tenant_id:
-                            id = floating['id']
-                            self.neutron_client.delete_floatingip(id)
-                            self.neutron_client.create_floatingip({
-                                'floatingip':
-                                    {'floating_network_id': ext_net['id'],
-                                     'tenant_id': tenant_id}})
+                src_nets.get_hash_by_id(src_float['floating_network_id'])
+            ext_net = existing_nets.get_by_hash(ext_net_hash)
+            address = src_float['floating_ip_address']
+            for floating in floatings_by_address.get(address, []):
+                if floating['floating_network_id'] == ext_net['id']:
+                    if floating['tenant_id'] != tenant_id:
+                        id = floating['id']
+                        self.neutron_client.delete_floatingip(id)
+                        self.neutron_client.create_floatingip({
+                            'floatingip':
+                                {'floating_network_id': ext_net['id'],
+                                 'tenant_id': tenant_id}})
 
     def delete_redundant_floatingips(self, src_floats, existing_floatingips):
         src_floatingips = \
-            [src_float['floating_ip_address'] for src_float in src_floats]
+            set(src_float['floating_ip_address'] for src_float in src_floats)
         for floatingip in existing_floatingips:
             if floatingip['floating_ip_address'] not in src_floatingips:
                 self.neutron_client.delete_floatingip(floatingip['id'])
 
     def get_res_by_hash(self, existing_resources, resource_hash):
-        for resource in existing_resources:
-            if resource['res_hash'] == resource_hash:
-                return resource
+        return as_resource_index(existing_resources).get_by_hash(resource_hash)
 
     def get_res_hash_by_id(self, resources, resource_id):
-        for resource in resources:
-            if resource['id'] == resource_id:
-                return resource['res_hash']
+        return as_resource_index(resources).get_hash_by_id(resource_id)
 
     def get_resource_hash(self, neutron_resource, *args):
-        list_info = list()
-        for arg in args:
-            if type(neutron_resource[arg]) is not list:
-                list_info.append(neutron_resource[arg])
-            else:
-                for argitem in arg:
-                    if type(argitem) is str:
-                        argitem = argitem.lower()
-                    list_info.append(neutron_resource[arg][argitem])
-        hash_list = \
-            [info.lower() if type(info) is str else info for info in list_info]
-        hash_list.sort()
-        return hash(tuple(hash_list))
+
+        """ Stable fingerprint of the given fields, case-insensitive and
+        independent of the order of list items. """
+
+        return fingerprint(neutron_resource, *args)
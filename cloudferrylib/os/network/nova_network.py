@@ -13,7 +13,7 @@
 # limitations under the License.
 from cloudferrylib.base import network
 from novaclient.v1_1 import client as nova_client
-from utils import forward_agent
+from utils import forward_agent, ssh_command
 from fabric.api import run, settings, env
 
 
@@ -67,8 +67,7 @@ class NovaNetwork(network.Network):
         with settings(host_string=self.config['host']):
             with forward_agent(env.key_filename):
                 cmd = "virsh dumpxml %s | grep 'mac address' | cut -d\\' -f2" % libvirt_name
-                out = run("ssh -oStrictHostKeyChecking=no %s %s" %
-                          (compute_node, cmd))
+                out = run(ssh_command(compute_node, cmd))
                 mac_addresses = out.split()
         mac_iter = iter(mac_addresses)
         return mac_iter
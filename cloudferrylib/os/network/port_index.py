@@ -0,0 +1,120 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import threading
+import time
+
+from cloudferrylib.utils.catalog import DEFAULT_TTL
+
+__author__ = 'mirrorcoder'
+
+
+class PortIndex(object):
+
+    """
+        Neutron ports read by one list_ports call and grouped by device
+        (device_id and device_owner), by fixed ip address and by
+        (network_id, mac_address). loader() returns the list of port
+        dicts, it is called again only after ttl seconds or invalidate().
+        Lookups return ports in listing order:
+
+            ports = PortIndex(lambda: client.list_ports()['ports'])
+            ports.by_device(router['id'])
+
+        Ports created or deleted through the client should be add()-ed or
+        remove()-d.
+    """
+
+    def __init__(self, loader, ttl=DEFAULT_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.invalidate()
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded = None
+            self.ports = []
+            self.devices = {}
+            self.ips = {}
+            self.macs = {}
+
+    def __load(self):
+        with self.lock:
+            if self.loaded is not None and time.time() - self.loaded < self.ttl:
+                return
+            ports = list(self.loader())
+            self.invalidate()
+            for port in ports:
+                self.__index(port)
+            self.loaded = time.time()
+
+    @staticmethod
+    def __keys(port):
+        return (port.get('device_id'),
+                [ip['ip_address'] for ip in port.get('fixed_ips') or []],
+                (port.get('network_id'), port.get('mac_address')))
+
+    def __index(self, port):
+        device, ips, mac = self.__keys(port)
+        self.ports.append(port)
+        self.devices.setdefault(device, []).append(port)
+        for ip in ips:
+            self.ips.setdefault(ip, []).append(port)
+        self.macs.setdefault(mac, []).append(port)
+
+    def add(self, port):
+        with self.lock:
+            if self.loaded is not None:
+                self.__index(port)
+        return port
+
+    def remove(self, port):
+        with self.lock:
+            if port not in self.ports:
+                return
+            device, ips, mac = self.__keys(port)
+            self.ports.remove(port)
+            self.__discard(self.devices, device, port)
+            for ip in ips:
+                self.__discard(self.ips, ip, port)
+            self.__discard(self.macs, mac, port)
+
+    @staticmethod
+    def __discard(index, key, port):
+        index[key].remove(port)
+        if not index[key]:
+            del index[key]
+
+    def list(self):
+        with self.lock:
+            self.__load()
+            return list(self.ports)
+
+    def by_device(self, device_id, device_owner=None):
+        with self.lock:
+            self.__load()
+            return [port for port in self.devices.get(device_id, [])
+                    if device_owner is None or
+                    port.get('device_owner') == device_owner]
+
+    def by_ip(self, ip_address):
+        with self.lock:
+            self.__load()
+            return (self.ips.get(ip_address) or [None])[0]
+
+    def by_mac(self, network_id, mac_address):
+        with self.lock:
+            self.__load()
+            return list(self.macs.get((network_id, mac_address), []))
@@ -0,0 +1,68 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+__author__ = 'mirrorcoder'
+
+
+class ResourceIndex(object):
+
+    """
+        Network resources (dicts of NeutronNetwork.read_info) indexed by
+        res_hash and by id. Like the former linear search, the first
+        resource with a given hash or id wins. Resources created during
+        upload should be add()-ed, so the following steps match them:
+
+            existing_nets = ResourceIndex(self.get_networks())
+            network_id = existing_nets.get_by_hash(net_hash)['id']
+    """
+
+    def __init__(self, resources=()):
+        self.resources = []
+        self.hashes = {}
+        self.ids = {}
+        for resource in resources:
+            self.add(resource)
+
+    def add(self, resource):
+        self.resources.append(resource)
+        if 'res_hash' in resource:
+            self.hashes.setdefault(resource['res_hash'], resource)
+        if 'id' in resource:
+            self.ids.setdefault(resource['id'], resource)
+        return resource
+
+    def get_by_hash(self, res_hash):
+        return self.hashes.get(res_hash)
+
+    def get_by_id(self, resource_id):
+        return self.ids.get(resource_id)
+
+    def get_hash_by_id(self, resource_id):
+        resource = self.ids.get(resource_id)
+        return resource['res_hash'] if resource else None
+
+    def has_hash(self, res_hash):
+        return res_hash in self.hashes
+
+    def __iter__(self):
+        return iter(self.resources)
+
+    def __len__(self):
+        return len(self.resources)
+
+
+def as_resource_index(resources):
+    if isinstance(resources, ResourceIndex):
+        return resources
+    return ResourceIndex(resources)
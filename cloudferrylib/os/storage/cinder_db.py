@@ -0,0 +1,65 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+__author__ = 'mirrorcoder'
+
+
+class CinderDBWriter(object):
+
+    """
+        Collects patches of cinder volumes that can't be done by the API
+        and writes them by a pooled MysqlConnector to the cinder database:
+        one UPDATE per value of the field, all in one transaction.
+
+            writer = CinderDBWriter(MysqlConnector(config.mysql, 'cinder'))
+            writer.patch_bootable(volume_id, True)
+            writer.flush()
+
+        Without a connector the patches are taken as one sql script by
+        pop_script(), e.g. for the mysql client on the controller.
+    """
+
+    def __init__(self, mysql_connector):
+        self.mysql_connector = mysql_connector
+        self.bootable = {}
+
+    def patch_bootable(self, volume_id, bootable):
+        self.bootable[volume_id] = int(str(bootable).lower() in ('true', '1'))
+
+    def flush(self):
+        if not self.bootable:
+            return
+        with self.mysql_connector.transaction() as connection:
+            for bootable, ids in self.__groups():
+                self.mysql_connector.execute_in(
+                    "UPDATE volumes SET bootable = :bootable WHERE id IN ({ids})",
+                    ids, connection=connection, bootable=bootable)
+        self.bootable = {}
+
+    def pop_script(self):
+        if not self.bootable:
+            return None
+        script = "START TRANSACTION;%sCOMMIT;" % "".join(
+            "UPDATE volumes SET bootable=%d WHERE id IN (%s);" % (
+                bootable, ",".join('"%s"' % volume_id for volume_id in ids))
+            for bootable, ids in self.__groups())
+        self.bootable = {}
+        return script
+
+    def __groups(self):
+        volumes = {}
+        for volume_id, bootable in self.bootable.iteritems():
+            volumes.setdefault(bootable, []).append(volume_id)
+        # rows are locked in the same order by every writer
+        return [(bootable, sorted(ids)) for bootable, ids in sorted(volumes.iteritems())]
@@ -15,9 +15,9 @@
 
 from cloudferrylib.base import storage
 from cinderclient.v1 import client as cinder_client
-from fabric.api import settings
-from fabric.api import run
-import time
+from cloudferrylib.os.storage.cinder_db import CinderDBWriter
+from cloudferrylib.utils import waiter
+from cloudferrylib.utils.mysql_connector import MysqlConnector
 AVAILABLE = 'available'
 IN_USE = "in-use"
 
@@ -33,6 +33,7 @@ class CinderStorage(storage.Storage):
         self.host = config.cloud.host
         self.identity_client = identity_client
         self.cinder_client = self.get_cinder_client(self.config)
+        self.db_writer = None
         super(CinderStorage, self).__init__(config)
 
     def get_cinder_client(self, params):
@@ -83,10 +84,14 @@ class CinderStorage(storage.Storage):
             vol_for_deploy = self.convert(vol)
             volume = self.create_volume(**vol_for_deploy)
             vol['volume']['id'] = volume.id
-            self.wait_for_status(volume.id, AVAILABLE)
+            volumes.append(volume)
+        for vol in info['storage']['volumes']:
+            self.wait_for_status(vol['volume']['id'], AVAILABLE)
             self.finish(vol)
+        if self.db_writer:
+            self.db_writer.flush()
+        for vol in info['storage']['volumes']:
             self.attach_volume_to_instance(vol)
-            volumes.append(volume)
         return volumes
 
     def attach_volume_to_instance(self, volume_info):
@@ -123,19 +128,16 @@ class CinderStorage(storage.Storage):
         return self.cinder_client.volumes.detach(volume_id)
 
     def finish(self, vol):
-        self.__patch_option_bootable_of_volume(vol['volume']['id'], vol['volume'].bootable)
+        """ Collect the patch of bootable flag, written by deploy at once. """
 
-    def __patch_option_bootable_of_volume(self, volume_id, bootable):
-        cmd = 'use cinder;update volumes set volumes.bootable=%s where volumes.id="%s"' % (int(bootable), volume_id)
-        self.__cmd_mysql_on_dest_controller(cmd)
+        self.get_db_writer().patch_bootable(vol['volume']['id'],
+                                            vol['volume']['bootable'])
 
-    def __cmd_mysql_on_dest_controller(self, cmd):
-        with settings(host_string=self.config['host']):
-            run('mysql %s %s -e \'%s\'' % (("-u "+self.config['mysql']['user'])
-                                           if self.config['mysql']['user'] else "",
-                                           "-p"+self.config['mysql']['password']
-                                           if self.config['mysql']['password'] else "",
-                                           cmd))
+    def get_db_writer(self):
+        if not self.db_writer:
+            self.db_writer = CinderDBWriter(
+                MysqlConnector(self.config['mysql'], 'cinder'))
+        return self.db_writer
 
     def upload_volume_to_image(self, volume_id, force, image_name,
                                container_format, disk_format):
@@ -149,5 +151,4 @@ class CinderStorage(storage.Storage):
         return resp, image['os-volume_upload_image']['image_id']
 
     def wait_for_status(self, id_res, status):
-        while self.cinder_client.volumes.get(id).status != status:
-            time.sleep(1)
\ No newline at end of file
+        waiter.wait_for_status(self.cinder_client.volumes, id_res, status)
\ No newline at end of file
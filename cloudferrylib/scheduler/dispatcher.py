@@ -0,0 +1,129 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import sys
+import threading
+
+from cloudferrylib.scheduler.executor import Future
+
+__author__ = 'mirrorcoder'
+
+
+class Dispatcher(object):
+
+    """
+        Submits jobs to an executor keeping per-key concurrency limits.
+        Every job is tagged with keys, e.g. {'host': 'compute-1',
+        'pool': 'compute'}, and limits maps key kinds to the max number
+        of running jobs sharing the same value:
+
+            dispatcher = Dispatcher(executor, {'host': 2, 'pool': 4})
+            dispatcher.submit(func, {'host': 'compute-1'})
+
+        Keys without a limit or with value None are not restricted.
+        The total number of running jobs is bounded by the executor.
+        Jobs that can't start yet wait in submit order.
+        on_start(keys, kwargs) is called right before a job is given to
+        the executor, it may change kwargs of the job and return a
+        callable run when the job is done.
+    """
+
+    def __init__(self, executor, limits=None, on_start=None):
+        self.executor = executor
+        self.limits = limits or {}
+        self.on_start = on_start
+        self.running = {}
+        self.pending = []
+        self.changed = False
+        self.cond = threading.Condition()
+
+    def submit(self, func, keys=None, *args, **kwargs):
+        future = Future()
+        with self.cond:
+            self.pending.append((keys, future, func, args, kwargs))
+        self.__dispatch()
+        return future
+
+    def join(self, futures):
+
+        """
+            Wait for futures, starting pending jobs as limits allow.
+            Jobs are started only from submit() and join() threads,
+            never from executor callbacks, so processes are not forked
+            from helper threads.
+        """
+
+        futures = list(futures)
+        while True:
+            with self.cond:
+                self.changed = False
+            self.__dispatch()
+            with self.cond:
+                if all(f.done() for f in futures):
+                    return
+                while not self.changed:
+                    self.cond.wait(1)
+
+    def __limited_keys(self, keys):
+        return [(kind, value) for kind, value in (keys or {}).iteritems()
+                if value is not None and kind in self.limits]
+
+    def __can_start(self, keys):
+        return all(self.running.get(key, 0) < self.limits[key[0]] for key in keys)
+
+    def __dispatch(self):
+        ready = []
+        with self.cond:
+            for job in list(self.pending):
+                keys = self.__limited_keys(job[0])
+                if self.__can_start(keys):
+                    for key in keys:
+                        self.running[key] = self.running.get(key, 0) + 1
+                    self.pending.remove(job)
+                    ready.append(job)
+        for job_keys, future, func, args, kwargs in ready:
+            keys = self.__limited_keys(job_keys)
+            on_done = None
+            try:
+                if self.on_start:
+                    on_done = self.on_start(job_keys, kwargs)
+                job_future = self.executor.submit(func, *args, **kwargs)
+            except BaseException:
+                exc_info = sys.exc_info()
+                if on_done:
+                    on_done()
+                future.set_exception(exc_info)
+                self.__release(keys)
+                continue
+            job_future.add_done_callback(
+                lambda f, keys=keys, future=future, on_done=on_done:
+                self.__done(f, keys, future, on_done))
+
+    def __release(self, keys):
+        with self.cond:
+            for key in keys:
+                self.running[key] -= 1
+                if not self.running[key]:
+                    del self.running[key]
+            self.changed = True
+            self.cond.notify_all()
+
+    def __done(self, job_future, keys, future, on_done):
+        if on_done:
+            on_done()
+        try:
+            future.set_result(job_future.result())
+        except BaseException:
+            future.set_exception(sys.exc_info())
+        self.__release(keys)
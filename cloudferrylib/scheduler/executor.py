@@ -0,0 +1,285 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import os
+import sys
+import threading
+import Queue
+import multiprocessing
+from multiprocessing import Process
+
+__author__ = 'mirrorcoder'
+
+THREAD = 'thread'
+PROCESS = 'process'
+DEFAULT_MAX_WORKERS = 16
+
+default_executor = None
+
+
+class Future(object):
+
+    """
+        Result of a job submitted to an executor.
+        join() is kept so callers that used to join Process objects
+        can wait on a future the same way.
+    """
+
+    def __init__(self):
+        self.__done = threading.Event()
+        self.__result = None
+        self.__exc_info = None
+        self.__callbacks = []
+        self.__lock = threading.Lock()
+
+    def set_result(self, result):
+        self.__result = result
+        self.__finish()
+
+    def set_exception(self, exc_info):
+        self.__exc_info = exc_info
+        self.__finish()
+
+    def __finish(self):
+        with self.__lock:
+            self.__done.set()
+            callbacks, self.__callbacks = self.__callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback):
+        with self.__lock:
+            if not self.__done.is_set():
+                self.__callbacks.append(callback)
+                return
+        callback(self)
+
+    def done(self):
+        return self.__done.is_set()
+
+    def wait(self, timeout=None):
+        self.__done.wait(timeout)
+        return self.done()
+
+    def join(self, timeout=None):
+        self.wait(timeout)
+
+    def exception(self, timeout=None):
+        self.wait(timeout)
+        return self.__exc_info[1] if self.__exc_info else None
+
+    def result(self, timeout=None):
+        if not self.wait(timeout):
+            raise RuntimeError("Future is not done")
+        if self.__exc_info:
+            raise self.__exc_info[0], self.__exc_info[1], self.__exc_info[2]
+        return self.__result
+
+
+class BaseExecutor(object):
+
+    """
+        Runs callables on a bounded set of workers and returns Future objects.
+        An executor inherited by a forked child (nested SchedulerThread)
+        has no live workers there, so it resets itself on first use.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.max_workers = max_workers
+        self.reset()
+
+    def reset(self):
+        self.pid = os.getpid()
+        self.lock = threading.Lock()
+        self.is_shutdown = False
+
+    def check_pid(self):
+        if self.pid != os.getpid():
+            self.reset()
+
+    def submit(self, func, *args, **kwargs):
+        raise NotImplementedError()
+
+    def map(self, func, items):
+        return [f.result() for f in [self.submit(func, item) for item in items]]
+
+    def shutdown(self, wait=True):
+        with self.lock:
+            self.is_shutdown = True
+
+    def check_shutdown(self):
+        if self.is_shutdown:
+            raise RuntimeError("Executor has been shut down")
+
+
+class ThreadPoolExecutor(BaseExecutor):
+
+    """
+        Runs jobs in worker threads of the current process.
+        Suits I/O-bound jobs (ssh pipes, REST calls, status polling).
+        A new worker is started only when no idle one can take the job.
+        A job that submits jobs to the same pool (a branch forking its
+        children) becomes their parent: it stops counting against
+        max_workers, so its children get workers of their own instead of
+        queueing behind their waiting parents, and at most max_workers
+        jobs other than parents run at once on all levels. A worker left
+        over when its parent job ends stops.
+    """
+
+    def reset(self):
+        super(ThreadPoolExecutor, self).reset()
+        self.jobs = Queue.Queue()
+        self.workers = []
+        # live workers, workers running a parent job, workers waiting for
+        # a job and jobs no worker took yet
+        self.live = 0
+        self.parents = 0
+        self.idle = 0
+        self.pending = 0
+        self.local = threading.local()
+
+    def submit(self, func, *args, **kwargs):
+        self.check_pid()
+        future = Future()
+        with self.lock:
+            self.check_shutdown()
+            if getattr(self.local, 'is_worker', False) and not self.local.is_parent:
+                self.local.is_parent = True
+                self.parents += 1
+            self.jobs.put((future, func, args, kwargs))
+            self.pending += 1
+            if self.idle < self.pending and self.live - self.parents < self.max_workers:
+                worker = threading.Thread(target=self.__worker)
+                worker.daemon = True
+                self.live += 1
+                self.idle += 1
+                worker.start()
+                self.workers.append(worker)
+        return future
+
+    def shutdown(self, wait=True):
+        with self.lock:
+            self.is_shutdown = True
+            for _ in self.workers:
+                self.jobs.put(None)
+        if wait:
+            for worker in self.workers:
+                worker.join()
+
+    def __worker(self):
+        self.local.is_worker = True
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            with self.lock:
+                self.idle -= 1
+                self.pending -= 1
+            self.local.is_parent = False
+            self.__run(*job)
+            with self.lock:
+                if self.local.is_parent:
+                    self.parents -= 1
+                if self.live - self.parents > self.max_workers:
+                    self.live -= 1
+                    return
+                self.idle += 1
+
+    @staticmethod
+    def __run(future, func, args, kwargs):
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException:
+            future.set_exception(sys.exc_info())
+
+
+class ProcessPoolExecutor(BaseExecutor):
+
+    """
+        Runs every job in a forked process, at most max_workers at a time.
+        Nothing is pickled: the job is inherited by the fork,
+        and the result of the future is the exit code of the process.
+        The fork is done from the submitting thread (forking from a helper
+        thread may inherit locks held by other threads), submit blocks
+        while all slots are busy.
+        Slots are shared by the forked children: a job submitting jobs
+        of its own (nested branches) gives its slot to its children, so
+        at most max_workers processes other than such parents run on all
+        levels.
+    """
+
+    def __init__(self, max_workers=DEFAULT_MAX_WORKERS):
+        self.slots = multiprocessing.BoundedSemaphore(max_workers)
+        # slot held by the job run in this process, None in the parent
+        self.job_slot = None
+        super(ProcessPoolExecutor, self).__init__(max_workers)
+
+    def reset(self):
+        super(ProcessPoolExecutor, self).reset()
+        self.watchers = []
+
+    def submit(self, func, *args, **kwargs):
+        self.check_pid()
+        self.check_shutdown()
+        self.__give_slot()
+        self.slots.acquire()
+        future = Future()
+        slot = multiprocessing.RawValue('b', 1)
+        try:
+            p = Process(target=self.__run, args=(slot, func, args, kwargs))
+            p.start()
+        except BaseException:
+            self.slots.release()
+            raise
+        watcher = threading.Thread(target=self.__watch, args=(p, slot, future))
+        watcher.daemon = True
+        watcher.start()
+        with self.lock:
+            self.watchers.append(watcher)
+        return future
+
+    def shutdown(self, wait=True):
+        super(ProcessPoolExecutor, self).shutdown(wait)
+        if wait:
+            for watcher in self.watchers:
+                watcher.join()
+
+    def __run(self, slot, func, args, kwargs):
+        self.job_slot = slot
+        func(*args, **kwargs)
+
+    def __give_slot(self):
+        with self.lock:
+            if self.job_slot is not None and self.job_slot.value:
+                self.job_slot.value = 0
+                self.slots.release()
+
+    def __watch(self, p, slot, future):
+        p.join()
+        if slot.value:
+            self.slots.release()
+        future.set_result(p.exitcode)
+
+
+def get_executor(name=PROCESS, max_workers=DEFAULT_MAX_WORKERS):
+    return {
+        THREAD: ThreadPoolExecutor,
+        PROCESS: ProcessPoolExecutor
+    }[name](max_workers)
+
+
+def init_executor(cfg):
+    executor = get_executor(cfg.migrate.scheduler_executor,
+                            cfg.migrate.scheduler_workers)
+    globals()['default_executor'] = executor
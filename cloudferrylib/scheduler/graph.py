@@ -0,0 +1,214 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import ast
+import inspect
+import textwrap
+
+from cloudferrylib.scheduler.cursor import Cursor, DEFAULT
+from cloudferrylib.scheduler.task import BaseTask
+
+__author__ = 'mirrorcoder'
+
+DEFAULT_COST = 1
+
+_writes_cache = {}
+
+
+def get_reads(task):
+
+    """
+        Namespace keys the task reads.
+        Taken from task.reads or from named arguments of task.run,
+        keys read only through **kwargs are not seen.
+    """
+
+    if hasattr(task, 'reads'):
+        return set(task.reads)
+    try:
+        args = inspect.getargspec(task.run).args
+    except (TypeError, AttributeError):
+        return set()
+    return set(args[1:])
+
+
+def get_writes(task):
+
+    """
+        Namespace keys the task returns or None if they are unknown.
+        Taken from task.provides or from dict literals returned by task.run.
+    """
+
+    if hasattr(task, 'provides'):
+        return set(task.provides)
+    if not isinstance(task, BaseTask):
+        return None
+    cls = task.__class__
+    if cls not in _writes_cache:
+        _writes_cache[cls] = _parse_writes(task.run)
+    writes = _writes_cache[cls]
+    return set(writes) if writes is not None else None
+
+
+def _parse_writes(func):
+    try:
+        tree = ast.parse(textwrap.dedent(inspect.getsource(func)))
+    except (IOError, TypeError, SyntaxError):
+        return None
+    writes = set()
+    for node in ast.walk(tree):
+        if not isinstance(node, ast.Return) or node.value is None:
+            continue
+        value = node.value
+        if isinstance(value, ast.Name) and value.id == 'None':
+            continue
+        if not isinstance(value, ast.Dict):
+            return None
+        for key in value.keys:
+            if not isinstance(key, ast.Str):
+                return None
+            writes.add(key.s)
+    return writes
+
+
+class TaskNode(object):
+    def __init__(self, task, index):
+        self.task = task
+        self.index = index
+        self.reads = get_reads(task)
+        self.writes = get_writes(task)
+        self.declared = hasattr(task, 'reads') or hasattr(task, 'provides')
+        self.cost = getattr(task, 'cost', DEFAULT_COST)
+        self.deps = set()
+        self.dependents = set()
+        self.rank = self.cost
+
+    def is_barrier(self):
+        # run only for side effects: nothing to order it by but >>
+        side_effects = not self.declared and not self.reads and not self.writes
+        return self.writes is None or side_effects
+
+    def __repr__(self):
+        return "TaskNode|%s|%s" % (self.index, self.task)
+
+
+class TaskGraph(object):
+
+    """
+        DAG of one segment of the task net.
+        Segment is the chain of elements from start up to the first element
+        with alternative paths (| operator), the path is chosen by
+        num_element only after this element was run, so the next segment
+        is built by next_segment() afterwards.
+        Threads linked with & are added after their element.
+        Edges follow namespace keys: a task waits for the last task
+        returning a key it reads, a task returning a key waits for
+        previous readers and writers of this key. Tasks with unknown
+        output and tasks neither reading nor returning any key (run for
+        their side effects only) are barriers for all tasks around them,
+        so they keep their place in the >> order.
+        rank of node is the length of the longest path from it to the end
+        of the segment, weighted by task cost.
+    """
+
+    def __init__(self, start):
+        self.nodes = []
+        self.tail = None
+        self.next_start = None
+        self.__build(start)
+        self.__link()
+        self.__rank()
+
+    @classmethod
+    def from_net(cls, net):
+        return cls(Cursor.forward_back(net))
+
+    def __build(self, start):
+        visited = set()
+        element = start
+        while True:
+            visited.add(id(element))
+            self.__add(element)
+            for thread in reversed(element.parall_elem):
+                self.__add(thread)
+            self.tail = element
+            if len(element.next_element) != 1:
+                break
+            element = element.next_element[0]
+            if id(element) in visited:
+                self.next_start = element
+                break
+
+    def __add(self, task):
+        self.nodes.append(TaskNode(task, len(self.nodes)))
+
+    def __link(self):
+        last_writer = {}
+        readers = {}
+        barrier = None
+        since_barrier = []
+        for node in self.nodes:
+            if node.is_barrier():
+                deps = set(since_barrier)
+                if barrier:
+                    deps.add(barrier)
+                barrier = node
+                since_barrier = []
+                last_writer = {}
+                readers = {}
+            else:
+                deps = set([barrier]) if barrier else set()
+                for key in node.reads:
+                    if key in last_writer:
+                        deps.add(last_writer[key])
+                for key in node.writes:
+                    if key in last_writer:
+                        deps.add(last_writer[key])
+                    deps.update(readers.get(key, []))
+                for key in node.reads:
+                    readers.setdefault(key, []).append(node)
+                for key in node.writes:
+                    last_writer[key] = node
+                    readers[key] = []
+                since_barrier.append(node)
+            deps.discard(node)
+            node.deps = deps
+            for dep in deps:
+                dep.dependents.add(node)
+
+    def __rank(self):
+        for node in reversed(self.nodes):
+            if node.dependents:
+                node.rank = node.cost + max(d.rank for d in node.dependents)
+
+    def roots(self):
+        return [node for node in self.nodes if not node.deps]
+
+    def critical_path(self):
+        path = []
+        candidates = self.roots()
+        while candidates:
+            node = max(candidates, key=lambda n: (n.rank, -n.index))
+            path.append(node)
+            candidates = list(node.dependents)
+        return path
+
+    def next_segment(self):
+        if self.next_start:
+            return TaskGraph(self.next_start)
+        tail = self.tail
+        if not tail.next_element:
+            return None
+        num = tail.num_element if tail.num_element < len(tail.next_element) else DEFAULT
+        return TaskGraph(tail.next_element[num])
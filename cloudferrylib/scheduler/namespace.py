@@ -11,12 +11,73 @@
 # implied.
 # See the License for the specific language governing permissions and#
 # limitations under the License.
+import collections
 import copy
 __author__ = 'mirrorcoder'
 
 CHILDREN = '__children__'
 
 
+class LayeredVars(collections.MutableMapping):
+
+    """
+        Copy-on-write view of the parent vars.
+        Reads fall through to the parent, writes and deletes stay
+        in the own layer, so fork costs O(1) whatever the size of vars.
+        Values are not copied: mutating an object taken from the parent
+        (list.append etc.) is visible to the parent.
+    """
+
+    def __init__(self, parent=None, data=None, deleted=None):
+        self.parent = parent if parent is not None else {}
+        self.data = data if data is not None else {}
+        self.deleted = deleted if deleted is not None else set()
+
+    def __getitem__(self, key):
+        if key in self.data:
+            return self.data[key]
+        if key in self.deleted:
+            raise KeyError(key)
+        return self.parent[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.deleted.discard(key)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.data.pop(key, None)
+        self.deleted.add(key)
+
+    def __contains__(self, key):
+        if key in self.data:
+            return True
+        return key not in self.deleted and key in self.parent
+
+    def __iter__(self):
+        for key in self.data:
+            yield key
+        for key in self.parent:
+            if key not in self.data and key not in self.deleted:
+                yield key
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __copy__(self):
+        return LayeredVars(self.parent, dict(self.data), set(self.deleted))
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(dict(self), memo)
+
+    def changes(self):
+        return dict(self.data), set(self.deleted)
+
+    def convert_to_dict(self):
+        return dict(self)
+
+
 class Namespace:
 
     def __init__(self, vars={}):
@@ -25,4 +86,21 @@ class Namespace:
         self.vars = vars
 
     def fork(self, is_deep_copy=False):
-        return Namespace(copy.copy(self.vars)) if not is_deep_copy else Namespace(copy.deepcopy(self.vars))
+        return Namespace(LayeredVars(self.vars)) if not is_deep_copy else Namespace(copy.deepcopy(self.vars))
+
+    def merge(self, namespace, keys=None):
+
+        """
+            Publish values written by the forked namespace to this one.
+            keys limits what is merged, by default all changed keys are.
+        """
+
+        if not isinstance(namespace.vars, LayeredVars):
+            return
+        updated, deleted = namespace.vars.changes()
+        for key in updated:
+            if keys is None or key in keys:
+                self.vars[key] = updated[key]
+        for key in deleted:
+            if (keys is None or key in keys) and key in self.vars:
+                del self.vars[key]
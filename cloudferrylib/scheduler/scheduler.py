@@ -13,12 +13,14 @@
 # limitations under the License.
 
 import traceback
-from multiprocessing import Process
+import Queue
 
 from task import BaseTask
 from cloudferrylib.scheduler.namespace import Namespace, CHILDREN
+from cloudferrylib.scheduler import executor as executors
 from thread_tasks import WrapThreadTask
 from cursor import Cursor
+from graph import TaskGraph
 
 __author__ = 'mirrorcoder'
 
@@ -69,12 +71,15 @@ class BaseScheduler(object):
 
 
 class SchedulerThread(BaseScheduler):
-    def __init__(self, namespace=None, thread_task=None, cursor=None, scheduler_parent=None):
+    def __init__(self, namespace=None, thread_task=None, cursor=None, scheduler_parent=None, executor=None):
         super(SchedulerThread, self).__init__(namespace, cursor)
         self.map_func_task[WrapThreadTask()] = self.task_run_thread
         self.child_threads = dict()
         self.thread_task = thread_task
         self.scheduler_parent = scheduler_parent
+        self.executor = executor
+        self.future = None
+        self.joined = False
 
     def event_start_children(self, thread_task):
         self.child_threads[thread_task] = True
@@ -99,9 +104,31 @@ class SchedulerThread(BaseScheduler):
             self.start_separate_thread()
 
     def start_separate_thread(self):
-        p = Process(target=self.start_current_thread)
-        self.namespace.vars[CHILDREN][self.thread_task]['process'] = p
-        p.start()
+        self.future = self.get_executor().submit(self.start_current_thread)
+        self.namespace.vars[CHILDREN][self.thread_task]['future'] = self.future
+
+    def join(self, merge=False):
+
+        """ Wait for the thread. merge - publish the vars it wrote to the
+        namespace of the parent scheduler, once. Only a thread executor
+        shares the namespace with the parent, a branch run in another
+        process can't be merged back. """
+
+        if merge and not isinstance(self.get_executor(), executors.ThreadPoolExecutor):
+            raise RuntimeError("Namespace of a branch run by %s can't be merged back" %
+                               self.get_executor().__class__.__name__)
+        if self.future:
+            self.future.join()
+        if not merge:
+            return
+        if self.scheduler_parent and not self.joined:
+            self.joined = True
+            self.scheduler_parent.namespace.merge(self.namespace)
+
+    def get_executor(self):
+        if not self.executor:
+            self.executor = executors.default_executor or executors.get_executor()
+        return self.executor
 
     def start_current_thread(self):
         self.trigger_start_scheduler()
@@ -113,11 +140,12 @@ class SchedulerThread(BaseScheduler):
         scheduler = self.__class__(namespace=namespace,
                                    thread_task=thread_task,
                                    cursor=Cursor(thread_task.getNet()),
-                                   scheduler_parent=self)
+                                   scheduler_parent=self,
+                                   executor=self.get_executor())
         self.namespace.vars[CHILDREN][thread_task] = {
             'namespace': namespace,
             'scheduler': scheduler,
-            'process': None
+            'future': None
         }
         return scheduler
 
@@ -127,5 +155,57 @@ class SchedulerThread(BaseScheduler):
 
 
 class Scheduler(SchedulerThread):
-    def __init__(self, namespace=None, thread_task=False, cursor=None, scheduler_parent=None):
-        super(Scheduler, self).__init__(namespace, thread_task, cursor, scheduler_parent)
+    def __init__(self, namespace=None, thread_task=False, cursor=None, scheduler_parent=None, executor=None):
+        super(Scheduler, self).__init__(namespace, thread_task, cursor, scheduler_parent, executor)
+
+
+class GraphScheduler(Scheduler):
+
+    """
+        Runs the task net as a DAG: every task whose namespace inputs are
+        ready is started at once in a pool of threads, the tasks on the
+        longest remaining path are started first.
+    """
+
+    def __init__(self, namespace=None, thread_task=False, cursor=None, scheduler_parent=None, executor=None,
+                 max_workers=executors.DEFAULT_MAX_WORKERS):
+        super(GraphScheduler, self).__init__(namespace, thread_task, cursor, scheduler_parent, executor)
+        self.max_workers = max_workers
+
+    def start_current_thread(self):
+        self.trigger_start_scheduler()
+        graph = TaskGraph.from_net(self.cursor.current())
+        while graph:
+            self.run_graph(graph)
+            graph = graph.next_segment()
+        self.trigger_stop_scheduler()
+
+    def run_graph(self, graph):
+        pool = executors.get_executor(executors.THREAD, self.max_workers)
+        finished = Queue.Queue()
+        waiting = dict((node, len(node.deps)) for node in graph.nodes)
+        ready = graph.roots()
+        running = 0
+        while ready or running:
+            ready.sort(key=lambda n: (-n.rank, n.index))
+            for node in ready:
+                pool.submit(self.run_node, node).add_done_callback(
+                    lambda f, node=node: finished.put(node))
+            running += len(ready)
+            ready = []
+            node = finished.get()
+            running -= 1
+            for dependent in node.dependents:
+                waiting[dependent] -= 1
+                if not waiting[dependent]:
+                    ready.append(dependent)
+        pool.shutdown()
+
+    def run_node(self, node):
+        try:
+            self.run_task(node.task)
+        except Exception as e:
+            self.status_error = ERROR
+            self.exception = e
+            self.error_task(node.task, e)
+            traceback.print_exc()
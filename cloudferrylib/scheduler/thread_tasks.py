@@ -32,17 +32,26 @@ class WrapThreadTask(EquInstance):
 
 
 class WaitThreadTask(Task):
-    def __init__(self, tt):
+
+    """ Waits for the thread of tt. merge - publish the vars written by
+    the thread to the namespace, thread executor only. """
+
+    def __init__(self, tt, merge=False):
         self.tt = tt
+        self.merge = merge
         super(WaitThreadTask, self).__init__()
 
     def run(self, __children__={}, **kwargs):
         if __children__:
-            __children__[self.tt]['process'].join()
+            __children__[self.tt]['scheduler'].join(self.merge)
 
 
 class WaitThreadAllTask(Task):
+    def __init__(self, merge=False):
+        self.merge = merge
+        super(WaitThreadAllTask, self).__init__()
+
     def run(self, __children__={}, **kwargs):
         if __children__:
             for p in __children__:
-                __children__[p]['process'].join()
+                __children__[p]['scheduler'].join(self.merge)
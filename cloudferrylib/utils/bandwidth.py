@@ -0,0 +1,326 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import multiprocessing
+import re
+import threading
+import time
+
+from cloudferrylib.utils.utils import get_log
+
+__author__ = 'mirrorcoder'
+
+LOG = get_log(__name__)
+
+MIN_RATE = 64 * 1024  # B/s
+REBALANCE_INTERVAL = 5  # s
+# poll interval of reserve() waiting for a free part of the budget
+RESERVE_INTERVAL = 0.5  # s
+# stream using less than this part of its rate is limited by its source
+SATURATION = 0.9
+# room given to such streams above their measured throughput
+HEADROOM = 1.2
+
+manager = None
+
+
+def parse_speed_limit(speed_limit):
+
+    """ '10MB' -> 10485760 B/s, '-' -> 0 (no limit) """
+
+    if not speed_limit or speed_limit == '-':
+        return 0
+    array = filter(None, re.split(r'(\d+)', speed_limit))
+    mult = {
+        'b': 1,
+        'kb': 1024,
+        'mb': 1024 * 1024,
+    }[array[1].lower()]
+    return int(array[0]) * mult
+
+
+class TokenBucket(object):
+
+    """
+        Token bucket rate limiter, can be shared by concurrent transfers
+        of one process. consume(n) blocks until n bytes may be sent at
+        `rate` B/s; at most `burst` bytes (one second by default) are sent
+        without waiting after an idle period. Requests bigger than burst
+        are let through in debt, the next consumers wait for it, so the
+        average rate is kept exactly instead of sleeping per chunk.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.fixed_burst = burst
+        self.burst = burst or rate
+        self.tokens = self.burst
+        self.last = time.time()
+        self.lock = threading.Lock()
+
+    def __refill(self, now):
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def set_rate(self, rate):
+        with self.lock:
+            self.__refill(time.time())
+            self.rate = float(rate)
+            self.burst = self.fixed_burst or rate
+
+    def consume(self, amount):
+        with self.lock:
+            self.__refill(time.time())
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class SharedBudget(object):
+
+    """
+        Budget of `rate` B/s in shared memory, common to the process
+        creating it and all processes forked from it afterwards.
+        Keeps the sum of fixed reservations and a token bucket limiting
+        all live streams of all processes to what is not reserved
+        (but never less than MIN_RATE, live streams are not stopped).
+    """
+
+    TOKENS, LAST, RESERVED = range(3)
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.lock = multiprocessing.Lock()
+        self.state = multiprocessing.RawArray('d', [MIN_RATE, time.time(), 0])
+
+    def free(self):
+        with self.lock:
+            return max(self.rate - self.state[self.RESERVED], 0)
+
+    def reserve(self, rate):
+
+        """ Takes min(rate, free) of the budget, 0 if less than MIN_RATE is free. """
+
+        with self.lock:
+            free = self.rate - self.state[self.RESERVED]
+            if free < MIN_RATE:
+                return 0
+            rate = min(rate, free)
+            self.state[self.RESERVED] += rate
+            return rate
+
+    def release(self, rate):
+        with self.lock:
+            self.state[self.RESERVED] = max(self.state[self.RESERVED] - rate, 0)
+
+    def consume(self, amount):
+        with self.lock:
+            rate = max(self.rate - self.state[self.RESERVED], MIN_RATE)
+            now = time.time()
+            tokens = min(rate, self.state[self.TOKENS] + (now - self.state[self.LAST]) * rate)
+            self.state[self.LAST] = now
+            self.state[self.TOKENS] = tokens - amount
+            wait = (amount - tokens) / rate if tokens < amount else 0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class Stream(object):
+
+    """
+        One transfer registered in BandwidthManager.
+        Live streams consume() their bytes in this process and get their
+        rate changed on every rebalance. Fixed streams (ssh pipes run by
+        forked processes) get their rate once at start, it is passed to
+        the throttling stage of the pipe.
+    """
+
+    def __init__(self, name, weight, rate, fixed):
+        self.name = name
+        self.weight = weight
+        self.fixed = fixed
+        self.bucket = TokenBucket(rate)
+        self.manager = None
+        self.bytes = 0
+        self.started = time.time()
+        self.window_bytes = 0
+        self.window_start = self.started
+        self.throughput = None
+
+    @property
+    def rate(self):
+        return int(self.bucket.rate)
+
+    def consume(self, amount):
+        self.manager.account(self, amount)
+        return self.bucket.consume(amount) + self.manager.budget.consume(amount)
+
+    def close(self):
+        self.manager.close_stream(self)
+
+    def measure(self, now):
+        if now > self.window_start:
+            self.throughput = self.window_bytes / (now - self.window_start)
+        self.window_bytes = 0
+        self.window_start = now
+
+    def demand(self):
+
+        """ Rate the stream can use, None if it takes all it is given. """
+
+        if self.throughput is None or self.throughput >= self.rate * SATURATION:
+            return None
+        return self.throughput * HEADROOM
+
+    def stats(self):
+        return {'name': self.name,
+                'weight': self.weight,
+                'fixed': self.fixed,
+                'rate': self.rate,
+                'throughput': self.throughput,
+                'bytes': self.bytes,
+                'elapsed': time.time() - self.started}
+
+
+class BandwidthManager(object):
+
+    """
+        One bandwidth budget of `rate` B/s for all transfers of the run,
+        kept in a SharedBudget, so forked processes share it instead of
+        getting the whole rate each.
+        Fixed streams take their share at start and keep it to the end,
+        reserve() waits while less than MIN_RATE of the budget is free.
+        The rest is split between live streams of the process by weighted
+        max-min fair share: streams that can't use their share (slow source
+        or sink) are capped at their measured throughput and the surplus
+        goes to the others. Live streams of all processes together are
+        limited by the shared bucket. Shares are rebalanced when streams
+        open and close and every REBALANCE_INTERVAL seconds of traffic,
+        throughput of every stream is measured over the same interval:
+
+            stream = bandwidth.get_manager().open_stream('image-1')
+            stream.consume(len(data))
+            stream.close()
+    """
+
+    def __init__(self, rate, interval=REBALANCE_INTERVAL):
+        self.rate = rate
+        self.budget = SharedBudget(rate)
+        self.interval = interval
+        self.streams = []
+        self.lock = threading.RLock()
+        self.last_rebalance = time.time()
+
+    def open_stream(self, name, weight=1):
+        return self.__add(Stream(name, weight, MIN_RATE, False))
+
+    def reserve(self, name, share, weight=1):
+
+        """ Fixed stream with `share` of the budget, or with what is left
+        of it. Waits until at least MIN_RATE is free. """
+
+        waiting = False
+        while True:
+            rate = self.budget.reserve(max(self.rate * share, MIN_RATE))
+            if rate:
+                return self.__add(Stream(name, weight, rate, True))
+            if not waiting:
+                LOG.info("Bandwidth: %s waits for a free part of the budget", name)
+                waiting = True
+            time.sleep(RESERVE_INTERVAL)
+
+    def free(self):
+        return self.budget.free()
+
+    def __add(self, stream):
+        stream.manager = self
+        with self.lock:
+            self.streams.append(stream)
+            self.rebalance()
+        return stream
+
+    def close_stream(self, stream):
+        with self.lock:
+            if stream in self.streams:
+                self.streams.remove(stream)
+                if stream.fixed:
+                    self.budget.release(stream.bucket.rate)
+                self.rebalance()
+
+    def account(self, stream, amount):
+        with self.lock:
+            stream.bytes += amount
+            stream.window_bytes += amount
+            now = time.time()
+            if now - self.last_rebalance >= self.interval:
+                for s in self.streams:
+                    if not s.fixed:
+                        s.measure(now)
+                self.rebalance()
+                LOG.info("Bandwidth: %s", self.report())
+
+    def rebalance(self):
+        with self.lock:
+            self.last_rebalance = time.time()
+            live = [s for s in self.streams if not s.fixed]
+            for stream, rate in self.fair_share(live, self.free()):
+                stream.bucket.set_rate(max(rate, MIN_RATE))
+
+    @staticmethod
+    def fair_share(streams, available):
+        shares = []
+        pending = list(streams)
+        while pending:
+            weights = float(sum(s.weight for s in pending))
+            capped = [s for s in pending
+                      if s.demand() is not None and
+                      s.demand() <= available * s.weight / weights]
+            if not capped:
+                shares.extend((s, available * s.weight / weights) for s in pending)
+                break
+            for s in capped:
+                shares.append((s, s.demand()))
+                available -= s.demand()
+                pending.remove(s)
+        return shares
+
+    def stats(self):
+        with self.lock:
+            return [s.stats() for s in self.streams]
+
+    def report(self):
+        return ", ".join("%s %s/%s KB/s" % (
+            s['name'],
+            int(s['throughput'] / 1024) if s['throughput'] is not None else '-',
+            s['rate'] / 1024) for s in self.stats())
+
+
+def throttle_stage(rate):
+
+    """ Pipe stage limiting the rate of a shell pipeline, needs pv. """
+
+    return "pv -q -L %d | " % rate if rate else ""
+
+
+def init_bandwidth(speed_limit):
+    rate = parse_speed_limit(speed_limit)
+    globals()['manager'] = BandwidthManager(rate) if rate else None
+
+
+def get_manager():
+    return manager
@@ -0,0 +1,97 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import threading
+import time
+
+__author__ = 'mirrorcoder'
+
+DEFAULT_TTL = 300  # s
+
+
+class Catalog(object):
+
+    """
+        In-memory copy of a resource listing with hash indexes.
+        loader() returns the full list (e.g. client.tenants.list), it is
+        called again only after ttl seconds or invalidate(). Every index
+        maps a value of the attribute to the items having it, in listing
+        order, so get() returns the same item as a linear search would:
+
+            tenants = Catalog(client.tenants.list, ('id', 'name'))
+            tenants.get('name', 'admin')
+
+        Resources created through the client should be add()-ed, deleted
+        ones remove()-d, updated ones need invalidate().
+    """
+
+    def __init__(self, loader, indexes=('id', 'name'), ttl=DEFAULT_TTL):
+        self.loader = loader
+        self.index_names = indexes
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self.invalidate()
+
+    def invalidate(self):
+        with self.lock:
+            self.loaded = None
+            self.resources = []
+            self.indexes = dict((name, {}) for name in self.index_names)
+
+    def __load(self):
+        with self.lock:
+            if self.loaded is not None and time.time() - self.loaded < self.ttl:
+                return
+            resources = list(self.loader())
+            self.invalidate()
+            for resource in resources:
+                self.__index(resource)
+            self.loaded = time.time()
+
+    def __index(self, resource):
+        self.resources.append(resource)
+        for name, index in self.indexes.iteritems():
+            index.setdefault(getattr(resource, name, None), []).append(resource)
+
+    def add(self, resource):
+        with self.lock:
+            if self.loaded is not None:
+                self.__index(resource)
+        return resource
+
+    def remove(self, index, value):
+        with self.lock:
+            removed = self.indexes[index].pop(value, [])
+            for resource in removed:
+                self.resources.remove(resource)
+                for name, other in self.indexes.iteritems():
+                    key = getattr(resource, name, None)
+                    if resource in other.get(key, []):
+                        other[key].remove(resource)
+                        if not other[key]:
+                            del other[key]
+            return removed
+
+    def list(self):
+        with self.lock:
+            self.__load()
+            return list(self.resources)
+
+    def get(self, index, value, default=None):
+        return (self.get_all(index, value) or [default])[0]
+
+    def get_all(self, index, value):
+        with self.lock:
+            self.__load()
+            return list(self.indexes[index].get(value, []))
@@ -0,0 +1,60 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+"""
+    Deterministic fingerprints of resources: SHA-1 over a canonical json
+    serialization. Unlike hash() they are the same in every process and
+    every run, so they can be persisted and compared between clouds:
+
+        fingerprint(network, 'name', 'shared', 'tenant_name')
+        fingerprint(server)  # all fields
+"""
+
+import hashlib
+import json
+
+__author__ = 'mirrorcoder'
+
+
+def canonical(value, ignore_case=True):
+
+    """ Strings lowercased (if ignore_case), lists ordered. """
+
+    if isinstance(value, basestring):
+        value = value if isinstance(value, unicode) else value.decode('utf-8')
+        return value.lower() if ignore_case else value
+    if isinstance(value, dict):
+        return dict((unicode(key), canonical(item, ignore_case))
+                    for key, item in value.iteritems())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sorted((canonical(item, ignore_case) for item in value),
+                      key=serialize)
+    return value
+
+
+def serialize(value):
+    return json.dumps(value, sort_keys=True, separators=(',', ':'),
+                      default=unicode)
+
+
+def fingerprint(resource, *fields, **kwargs):
+
+    """ Fingerprint of the given fields of resource (a dict),
+    of the whole resource if no fields are given. """
+
+    ignore_case = kwargs.get('ignore_case', True)
+    if fields:
+        resource = dict((field, resource[field]) for field in fields)
+    data = serialize(canonical(resource, ignore_case))
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
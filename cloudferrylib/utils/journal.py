@@ -0,0 +1,151 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+"""
+    Append-only journal of json records, one per line. Records are
+    buffered and written with a single flush and fsync once BATCH_SIZE
+    of them are pending or COMMIT_INTERVAL has passed since the first
+    pending one (group commit). write(record, sync=True) and close()
+    commit at once, before returning:
+
+        journal = JournalWriter(path)
+        journal.write({'event': 'event task', 'changes': {...}})
+        journal.close()
+
+    A crash loses at most the records of the last interval, never a
+    record written with sync=True. A line torn by a crash is skipped by
+    read_journal.
+"""
+
+import json
+import os
+import threading
+
+__author__ = 'mirrorcoder'
+
+COMMIT_INTERVAL = 0.2  # s
+BATCH_SIZE = 64
+
+CHANGES = 'changes'
+DELETED = 'deleted'
+NAMESPACE = 'namespace'
+# snapshots copied into the transaction, by cloud
+SNAPSHOTS = 'snapshots'
+
+# values that can't change in place, converted by KeyDelta once per object
+IMMUTABLE = (int, long, bool, float, type(None), str, unicode)
+
+
+class JournalWriter(object):
+    def __init__(self, path, interval=COMMIT_INTERVAL, batch_size=BATCH_SIZE):
+        self.f = open(path, "a+")
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pending = []
+        self.lock = threading.Lock()
+        self.timer = None
+
+    def write(self, record, sync=False):
+        line = json.dumps(record, separators=(',', ':'))
+        with self.lock:
+            self.pending.append(line)
+            if sync or len(self.pending) >= self.batch_size:
+                self.__commit()
+            elif not self.timer:
+                self.timer = threading.Timer(self.interval, self.commit)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def commit(self):
+        with self.lock:
+            self.__commit()
+
+    def close(self):
+        with self.lock:
+            self.__commit()
+            self.f.close()
+
+    def __commit(self):
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if not self.pending or self.f.closed:
+            return
+        self.f.write("\n".join(self.pending) + "\n")
+        self.pending = []
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+
+class KeyDelta(object):
+
+    """
+        Keys of a dict changed since the previous call, values compared
+        as they were returned by convert:
+
+            delta = KeyDelta(convert_to_dict)
+            changes, deleted = delta(namespace.vars)
+
+        The conversion of an immutable value is kept while the key holds
+        the same object. Other values may be changed in place by tasks
+        (containers filled, attributes set), they are converted on every
+        call.
+    """
+
+    def __init__(self, convert=lambda value: value):
+        self.convert = convert
+        self.last = {}
+        self.objects = {}
+
+    def __call__(self, values):
+        changes = {}
+        current = {}
+        objects = {}
+        for key, value in values.iteritems():
+            if key in self.objects and self.objects[key] is value:
+                current[key] = self.last[key]
+            else:
+                current[key] = self.convert(value)
+                if key not in self.last or self.last[key] != current[key]:
+                    changes[key] = current[key]
+            if type(value) in IMMUTABLE:
+                objects[key] = value
+        deleted = [key for key in self.last if key not in current]
+        self.last = current
+        self.objects = objects
+        return changes, deleted
+
+
+def read_journal(path, replay=True):
+
+    """ Records of the journal at path. replay - the namespace of every
+    record is rebuilt from the changes of the records before it, else
+    records are returned as written. """
+
+    namespace = {}
+    with open(path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if replay and NAMESPACE in record:
+                namespace = dict(record[NAMESPACE])
+            elif replay and CHANGES in record:
+                namespace = dict(namespace)
+                namespace.update(record.pop(CHANGES))
+                for key in record.pop(DELETED, []):
+                    namespace.pop(key, None)
+                record[NAMESPACE] = namespace
+            yield record
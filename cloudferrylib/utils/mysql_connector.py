@@ -1,18 +1,97 @@
+import os
+
 import sqlalchemy
 
+BATCH_SIZE = 500
+POOL_RECYCLE = 3600  # s
+
 
 class MysqlConnector():
-    def __init__(self, config):
+
+    """
+        Connection to a database of one cloud.
+        The engine and its connection pool are created once per process
+        (a forked child makes its own, pooled connections can't be shared
+        across processes). Besides execute() there are bulk helpers:
+
+            connector.execute_many("UPDATE user SET password = :password "
+                                   "WHERE id = :user_id", params_list)
+            connector.select_in("SELECT id, password FROM user "
+                                "WHERE id IN ({ids})", user_ids)
+    """
+
+    def __init__(self, config, db='keystone'):
         self.config = config
+        self.db = db
         self.connection_url = self.compose_connection_url()
+        self.engine = None
+        self.pid = None
 
     def compose_connection_url(self):
-        return '{}://{}:{}@{}/keystone'.format(self.config['connection'],
-                                               self.config['user'],
-                                               self.config['password'],
-                                               self.config['host'])
+        return '{}://{}:{}@{}/{}'.format(self.config['connection'],
+                                         self.config['user'],
+                                         self.config['password'],
+                                         self.config['host'],
+                                         self.db)
+
+    def get_engine(self):
+        if self.pid != os.getpid():
+            self.engine = sqlalchemy.create_engine(self.connection_url,
+                                                   pool_recycle=POOL_RECYCLE)
+            self.pid = os.getpid()
+        return self.engine
+
+    def transaction(self):
+        """ Connection in a transaction: with connector.transaction() as c """
+
+        return self.get_engine().begin()
 
     def execute(self, command, **kwargs):
-        with sqlalchemy.create_engine(
-                self.connection_url).begin() as connection:
-            return connection.execute(sqlalchemy.text(command), **kwargs)
\ No newline at end of file
+        with self.transaction() as connection:
+            result = connection.execute(sqlalchemy.text(command), **kwargs)
+            return result.fetchall() if result.returns_rows else result
+
+    def execute_many(self, command, params_list, batch_size=BATCH_SIZE):
+
+        """ Run command for every dict of params_list in one transaction. """
+
+        params_list = list(params_list)
+        if not params_list:
+            return
+        with self.transaction() as connection:
+            for i in xrange(0, len(params_list), batch_size):
+                connection.execute(sqlalchemy.text(command),
+                                   params_list[i:i + batch_size])
+
+    def select_in(self, command, values, batch_size=BATCH_SIZE, **kwargs):
+
+        """
+            Rows of command for all values, {ids} in the command is
+            replaced by the list of placeholders of one batch.
+        """
+
+        with self.transaction() as connection:
+            return self.execute_in(command, values, batch_size,
+                                   connection, **kwargs)
+
+    def execute_in(self, command, values, batch_size=BATCH_SIZE,
+                   connection=None, **kwargs):
+
+        """ Like select_in, for any statement, in a given transaction. """
+
+        if connection is None:
+            with self.transaction() as connection:
+                return self.execute_in(command, values, batch_size,
+                                       connection, **kwargs)
+        values = list(values)
+        rows = []
+        for i in xrange(0, len(values), batch_size):
+            batch = values[i:i + batch_size]
+            params = dict(('in_%s' % n, v) for n, v in enumerate(batch))
+            params.update(kwargs)
+            placeholders = ', '.join(':in_%s' % n for n in xrange(len(batch)))
+            result = connection.execute(
+                sqlalchemy.text(command.format(ids=placeholders)), **params)
+            if result.returns_rows:
+                rows.extend(result.fetchall())
+        return rows
@@ -27,6 +27,7 @@ from jinja2 import Environment, FileSystemLoader
 import os
 import inspect
 from multiprocessing import Lock
+from multiprocessing.util import Finalize
 
 
 __author__ = 'mirrorcoder'
@@ -63,6 +64,10 @@ META_INFO = 'meta'
 
 up_ssh_tunnel = None
 
+SSH_CONTROL_PERSIST = 600
+SSH_MUX_OPTS = ("-oControlMaster=auto -oControlPersist=%s "
+                "-oControlPath=/tmp/cloudferry-ssh-%%r@%%h:%%p") % SSH_CONTROL_PERSIST
+
 
 class ext_dict(dict):
     def __getattr__(self, name):
@@ -271,32 +276,79 @@ def log_step(log):
 class forward_agent:
 
     """
-        Forwarding ssh-key for access on to source and destination clouds via ssh
+        Forwarding ssh-key for access on to source and destination clouds via ssh.
+        One ssh-agent per key is started on first use and lives until
+        the end of the run, next uses only point SSH_AUTH_SOCK at it.
+        Forked children reuse the agents of the parent, agents started by
+        a process are killed when that process exits (multiprocessing
+        finalizers also run in children ending with os._exit).
     """
 
+    agents = {}
+    finalizer_pid = None
+
     def __init__(self, key_file):
         self.key_file = key_file
 
     def __enter__(self):
-        info_agent = local("eval `ssh-agent` && echo $SSH_AUTH_SOCK && ssh-add %s" %
-                           (self.key_file), capture=True).split("\n")
-        self.pid = info_agent[0].split(" ")[-1]
-        self.ssh_auth_sock = info_agent[1]
+        if self.key_file not in forward_agent.agents:
+            info_agent = local("eval `ssh-agent` && echo $SSH_AUTH_SOCK && ssh-add %s" %
+                               (self.key_file), capture=True).split("\n")
+            forward_agent.agents[self.key_file] = (info_agent[0].split(" ")[-1], info_agent[1], os.getpid())
+            if forward_agent.finalizer_pid != os.getpid():
+                forward_agent.finalizer_pid = os.getpid()
+                Finalize(None, forward_agent.kill_agents, exitpriority=0)
+        self.pid, self.ssh_auth_sock, _ = forward_agent.agents[self.key_file]
+        self.environ = dict((name, os.environ.get(name)) for name in ("SSH_AGENT_PID", "SSH_AUTH_SOCK"))
         os.environ["SSH_AGENT_PID"] = self.pid
         os.environ["SSH_AUTH_SOCK"] = self.ssh_auth_sock
 
     def __exit__(self, type, value, traceback):
-        local("kill -9 %s"%(self.pid))
-        del os.environ["SSH_AGENT_PID"]
-        del os.environ["SSH_AUTH_SOCK"]
+        for name, value in self.environ.iteritems():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+    @staticmethod
+    def kill_agents():
+        for key_file, (pid, _, owner_pid) in forward_agent.agents.items():
+            if owner_pid == os.getpid():
+                local("kill -9 %s" % pid)
+                del forward_agent.agents[key_file]
+
+
+def ssh_command(host, cmd):
+
+    """
+        Command for running cmd on host from the current fabric host.
+        Connections are multiplexed: the first one becomes master and
+        stays for SSH_CONTROL_PERSIST seconds, next commands to the host
+        don't do a new handshake. Use it for short control commands only,
+        bulk data pipes are faster on their own connections.
+    """
+
+    return "ssh -oStrictHostKeyChecking=no %s %s %s" % (SSH_MUX_OPTS, host, cmd)
 
 
 class wrapper_singletone_ssh_tunnel:
 
+    """
+        Allocates ports from interval_ssh and keeps pool of tunnels.
+        Tunnel opened in this process is kept after use and reused by
+        next users with the same (jump host, dest compute, dest controller),
+        close_tunnels() closes them at the end of the run.
+        Tunnels opened in forked children or on an explicit port are
+        closed on exit as before. A pooled tunnel whose ssh process died
+        is evicted and opened again on its next use.
+    """
+
     def __init__(self, interval_ssh="9000-9999", locker=Lock()):
         self.interval_ssh = [int(interval_ssh.split('-')[0]), int(interval_ssh.split('-')[1])]
         self.busy_port = []
         self.locker = locker
+        self.tunnels = {}
+        self.pid = os.getpid()
 
     def get_free_port(self):
         with self.locker:
@@ -314,38 +366,100 @@ class wrapper_singletone_ssh_tunnel:
             if port in self.busy_port:
                 self.busy_port.remove(port)
 
-    def __call__(self, address_dest_compute, address_dest_controller, **kwargs):
+    def acquire_tunnel(self, key):
+        with self.locker:
+            if key in self.tunnels:
+                self.tunnels[key][1] += 1
+                return self.tunnels[key][0]
+
+    def add_tunnel(self, key, port):
+        with self.locker:
+            self.tunnels[key] = [port, 1]
+
+    def release_tunnel(self, key, port):
+        with self.locker:
+            if key in self.tunnels and self.tunnels[key][0] == port:
+                self.tunnels[key][1] -= 1
+
+    def evict_tunnel(self, key, port):
+        with self.locker:
+            if key in self.tunnels and self.tunnels[key][0] == port:
+                del self.tunnels[key]
+        self.free_port(port)
+
+    def close_tunnels(self):
+        with self.locker:
+            tunnels, self.tunnels = self.tunnels, {}
+        for (host, compute, controller), (port, _) in tunnels.iteritems():
+            with settings(host_string=host):
+                up_ssh_tunnel_class.close(port, compute, controller)
+            self.free_port(port)
+
+    def __call__(self, address_dest_compute, address_dest_controller, port=None, **kwargs):
         return up_ssh_tunnel_class(address_dest_compute,
                                    address_dest_controller,
                                    self.get_free_port,
-                                   self.free_port)
+                                   self.free_port,
+                                   port,
+                                   self if not port and os.getpid() == self.pid else None)
 
 
 class up_ssh_tunnel_class:
 
     """
-        Up ssh tunnel on dest controller node for transferring data
+        Up ssh tunnel on dest controller node for transferring data.
+        port is given when it was reserved by the caller beforehand
+        (e.g. in the parent of forked transfers), such port is not freed on exit.
+        With pool the tunnel is taken from/kept in the pool.
     """
 
-    def __init__(self, address_dest_compute, address_dest_controller, callback_get, callback_free):
+    # -f with ExitOnForwardFailure returns only when forwarding is ready
+    cmd = "ssh -oStrictHostKeyChecking=no -oExitOnForwardFailure=yes -L %s:%s:22 -R %s:localhost:%s %s -Nf"
+    # [s]sh doesn't match the command line of the shell running pgrep
+    pattern = "[s]" + cmd[1:]
+
+    def __init__(self, address_dest_compute, address_dest_controller, callback_get, callback_free, port=None,
+                 pool=None):
         self.address_dest_compute = address_dest_compute
         self.address_dest_controller = address_dest_controller
-        self.get_free_port = callback_get
-        self.remove_port = callback_free
-        self.cmd = "ssh -oStrictHostKeyChecking=no -L %s:%s:22 -R %s:localhost:%s %s -Nf"
+        self.get_free_port = callback_get if not port else lambda: port
+        self.remove_port = callback_free if not port else lambda port: None
+        self.pool = pool
+        self.key = None
 
     def __enter__(self):
+        if self.pool:
+            self.key = (env.host_string, self.address_dest_compute, self.address_dest_controller)
+            self.port = self.pool.acquire_tunnel(self.key)
+            if self.port and self.is_alive(self.port, self.address_dest_compute, self.address_dest_controller):
+                return self.port
+            if self.port:
+                self.pool.evict_tunnel(self.key, self.port)
         self.port = self.get_free_port()
         run(self.cmd % (self.port, self.address_dest_compute, self.port, self.port,
-                        self.address_dest_controller) + " && sleep 2")
+                        self.address_dest_controller))
+        if self.pool:
+            self.pool.add_tunnel(self.key, self.port)
         return self.port
 
     def __exit__(self, type, value, traceback):
-        run(("pkill -f '"+self.cmd+"'") % (self.port, self.address_dest_compute, self.port, self.port,
-                                           self.address_dest_controller))
-        time.sleep(2)
+        if self.pool:
+            self.pool.release_tunnel(self.key, self.port)
+            return
+        self.close(self.port, self.address_dest_compute, self.address_dest_controller)
         self.remove_port(self.port)
 
+    @classmethod
+    def is_alive(cls, port, address_dest_compute, address_dest_controller):
+        with settings(warn_only=True):
+            return run(("pgrep -f '"+cls.pattern+"'") % (port, address_dest_compute, port, port,
+                                                         address_dest_controller)).succeeded
+
+    @classmethod
+    def close(cls, port, address_dest_compute, address_dest_controller):
+        run(("pkill -f '"+cls.cmd+"'") % (port, address_dest_compute, port, port,
+                                          address_dest_controller))
+
 
 class ChecksumImageInvalid(Exception):
     def __init__(self, checksum_source, checksum_dest):
@@ -371,8 +485,7 @@ def write_info(rendered_info, info_file = "source_info.html"):
 def get_libvirt_block_info(libvirt_name, init_host, compute_host):
     with settings(host_string=init_host):
         with forward_agent(env.key_filename):
-            out = run("ssh -oStrictHostKeyChecking=no %s 'virsh domblklist %s'" %
-                      (compute_host, libvirt_name))
+            out = run(ssh_command(compute_host, "'virsh domblklist %s'" % libvirt_name))
             libvirt_output = out.split()
     return libvirt_output
 
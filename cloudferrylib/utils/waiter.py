@@ -0,0 +1,205 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import os
+import sys
+import threading
+import time
+
+from cloudferrylib.scheduler.executor import Future
+
+__author__ = 'mirrorcoder'
+
+DEFAULT_TIMEOUT = 3600  # s, None - wait indefinitely
+MIN_INTERVAL = 1
+MAX_INTERVAL = 30
+BACKOFF = 2
+# with fewer waits on one manager single GETs are cheaper than a listing
+MIN_WAITS_FOR_LIST = 2
+# a detailed listing of this many resources costs about one GET
+LIST_ITEMS_PER_GET = 100
+ERROR_STATUSES = ('error', 'killed')
+
+
+class WaitException(Exception):
+    def __init__(self, status_obj, exp_status, msg):
+        super(WaitException, self).__init__(status_obj, exp_status, msg)
+        self.status_obj = status_obj
+        self.exp_status = exp_status
+        self.msg = msg
+
+
+class TimeoutException(WaitException):
+    pass
+
+
+class ErrorStatusException(WaitException):
+    pass
+
+
+class Wait(object):
+    def __init__(self, id_res, status, timeout):
+        self.id = id_res
+        self.status = status.lower()
+        self.deadline = time.time() + timeout if timeout is not None else None
+        self.interval = MIN_INTERVAL
+        self.next_check = time.time()
+        self.last_status = None
+        self.future = Future()
+
+    def check(self, status, now):
+        self.last_status = status.lower()
+        if self.last_status == self.status:
+            self.future.set_result(self.last_status)
+        elif self.last_status in ERROR_STATUSES:
+            self.future.set_exception(self.exc_info(ErrorStatusException(
+                self.last_status, self.status, "Resource %s is in error state" % self.id)))
+        elif self.deadline is not None and now >= self.deadline:
+            self.future.set_exception(self.exc_info(TimeoutException(
+                self.last_status, self.status, "Timeout exp")))
+        else:
+            self.interval = min(self.interval * BACKOFF, MAX_INTERVAL)
+            self.next_check = now + self.interval
+            if self.deadline is not None:
+                self.next_check = min(self.next_check, self.deadline)
+            return False
+        return True
+
+    @staticmethod
+    def exc_info(e):
+        try:
+            raise e
+        except Exception:
+            return sys.exc_info()
+
+
+class StatusWaiter(object):
+
+    """
+        One poller thread for all waits of the process.
+        Every tick the statuses of all due waits on one manager
+        (client.servers, client.volumes, client.images) are taken
+        with a single list(detailed=True) call when that is cheaper than
+        a get() per wait: the manager's last listing had fewer than
+        LIST_ITEMS_PER_GET resources per due wait. Resources missing
+        from the listing are read by get(). The interval of every wait
+        grows exponentially up to MAX_INTERVAL and is cut at the
+        deadline, the wait fails with TimeoutException at its deadline,
+        timeout None waits indefinitely.
+    """
+
+    def __init__(self):
+        self.waits = {}
+        self.managers = {}
+        # number of resources in the last listing of a manager
+        self.sizes = {}
+        self.cond = threading.Condition()
+        self.thread = None
+
+    def wait(self, getter, id_res, status, timeout=DEFAULT_TIMEOUT, callback=None):
+        w = Wait(id_res, status, timeout)
+        if callback:
+            w.future.add_done_callback(callback)
+        with self.cond:
+            self.managers[id(getter)] = getter
+            self.waits.setdefault(id(getter), []).append(w)
+            if not self.thread:
+                self.thread = threading.Thread(target=self.__poll)
+                self.thread.daemon = True
+                self.thread.start()
+            self.cond.notify()
+        return w.future
+
+    def __poll(self):
+        while True:
+            with self.cond:
+                while not self.waits:
+                    self.cond.wait()
+                now = time.time()
+                next_check = min(w.next_check for waits in self.waits.values() for w in waits)
+                if next_check > now:
+                    self.cond.wait(next_check - now)
+                    continue
+                due = dict((key, [w for w in waits if w.next_check <= now])
+                           for key, waits in self.waits.items())
+            for key, waits in due.items():
+                if waits:
+                    self.__check(self.managers[key], waits)
+            with self.cond:
+                for key in due:
+                    self.waits[key] = [w for w in self.waits[key] if not w.future.done()]
+                    if not self.waits[key]:
+                        del self.waits[key]
+                        del self.managers[key]
+
+    def __check(self, getter, waits):
+        statuses = {}
+        if self.__is_list_cheaper(getter, len(waits)):
+            statuses = self.__list_statuses(getter)
+            self.sizes[id(getter)] = len(statuses)
+        now = time.time()
+        for w in waits:
+            try:
+                status = statuses[w.id] if w.id in statuses else getter.get(w.id).status
+                w.check(status, now)
+            except Exception:
+                w.future.set_exception(sys.exc_info())
+
+    def __is_list_cheaper(self, getter, count):
+        if count < MIN_WAITS_FOR_LIST:
+            return False
+        size = self.sizes.get(id(getter))
+        return size is None or size < count * LIST_ITEMS_PER_GET
+
+    @staticmethod
+    def __list_statuses(getter):
+        try:
+            try:
+                items = getter.list(detailed=True, search_opts={'all_tenants': 1})
+            except TypeError:
+                items = getter.list()
+            return dict((item.id, item.status) for item in items)
+        except Exception:
+            return {}
+
+
+_waiter = {'pid': None, 'waiter': None, 'timeout': DEFAULT_TIMEOUT}
+
+
+def init_waiter(timeout):
+
+    """ Default timeout of the waits in seconds, 0 - wait indefinitely. """
+
+    _waiter['timeout'] = timeout or None
+
+
+def get_waiter():
+    # poller thread is not inherited by forked processes
+    if _waiter['pid'] != os.getpid():
+        _waiter['pid'] = os.getpid()
+        _waiter['waiter'] = StatusWaiter()
+    return _waiter['waiter']
+
+
+def wait_for_status_async(getter, id_res, status, timeout=None, callback=None):
+
+    """ timeout - seconds, by default the one set by init_waiter. """
+
+    if timeout is None:
+        timeout = _waiter['timeout']
+    return get_waiter().wait(getter, id_res, status, timeout, callback)
+
+
+def wait_for_status(getter, id_res, status, timeout=None):
+    return wait_for_status_async(getter, id_res, status, timeout).result()
@@ -12,12 +12,18 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+import json
+
 from fabric.api import task, env
 from cloudferrylib.scheduler.namespace import Namespace
 from cloudferrylib.scheduler.scheduler import Scheduler
+from cloudferrylib.scheduler import executor
 import cfglib
 from utils import get_log
+from cloudferrylib.utils import bandwidth
 from cloudferrylib.utils import utils
+from cloudferrylib.utils import journal
+from cloudferrylib.utils import waiter
 from cloud import cloud_ferry
 env.forward_agent = True
 env.user = 'root'
@@ -32,9 +38,15 @@ def migrate(name_config=None, name_instance=None):
     cfglib.collector_configs_plugins()
     cfglib.init_config(name_config)
     utils.init_singletones(cfglib.CONF)
+    executor.init_executor(cfglib.CONF)
+    bandwidth.init_bandwidth(cfglib.CONF.migrate.speed_limit_total)
+    waiter.init_waiter(cfglib.CONF.migrate.wait_timeout)
     env.key_filename = cfglib.CONF.migrate.key_filename
     cloud = cloud_ferry.CloudFerry(cfglib.CONF)
-    cloud.migrate()
+    try:
+        cloud.migrate()
+    finally:
+        utils.up_ssh_tunnel.close_tunnels()
 
 
 @task
@@ -43,5 +55,16 @@ def get_info(name_config):
     namespace = Namespace({'name_config': name_config})
     scheduler = Scheduler(namespace)
 
+
+@task
+def show_journal(path, full=False):
+    """
+        :path - transaction journal, example 'transaction/instances/<id>/tasks.trans'
+        :full - print the namespace of every record, not the changed keys only
+    """
+    full = str(full).lower() in ('true', '1', 'yes')
+    for record in journal.read_journal(path, replay=full):
+        print json.dumps(record, sort_keys=True)
+
 if __name__ == '__main__':
     migrate(None)
@@ -12,14 +12,15 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
-import time
 import json
 
-from utils import forward_agent, CEPH, REMOTE_FILE, log_step, get_log
+from utils import forward_agent, ssh_command, CEPH, REMOTE_FILE, log_step, get_log
 from scheduler.builder_wrapper import inspect_func, supertask
 from fabric.api import run, settings, env, cd
 from migrationlib.os.utils.osVolumeTransfer import VolumeTransferDirectly, VolumeTransferViaImage
 from migrationlib.os.utils.osImageTransfer import ImageTransfer
+from cloudferrylib.utils import waiter
+from cloudferrylib.os.network.port_index import PortIndex
 
 __author__ = 'mirrorcoder'
 
@@ -37,11 +38,13 @@ class osBuilderExporter:
     data -- main dictionary for filling with information from source cloud
     """
 
-    def __init__(self, glance_client, cinder_client, nova_client, network_client, instance, config, data=dict()):
+    def __init__(self, glance_client, cinder_client, nova_client, network_client, instance, config, data=dict(),
+                 ports=None):
         self.glance_client = glance_client
         self.cinder_client = cinder_client
         self.nova_client = nova_client
         self.network_client = network_client
+        self.ports = ports if ports else PortIndex(lambda: network_client.list_ports()["ports"])
         self.config = config
         self.instance = instance
         self.funcs = []
@@ -334,8 +337,7 @@ class osBuilderExporter:
         source_disk = None
         with settings(host_string=self.config['host']):
             with forward_agent(env.key_filename):
-                out = run("ssh -oStrictHostKeyChecking=no %s 'virsh domblklist %s'" %
-                          (disk_host, libvirt_name))
+                out = run(ssh_command(disk_host, "'virsh domblklist %s'" % libvirt_name))
                 source_out = out.split()
                 path_disk = (DISK + LOCAL) if is_ephemeral else DISK
                 if volume_id:
@@ -368,9 +370,9 @@ class osBuilderExporter:
             return lambda x: next(list_mac)
 
     def __get_mac_by_ip(self, ip_address):
-        for port in self.port_list:
-            if port["fixed_ips"][0]["ip_address"] == ip_address:
-                return port["mac_address"]
+        port = self.ports.by_ip(ip_address)
+        if port:
+            return port["mac_address"]
 
     def __get_mac_nova_network(self, instance):
         compute_node = getattr(instance, 'OS-EXT-SRV-ATTR:host')
@@ -378,8 +380,7 @@ class osBuilderExporter:
         with settings(host_string=self.config['host']):
             with forward_agent(env.key_filename):
                 cmd = "virsh dumpxml %s | grep 'mac address' | cut -d\\' -f2" % libvirt_name
-                out = run("ssh -oStrictHostKeyChecking=no %s %s" %
-                          (compute_node, cmd))
+                out = run(ssh_command(compute_node, cmd))
                 mac_addresses=out.split()
         mac_iter = iter(mac_addresses)
         return mac_iter
@@ -388,17 +389,4 @@ class osBuilderExporter:
         return getter.get(id).status
 
     def __wait_for_status(self, getter, id, status):
-        while self.__get_status(getter, id) != status:
-            time.sleep(1)
-
-    def __getattr__(self, item):
-        list_getters = {
-            'port_list': lambda: self.network_client.list_ports()["ports"]
-        }
-        getter = None
-        if item in list_getters:
-            getter = list_getters[item]
-        if getter is None:
-            raise AttributeError("Exporter has no attribute %s" % item)
-
-        return getter()
+        waiter.wait_for_status(getter, id, status)
@@ -14,6 +14,7 @@
 
 from migrationlib.os import osCommon
 from osBuilderExporter import osBuilderExporter
+from cloudferrylib.os.network.port_index import PortIndex
 
 from utils import log_step, get_log
 
@@ -31,6 +32,7 @@ class Exporter(osCommon.osCommon):
         self.config = config['clouds']['source']
         self.config_to = config['clouds']['destination']
         super(Exporter, self).__init__(self.config)
+        self.ports = PortIndex(lambda: self.network_client.list_ports()["ports"])
 
     @log_step(LOG)
     def find_instances(self, search_opts):
@@ -47,7 +49,8 @@ class Exporter(osCommon.osCommon):
                                     self.nova_client,
                                     self.network_client,
                                     instance,
-                                    self.config)
+                                    self.config,
+                                    ports=self.ports)
         return self.get_algorithm_export()(builder)
 
     def get_algorithm_export(self):
@@ -12,15 +12,21 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
-
-import time
-
+from cloudferrylib.os.network.port_index import PortIndex
+from cloudferrylib.os.storage.cinder_db import CinderDBWriter
+from cloudferrylib.utils.catalog import Catalog
+from cloudferrylib.utils.mysql_connector import MysqlConnector
+from migrationlib.os.utils.ChunkedTransfer import ChunkedImageTransfer, DEFAULT_JOURNAL_DIR
 from migrationlib.os.utils.FileLikeProxy import FileLikeProxy
-from utils import forward_agent, up_ssh_tunnel, ChecksumImageInvalid, \
+from migrationlib.os.utils.ImageStore import ImageStore, DEST_IMAGE, BASE_IMAGE, STORE_FILE
+from utils import forward_agent, ssh_command, up_ssh_tunnel, ChecksumImageInvalid, \
     CEPH, REMOTE_FILE, QCOW2, log_step, get_log
 from fabric.api import run, settings, env
+from glanceclient import exc as glance_exc
 from migrationlib.os.osCommon import osCommon
+from cloudferrylib.utils import waiter
 import ipaddr
+import os
 
 
 
@@ -34,6 +40,16 @@ LEN_UUID_INSTANCE = 36
 TEMP_PREFIX = ".temp"
 
 
+def get_journal_dir(config):
+    return config.get('glance_journal_dir') or DEFAULT_JOURNAL_DIR
+
+
+def get_image_store(config):
+    path = config.get('image_store') or \
+        os.path.join(get_journal_dir(config), STORE_FILE)
+    return ImageStore(path)
+
+
 class osBuilderImporter:
 
     """
@@ -51,9 +67,14 @@ class osBuilderImporter:
                  data,
                  data_for_instance=None,
                  instance=None,
-                 volumes=None):
+                 volumes=None,
+                 images=None,
+                 store=None):
         self.keystone_client = keystone_client
         self.glance_client = glance_client
+        self.images = images if images else Catalog(lambda: glance_client.images.list(),
+                                                    ('id', 'checksum'))
+        self.store = store if store else get_image_store(config)
         self.cinder_client = cinder_client
         self.nova_client = nova_client
         self.network_client = network_client
@@ -221,6 +242,7 @@ class osBuilderImporter:
         data_for_instance = data_for_instance if data_for_instance else self.data_for_instance
         uuid_image = data_for_instance["block_device_mapping_v2"][0]["uuid"]
         self.glance_client.images.delete(uuid_image)
+        self.images.remove('id', uuid_image)
         data['image'].delete()
         return self
 
@@ -290,23 +312,21 @@ class osBuilderImporter:
         host = getattr(instance, 'OS-EXT-SRV-ATTR:host')
         with settings(host_string=self.config['host']):
             with forward_agent(env.key_filename):
-                run("ssh -oStrictHostKeyChecking=no %s  'qemu-img create -f %s -b %s %s'" %
-                    (host, format_file, backing_file, diff_file))
+                run(ssh_command(host, "'qemu-img create -f %s -b %s %s'" % (format_file, backing_file, diff_file)))
 
     @log_step(LOG)
     def __delete_remote_file_on_compute(self, path_file, instance):
         host = getattr(instance, 'OS-EXT-SRV-ATTR:host')
         with settings(host_string=self.config['host']):
             with forward_agent(env.key_filename):
-                run("ssh -oStrictHostKeyChecking=no %s  'rm -rf %s'" % (host, path_file))
+                run(ssh_command(host, "'rm -rf %s'" % path_file))
 
     @log_step(LOG)
     def __convert_file(self, instance, from_file, to_file, format_file):
         host = getattr(instance, 'OS-EXT-SRV-ATTR:host')
         with settings(host_string=self.config['host']):
             with forward_agent(env.key_filename):
-                run("ssh -oStrictHostKeyChecking=no %s  'qemu-img convert -O %s %s %s'" %
-                    (host, format_file, from_file, to_file))
+                run(ssh_command(host, "'qemu-img convert -O %s %s %s'" % (format_file, from_file, to_file)))
 
     @inspect_func
     @log_step(LOG)
@@ -343,7 +363,7 @@ class osBuilderImporter:
                                           data_for_instance,
                                           self.config['host'],
                                           dest_path=self.config['temp'])
-        self.__download_image_from_glance(data_for_instance, diff_disk_path)
+        self.__get_base_image(data_for_instance, diff_disk_path)
         self.__diff_rebase("%s/baseimage" % diff_disk_path, "%s/disk" % diff_disk_path)
         self.__diff_commit(diff_disk_path)
         if self.config['glance']['convert_to_raw']:
@@ -369,19 +389,49 @@ class osBuilderImporter:
         return dest_path
 
     @log_step(LOG)
-    def __download_image_from_glance(self, data_for_instance, dest_path):
-        baseimage_id = data_for_instance["image"].id
+    def __get_base_image(self, data_for_instance, dest_path):
+        image = data_for_instance["image"]
+        if not image.checksum:
+            self.__download_image_from_glance(image.id, "%s/baseimage" % dest_path)
+            return
+        base_path = self.store.fetch(BASE_IMAGE, image.checksum,
+                                     lambda: self.__cache_base_image(image),
+                                     self.__is_base_image_cached)
+        with settings(host_string=self.config['host']):
+            with forward_agent(env.key_filename):
+                run("cp %s %s/baseimage" % (base_path, dest_path))
+
+    @log_step(LOG)
+    def __cache_base_image(self, image):
+        base_dir = "%s/%s" % (self.config['temp'], BASE_IMAGE)
+        base_path = "%s/%s" % (base_dir, image.checksum)
+        with settings(host_string=self.config['host']):
+            with forward_agent(env.key_filename):
+                run("mkdir -p %s" % base_dir)
+        self.__download_image_from_glance(image.id, base_path + TEMP_PREFIX)
+        with settings(host_string=self.config['host']):
+            with forward_agent(env.key_filename):
+                run("mv -f %s%s %s" % (base_path, TEMP_PREFIX, base_path))
+        return base_path
+
+    def __is_base_image_cached(self, base_path):
+        with settings(host_string=self.config['host'], warn_only=True):
+            with forward_agent(env.key_filename):
+                return run("test -f %s" % base_path).succeeded
+
+    @log_step(LOG)
+    def __download_image_from_glance(self, image_id, dest_file):
         with settings(host_string=self.config['host']):
             with forward_agent(env.key_filename):
                 run(("glance --os-username=%s --os-password=%s --os-tenant-name=%s " +
                      "--os-auth-url=http://%s:35357/v2.0 " +
-                    "image-download %s > %s/baseimage") %
+                    "image-download %s > %s") %
                     (self.config['user'],
                      self.config['password'],
                      self.config['tenant'],
                      self.config['host'],
-                     baseimage_id,
-                     dest_path))
+                     image_id,
+                     dest_file))
 
     @log_step(LOG)
     def __diff_commit(self, dest_path):
@@ -402,8 +452,8 @@ class osBuilderImporter:
         host = getattr(instance, 'OS-EXT-SRV-ATTR:host')
         with settings(host_string=self.config['host']):
             with forward_agent(env.key_filename):
-                out = run("ssh -oStrictHostKeyChecking=no %s 'qemu-img info %s | grep \"backing file\"'" %
-                          (host, dest_disk_ephemeral)).split('\n')
+                out = run(ssh_command(host, "'qemu-img info %s | grep \"backing file\"'" %
+                                      dest_disk_ephemeral)).split('\n')
                 backing_file = ""
                 for i in out:
                     line_out = i.split(":")
@@ -438,7 +488,7 @@ class osBuilderImporter:
             with forward_agent(env.key_filename):
                 if instance:
                     host = getattr(instance, 'OS-EXT-SRV-ATTR:host')
-                    run("ssh -oStrictHostKeyChecking=no %s '%s'" % (host, cmd))
+                    run(ssh_command(host, "'%s'" % cmd))
                 else:
                     run(cmd)
 
@@ -450,7 +500,7 @@ class osBuilderImporter:
         dest_disk = None
         with settings(host_string=self.config['host']):
             with forward_agent(env.key_filename):
-                out = run("ssh -oStrictHostKeyChecking=no %s 'virsh domblklist %s'" % (host, dest_instance_name))
+                out = run(ssh_command(host, "'virsh domblklist %s'" % dest_instance_name))
                 dest_output = out.split()
                 path_disk = (DISK + LOCAL) if is_ephemeral else DISK
                 if volume_id:
@@ -470,10 +520,9 @@ class osBuilderImporter:
     def __transfer_remote_file(self, instance, disk_host, source_disk, dest_disk, ssh_port=None):
         LOG.debug("| | copy file")
         host = getattr(instance, 'OS-EXT-SRV-ATTR:host')
-        ssh_port = ssh_port if ssh_port else self.config_from['ssh_transfer_port']
         with settings(host_string=self.config_from['host']):
             with forward_agent(env.key_filename):
-                with up_ssh_tunnel(host, self.config['host'], ssh_port):
+                with up_ssh_tunnel(host, self.config['host'], ssh_port) as ssh_port:
                     if self.config['transfer_file']['compression'] == "dd":
                         run(("ssh -oStrictHostKeyChecking=no %s 'dd bs=1M if=%s' " +
                              "| ssh -oStrictHostKeyChecking=no -p %s localhost 'dd bs=1M of=%s'") %
@@ -699,11 +748,10 @@ class osBuilderImporter:
     def __transfer_volume_from_ceph_to_iscsi(self, source_volume, dest_volume_path, instance=None,
                                              source_ceph_pool='volumes', ssh_port=None):
         instance = instance if instance else self.instance
-        ssh_port = ssh_port if ssh_port else self.config_from['ssh_transfer_port']
         host = getattr(instance, 'OS-EXT-SRV-ATTR:host')
         with settings(host_string=self.config_from['host']):
             with forward_agent(env.key_filename):
-                with up_ssh_tunnel(host, self.config['host'], ssh_port):
+                with up_ssh_tunnel(host, self.config['host'], ssh_port) as ssh_port:
                     run(("rbd export -p %s volume-%s - | ssh -oStrictHostKeyChecking=no -p %s localhost " +
                          "'dd bs=1M of=%s'") % (source_ceph_pool, source_volume.id, ssh_port, dest_volume_path))
 
@@ -785,6 +833,7 @@ class osBuilderImporter:
     def transfer_volumes_via_glance(self, data=None, **kwargs):
         data = data if data else self.data
         volumes = data['volumes']
+        db_writer = CinderDBWriter(self.__get_cinder_db_connector())
         for source_volume in volumes:
             LOG.debug("      volume %s" % source_volume.__dict__)
             image = self.__copy_from_glance_to_glance(source_volume)
@@ -796,13 +845,17 @@ class osBuilderImporter:
                                                         imageRef=image.id)
             LOG.debug("        wait for available")
             self.__wait_for_status(self.cinder_client.volumes, volume.id, 'available')
-            LOG.debug("        update volume")
-            self.__patch_option_bootable_of_volume(volume.id, source_volume.bootable)
+            db_writer.patch_bootable(volume.id, source_volume.bootable)
             LOG.debug("        delete image on source cloud")
             source_volume.delete()
             LOG.debug("        delete image on dest cloud")
             self.glance_client.images.delete(image.id)
             self.volumes.append(volume)
+        LOG.debug("        update volumes")
+        if db_writer.mysql_connector:
+            db_writer.flush()
+        elif db_writer.bootable:
+            self.__cmd_mysql_on_dest_controller('use cinder;' + db_writer.pop_script())
         return self
 
     @inspect_func
@@ -821,10 +874,22 @@ class osBuilderImporter:
             LOG.debug("        done")
         return self
 
-    @log_step(LOG)
-    def __patch_option_bootable_of_volume(self, volume_id, bootable):
-        cmd = 'use cinder;update volumes set volumes.bootable=%s where volumes.id="%s"' % (int(bootable), volume_id)
-        self.__cmd_mysql_on_dest_controller(cmd)
+    def __get_cinder_db_connector(self):
+
+        """ Connector to the cinder db of the destination cloud, built from
+        cinder:connection and the mysql user of the yaml config. None if
+        cinder:connection is not set: then the patches are run by mysql
+        on the destination controller over ssh. """
+
+        connection = self.config['cinder'].get('connection')
+        if not connection:
+            return None
+        mysql = self.config['mysql']
+        return MysqlConnector({'connection': connection,
+                               'user': mysql['user'],
+                               'password': mysql['password'] or '',
+                               'host': mysql.get('host') or self.config['host']},
+                              'cinder')
 
     def __cmd_mysql_on_dest_controller(self, cmd):
         with settings(host_string=self.config['host']):
@@ -849,30 +914,63 @@ class osBuilderImporter:
     @log_step(LOG)
     def __get_image(self, image_transfer):
         checksum = image_transfer.checksum
-        for image in self.glance_client.images.list():
-            if image.checksum == checksum:
-                return image
+        image = self.images.get('checksum', checksum)
+        if image:
+            return image
+        image_id = self.store.fetch(DEST_IMAGE, checksum,
+                                    lambda: self.__import_image(image_transfer).id,
+                                    lambda image_id: self.__is_image_imported(image_id, checksum))
+        image = self.images.get('id', image_id)
+        if not image:
+            image = self.images.add(self.glance_client.images.get(image_id))
+        return image
+
+    @log_step(LOG)
+    def __import_image(self, image_transfer):
+        checksum = image_transfer.checksum
         LOG.debug("Data image = %s", image_transfer.__dict__)
         image_dest = self.__copy_from_glance_to_glance(image_transfer)
         LOG.debug("image data = %s", image_dest)
         if image_dest.checksum != checksum:
             LOG.error("Checksums is not equ")
             raise ChecksumImageInvalid(checksum, image_dest.checksum)
-        return image_dest
+        return self.images.add(image_dest)
+
+    def __is_image_imported(self, image_id, checksum):
+        try:
+            image = self.glance_client.images.get(image_id)
+        except glance_exc.HTTPNotFound:
+            return False
+        return image.status == 'active' and image.checksum == checksum
 
     @log_step(LOG)
     def __copy_from_glance_to_glance(self, transfer_object):
         info_image_source = transfer_object.get_info_image()
-        # TODO: added check of checksum on source and dest clouds
-        return self.glance_client.images.create(name=info_image_source.name + "Migrate",
-                                                container_format=info_image_source.container_format,
-                                                disk_format=info_image_source.disk_format,
-                                                is_public=info_image_source.is_public,
-                                                protected=info_image_source.protected,
-                                                data=FileLikeProxy(transfer_object,
-                                                                   self.__callback_print_progress,
-                                                                   self.config['speed_limit']),
-                                                size=info_image_source.size)
+        chunk_size = self.config.get('glance_chunk_size')
+        transfer = None
+        if chunk_size and info_image_source.size:
+            transfer = ChunkedImageTransfer(transfer_object.get_ref_image_range,
+                                            {'id': info_image_source.id,
+                                             'name': info_image_source.name,
+                                             'size': info_image_source.size,
+                                             'checksum': info_image_source.checksum},
+                                            get_journal_dir(self.config),
+                                            chunk_size * 1024 * 1024)
+            data = transfer.proxy(self.__callback_print_progress, self.config['speed_limit'])
+        else:
+            data = FileLikeProxy(transfer_object,
+                                 self.__callback_print_progress,
+                                 self.config['speed_limit'])
+        image_dest = self.glance_client.images.create(name=info_image_source.name + "Migrate",
+                                                      container_format=info_image_source.container_format,
+                                                      disk_format=info_image_source.disk_format,
+                                                      is_public=info_image_source.is_public,
+                                                      protected=info_image_source.protected,
+                                                      data=data,
+                                                      size=info_image_source.size)
+        if transfer:
+            transfer.cleanup()
+        return image_dest
 
     def __callback_print_progress(self, size, length, id, name):
         LOG.info("Download {0} bytes of {1} ({2}%) - id = {3} name = {4}"
@@ -899,6 +997,7 @@ class osBuilderImporter:
         LOG.debug("networks_info %s" % networks_info)
         params = []
         keep_ip = self.config['keep_ip']
+        ports = PortIndex(lambda: self.network_client.list_ports(fields=['network_id', 'mac_address', 'id'])['ports'])
         for i in range(0, len(networks_info)):
             net_overwrite = self.config['import_rules']['overwrite']['networks']
             if not keep_ip and net_overwrite and (len(net_overwrite) > i):
@@ -907,11 +1006,7 @@ class osBuilderImporter:
                 network_info = networks_info[i]
             network = self.__get_network(network_info, keep_ip=keep_ip)
             LOG.debug("    network %s [%s]" % (network['name'], network['id']))
-            for item in self.network_client.list_ports(fields=['network_id', 'mac_address', 'id'])['ports']:
-                if (item['network_id'] == network['id']) and (item['mac_address'] == networks_info[i]['mac']):
-                    LOG.warn("Port with network_id exists after prev run of script %s" % item)
-                    LOG.warn("and will be delete")
-                    self.network_client.delete_port(item['id'])
+            self.__delete_exist_port(ports, network, i, networks_info)
             sg_ids = []
             for sg in self.nova_client.security_groups.list():
                 if sg.name in security_groups:
@@ -926,12 +1021,12 @@ class osBuilderImporter:
         return params
 
     @log_step(LOG)
-    def __delete_exist_port(self, network, index, networks_info):
-        for item in self.network_client.list_ports(fields=['network_id', 'mac_address', 'id'])['ports']:
-            if (item['network_id'] == network['id']) and (item['mac_address'] == networks_info[index]['mac']):
-                LOG.warn("Port with network_id exists after prev run of script %s" % item)
-                LOG.warn("and will be delete")
-                self.network_client.delete_port(item['id'])
+    def __delete_exist_port(self, ports, network, index, networks_info):
+        for item in ports.by_mac(network['id'], networks_info[index]['mac']):
+            LOG.warn("Port with network_id exists after prev run of script %s" % item)
+            LOG.warn("and will be delete")
+            self.network_client.delete_port(item['id'])
+            ports.remove(item)
 
     @log_step(LOG)
     def __processing_network_info(self, index, networks_info):
@@ -967,5 +1062,4 @@ class osBuilderImporter:
 
 
     def __wait_for_status(self, getter, id, status):
-        while getter.get(id).status != status:
-            time.sleep(1)
+        waiter.wait_for_status(getter, id, status)
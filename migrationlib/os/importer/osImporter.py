@@ -12,8 +12,9 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+from cloudferrylib.utils.catalog import Catalog
 from migrationlib.os import osCommon
-from osBuilderImporter import osBuilderImporter
+from osBuilderImporter import osBuilderImporter, get_image_store
 from utils import ChecksumImageInvalid, ISCSI, CEPH, BOOT_FROM_IMAGE, \
     BOOT_FROM_VOLUME, ANY, NO, EPHEMERAL, REMOTE_FILE, YES, log_step, get_log
 
@@ -46,6 +47,8 @@ class Importer(osCommon.osCommon):
         self.config = config['clouds']['destination']
         self.config_from = config['clouds']['source']
         super(Importer, self).__init__(self.config)
+        self.images = Catalog(lambda: self.glance_client.images.list(), ('id', 'checksum'))
+        self.store = get_image_store(self.config)
 
     def clean_cloud(self, delete_images=False):
         for inst in self.nova_client.servers.list():
@@ -55,6 +58,7 @@ class Importer(osCommon.osCommon):
         if delete_images:
             for image in self.glance_client.images.list():
                 self.glance_client.images.delete(image.id)
+            self.images.invalidate()
 
     @log_step(LOG)
     def upload(self, data):
@@ -69,7 +73,9 @@ class Importer(osCommon.osCommon):
                                             self.network_client,
                                             self.config,
                                             self.config_from,
-                                            data)
+                                            data,
+                                            images=self.images,
+                                            store=self.store)
         return self.get_algorithm_import(data)(builderImporter)
 
     @log_step(LOG)
@@ -0,0 +1,248 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import hashlib
+import json
+import os
+import time
+
+from migrationlib.os.utils.FileLikeProxy import FileLikeProxy
+from utils import get_log
+
+__author__ = 'mirrorcoder'
+
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024  # B
+DEFAULT_JOURNAL_DIR = '/tmp/cloudferry-images'
+READ_SIZE = 512 * 1024  # B
+RETRIES = 5
+MAX_RETRY_INTERVAL = 30  # s
+HTTP_PARTIAL_CONTENT = 206
+
+LOG = get_log(__name__)
+
+
+class ChecksumMismatch(Exception):
+    def __init__(self, image_id, checksum_src, checksum_dst):
+        super(ChecksumMismatch, self).__init__(image_id, checksum_src,
+                                               checksum_dst)
+        self.image_id = image_id
+        self.checksum_src = checksum_src
+        self.checksum_dst = checksum_dst
+
+
+class ImageJournal(object):
+
+    """
+        Local journal of a chunked image transfer, <journal_dir>/<id>.json
+        keeps offset and md5 of every chunk streamed to the destination.
+        No image data is kept on local disk. The journal is rewritten
+        atomically after each chunk and is only reused while checksum,
+        size and chunk size of the image match.
+    """
+
+    def __init__(self, journal_dir, image_id, checksum, size, chunk_size):
+        self.path = os.path.join(journal_dir, "%s.json" % image_id)
+        self.header = {'id': image_id,
+                       'checksum': checksum,
+                       'size': size,
+                       'chunk_size': chunk_size}
+        self.chunks = []
+        if not os.path.isdir(journal_dir):
+            os.makedirs(journal_dir)
+
+    def load(self):
+        self.chunks = []
+        if not os.path.exists(self.path):
+            return self.chunks
+        try:
+            with open(self.path) as f:
+                journal = json.load(f)
+        except ValueError:
+            LOG.warning("Journal %s is corrupted, starting over", self.path)
+            return self.chunks
+        if all(journal.get(k) == v for k, v in self.header.iteritems()):
+            self.chunks = journal['chunks']
+        return self.chunks
+
+    def add(self, offset, md5):
+        self.chunks.append([offset, md5])
+        self.save()
+
+    def truncate(self, count):
+        del self.chunks[count:]
+        self.save()
+
+    def save(self):
+        journal = dict(self.header, chunks=self.chunks)
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(journal, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class ChunkedImageTransfer(object):
+
+    """
+        Glance image read by range requests, chunk by chunk, and streamed
+        straight into the upload to the destination Glance.
+        get_range(start, end) returns a response of the source image for
+        the bytes start..end inclusive (206 Partial Content, or 200 with the
+        whole image if the server ignores Range). A broken read is retried
+        with backoff by a new range request from the current offset, so the
+        upload goes on. Offset and md5 of every chunk are kept in
+        ImageJournal, a restarted transfer checks the chunks it reads again
+        against it. The md5 of the whole image is checked against the
+        source checksum at the end of the stream, the last read raises
+        ChecksumMismatch on mismatch:
+
+            transfer = ChunkedImageTransfer(get_range, image, journal_dir)
+            glance_client.images.create(..., data=transfer.proxy(callback))
+            transfer.cleanup()
+
+        Glance v1 uploads can't be resumed, a failed upload is restarted
+        from the first chunk.
+    """
+
+    def __init__(self, get_range, image, journal_dir,
+                 chunk_size=DEFAULT_CHUNK_SIZE, retries=RETRIES):
+        self.get_range = get_range
+        self.id = image['id']
+        self.name = image['name']
+        self.size = image['size']
+        self.checksum = image['checksum']
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.journal = ImageJournal(journal_dir, self.id, self.checksum,
+                                    self.size, chunk_size)
+        self.length = self.size
+        self.resp = None
+        self.start()
+
+    def start(self):
+        self.close()
+        self.journal.load()
+        self.offset = 0
+        self.md5 = hashlib.md5()
+        self.chunk_md5 = hashlib.md5()
+        self.attempt = 0
+
+    def count_chunks(self):
+        return (self.size + self.chunk_size - 1) / self.chunk_size
+
+    def proxy(self, callback, speed_limit='-'):
+        return FileLikeProxy({'resource_src': self,
+                              'id': self.id,
+                              'name': self.name,
+                              'size': self.size},
+                             callback,
+                             speed_limit)
+
+    def get_ref_image(self, image_id):
+        self.start()
+        return self
+
+    def read(self, size=READ_SIZE):
+        if self.offset >= self.size:
+            self.close()
+            return ''
+        index = self.offset / self.chunk_size
+        chunk_end = min((index + 1) * self.chunk_size, self.size)
+        data = self.__read(min(size if size > 0 else READ_SIZE,
+                               chunk_end - self.offset), chunk_end)
+        self.offset += len(data)
+        self.md5.update(data)
+        self.chunk_md5.update(data)
+        if self.offset == chunk_end:
+            self.__end_chunk(index)
+        return data
+
+    def close(self):
+        if self.resp:
+            self.resp.close()
+            self.resp = None
+
+    def isclosed(self):
+        return self.resp is None
+
+    def begin(self):
+        pass
+
+    def getheader(self, name, default=None):
+        return default
+
+    def cleanup(self):
+        self.close()
+        self.journal.remove()
+
+    def __end_chunk(self, index):
+        self.close()
+        self.attempt = 0
+        md5 = self.chunk_md5.hexdigest()
+        self.chunk_md5 = hashlib.md5()
+        if index < len(self.journal.chunks):
+            if self.journal.chunks[index][1] == md5:
+                return
+            LOG.warning("Chunk %s of image %s differs from the previous "
+                        "transfer", index, self.id)
+            self.journal.truncate(index)
+        self.journal.add(index * self.chunk_size, md5)
+        if self.offset == self.size:
+            self.__verify()
+
+    def __verify(self):
+        if self.checksum and self.md5.hexdigest() != self.checksum:
+            self.journal.remove()
+            raise ChecksumMismatch(self.id, self.checksum,
+                                   self.md5.hexdigest())
+
+    def __read(self, size, chunk_end):
+        while True:
+            try:
+                if not self.resp:
+                    self.resp = self.__open_range(self.offset, chunk_end - 1)
+                data = self.resp.read(size)
+                if not data:
+                    raise IOError("Connection closed with %s bytes left" %
+                                  (chunk_end - self.offset))
+                return data
+            except Exception as e:
+                self.close()
+                if self.attempt == self.retries:
+                    raise
+                interval = min(2 ** self.attempt, MAX_RETRY_INTERVAL)
+                self.attempt += 1
+                LOG.warning("Reading image %s at offset %s failed: %s, "
+                            "retry in %s s", self.id, self.offset, e, interval)
+                time.sleep(interval)
+
+    def __open_range(self, start, end):
+        resp = self.get_range(start, end)
+        if getattr(resp, 'status', HTTP_PARTIAL_CONTENT) != HTTP_PARTIAL_CONTENT:
+            # Range is ignored, skip the head of the whole image
+            left = start
+            while left:
+                data = resp.read(min(left, READ_SIZE))
+                if not data:
+                    resp.close()
+                    raise IOError("Connection closed with %s bytes left" %
+                                  left)
+                left -= len(data)
+        return resp
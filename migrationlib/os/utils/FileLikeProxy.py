@@ -13,9 +13,8 @@
 # limitations under the License.
 
 
-import re
-import time
-
+from cloudferrylib.utils import bandwidth
+from cloudferrylib.utils.bandwidth import parse_speed_limit, TokenBucket
 from utils import get_log
 
 
@@ -37,7 +36,8 @@ def callback_print_progress(size, length, obj_id, name):
 
 
 class FileLikeProxy:
-    def __init__(self, transfer_object, callback, speed_limit='1mb'):
+    def __init__(self, transfer_object, callback, speed_limit='1mb',
+                 bucket=None):
         self.__callback = callback
         self.resp = transfer_object['resource_src'].get_ref_image(
             transfer_object['id'])
@@ -48,43 +48,41 @@ class FileLikeProxy:
         self.percent = self.length / 100
         self.res = 0
         self.delta = 0
-        self.buffer = ''
-        self.prev_send_time = 0
-        self.speed_limit = self.__parse_speed_limit(speed_limit)
-        if self.speed_limit != 0:
+        self.buckets = []
+        self.stream = None
+        self.speed_limit = parse_speed_limit(speed_limit)
+        if bucket:
+            self.buckets.append(bucket)
+        elif self.speed_limit != 0:
+            self.buckets.append(TokenBucket(self.speed_limit, CHUNK_SIZE))
+        if bandwidth.get_manager():
+            self.stream = bandwidth.get_manager().open_stream(
+                "image %s" % self.name)
+            self.buckets.append(self.stream)
+        if self.buckets:
             self.read = self.speed_limited_read
 
-    def __parse_speed_limit(self, speed_limit):
-        if speed_limit is '-':
-            return 0
-        array = filter(None, re.split(r'(\d+)', speed_limit))
-        mult = {
-            'b': 1,
-            'kb': 1024,
-            'mb': 1024 * 1024,
-        }[array[1].lower()]
-        return int(array[0]) * mult
-
     def read(self, *args, **kwargs):
         res = self.resp.read(*args, **kwargs)
         self.__trigger_callback(len(res))
         return res
 
-    def speed_limited_read(self, *args, **kwargs):
-        if len(self.buffer) < CHUNK_SIZE:
-            self.buffer += self.resp.read(*args, **kwargs)
-
-        res = self.buffer[0:CHUNK_SIZE]
-        self.buffer = self.buffer[CHUNK_SIZE::]
+    def speed_limited_read(self, size=CHUNK_SIZE, *args, **kwargs):
+        # packets come straight from the response, a local buffer
+        # would only add a copy
+        res = self.resp.read(min(size if size > 0 else CHUNK_SIZE, CHUNK_SIZE))
+        if not res:
+            self.close_stream()
 
         self.__trigger_callback(len(res))
-        cur_send_time = time.time()
-        sleep_time = float(len(res)) / self.speed_limit
-        sleep_time -= cur_send_time - self.prev_send_time
-        time.sleep(max((0, sleep_time)))
-        self.prev_send_time = cur_send_time
+        for bucket in self.buckets:
+            bucket.consume(len(res))
         return res
 
+    def close_stream(self):
+        if self.stream:
+            self.stream.close()
+
     def __trigger_callback(self, len_data):
         self.delta += len_data
         self.res += len_data
@@ -93,6 +91,7 @@ class FileLikeProxy:
             self.delta = 0
 
     def close(self):
+        self.close_stream()
         self.resp.close()
 
     def isclosed(self):
@@ -0,0 +1,203 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import contextlib
+import errno
+import fcntl
+import json
+import os
+import threading
+import time
+
+from utils import get_log
+
+__author__ = 'mirrorcoder'
+
+# id of the image in the destination Glance
+DEST_IMAGE = 'image'
+# path of the image on the destination controller
+BASE_IMAGE = 'base'
+STORE_FILE = 'image_store.json'
+POLL_INTERVAL = 5  # s
+# claim of a transfer in flight, renewed by its process every third of it
+LEASE_TIME = 600  # s
+# a claim older than this is not renewed any more, so a hung transfer
+# gives the claim up at most LEASE_TIME later
+MAX_CLAIM_AGE = 6 * 3600  # s
+
+LOG = get_log(__name__)
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class ImageStore(object):
+
+    """
+        Persistent content-addressed index of migrated images.
+        For every image checksum it keeps what was already made of the
+        image: its copy in the destination Glance (DEST_IMAGE) and its
+        cached file on the destination controller (BASE_IMAGE). The index
+        is a json file kept by all runs of the migration, every
+        read-modify-write of it holds flock on <path>.lock.
+        fetch() produces a missing entry once: other threads of the
+        process wait for the transfer in flight, other processes poll the
+        index until the producing process finishes, dies or stops renewing
+        its lease on the claim (its pid reused, or the claim reached
+        max_claim_age, e.g. the transfer hung), then they take the claim
+        over. Entries are checked by validate() before reuse,
+        stale ones are produced again:
+
+            image_id = store.fetch(DEST_IMAGE, checksum,
+                                   lambda: copy_image().id,
+                                   lambda image_id: is_active(image_id))
+    """
+
+    def __init__(self, path, poll_interval=POLL_INTERVAL, lease_time=LEASE_TIME,
+                 max_claim_age=MAX_CLAIM_AGE):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.poll_interval = poll_interval
+        self.lease_time = lease_time
+        self.max_claim_age = max_claim_age
+        self.lock = threading.Lock()
+        self.in_flight = {}
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def forget(self, kind, checksum):
+        with self.__index() as index:
+            index['entries'].pop(self.__key(kind, checksum), None)
+
+    def fetch(self, kind, checksum, produce, validate=None):
+        key = self.__key(kind, checksum)
+        while True:
+            with self.lock:
+                event = self.in_flight.get(key)
+                owner = event is None
+                if owner:
+                    event = self.in_flight[key] = threading.Event()
+            if not owner:
+                LOG.info("Waiting for transfer of %s in flight", key)
+                event.wait()
+                continue
+            try:
+                return self.__fetch(key, produce, validate)
+            finally:
+                with self.lock:
+                    del self.in_flight[key]
+                event.set()
+
+    def __fetch(self, key, produce, validate):
+        while True:
+            with self.__index() as index:
+                value = index['entries'].get(key)
+                claim = index['in_flight'].get(key)
+                claimed = value is None and (claim is None or
+                                             not is_alive(claim['pid']) or
+                                             claim['expires'] < time.time())
+                if claimed:
+                    index['in_flight'][key] = self.__lease(time.time())
+            if claimed:
+                if claim and is_alive(claim['pid']):
+                    LOG.warning("Lease of process %s on %s expired, taking over",
+                                claim['pid'], key)
+                break
+            if value is None:
+                LOG.info("Waiting for transfer of %s by process %s", key, claim['pid'])
+                time.sleep(self.poll_interval)
+            elif validate is None or validate(value):
+                return value
+            else:
+                LOG.info("Entry %s = %s is stale", key, value)
+                with self.__index() as index:
+                    if index['entries'].get(key) == value:
+                        del index['entries'][key]
+        stop = threading.Event()
+        renewal = threading.Thread(target=self.__renew, args=(key, stop))
+        renewal.daemon = True
+        renewal.start()
+        try:
+            value = produce()
+        except Exception:
+            with self.__index() as index:
+                self.__release(index, key)
+            raise
+        finally:
+            stop.set()
+        with self.__index() as index:
+            index['entries'][key] = value
+            self.__release(index, key)
+        return value
+
+    def __lease(self, since):
+        return {'pid': os.getpid(), 'since': since, 'expires': time.time() + self.lease_time}
+
+    def __renew(self, key, stop):
+        while not stop.wait(self.lease_time / 3.0):
+            with self.__index() as index:
+                claim = index['in_flight'].get(key)
+                if not claim or claim['pid'] != os.getpid():
+                    return
+                if claim['since'] + self.max_claim_age < time.time():
+                    LOG.warning("Transfer of %s runs longer than %ss, "
+                                "its claim is not renewed any more",
+                                key, self.max_claim_age)
+                    return
+                index['in_flight'][key] = self.__lease(claim['since'])
+
+    def __release(self, index, key):
+        claim = index['in_flight'].get(key)
+        if claim and claim['pid'] == os.getpid():
+            del index['in_flight'][key]
+
+    @staticmethod
+    def __key(kind, checksum):
+        return "%s:%s" % (kind, checksum)
+
+    @contextlib.contextmanager
+    def __index(self):
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            index = self.__load()
+            saved = json.dumps(index, sort_keys=True)
+            yield index
+            if json.dumps(index, sort_keys=True) != saved:
+                self.__save(index)
+
+    def __load(self):
+        index = {'entries': {}, 'in_flight': {}}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path) as f:
+                    index.update(json.load(f))
+            except ValueError:
+                LOG.warning("Image store %s is corrupted, starting over",
+                            self.path)
+        return index
+
+    def __save(self, index):
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(index, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, self.path)
@@ -30,6 +30,12 @@ class ImageTransfer:
     def get_ref_image(self):
         return self.glance_client.images.data(self.image_id)._resp
 
+    def get_ref_image_range(self, start, end):
+        resp, body = self.glance_client.images.api.raw_request(
+            'GET', '/v1/images/%s' % self.image_id,
+            headers={'Range': 'bytes=%s-%s' % (start, end)})
+        return body._resp
+
     def delete(self):
         self.glance_client.images.delete(self.image_id)
 
@@ -17,12 +17,7 @@ __author__ = 'mirrorcoder'
 
 
 class RestoreImages(RestoreState):
-    def restore(self, diff_snapshot):
-        report = Report()
-        images = diff_snapshot.convert_to_dict()['images']
-        for id_obj in images:
-            report.addImage(id_obj, self.fix(id_obj, images[id_obj]))
-        return report
+    category = 'images'
 
     def fix(self, id_obj, instance):
         return super(RestoreImages, self).fix(id_obj, instance)
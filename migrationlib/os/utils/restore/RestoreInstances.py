@@ -13,24 +13,14 @@
 # limitations under the License.
 from RestoreState import RestoreState
 from Report import *
+from cloudferrylib.utils import waiter
+from cloudferrylib.utils.waiter import WaitException
 import time
 __author__ = 'mirrorcoder'
 
 
-class TimeoutException(Exception):
-    def __init__(self, status_obj, exp_status, msg):
-        self.status_obj = status_obj
-        self.exp_status = exp_status
-        self.msg = msg
-
-
 class RestoreInstances(RestoreState):
-    def restore(self, diff_snapshot):
-        report = Report()
-        instances = diff_snapshot.convert_to_dict()['instances']
-        for id_obj in instances:
-            report.addInstance(id_obj, self.fix(id_obj, instances[id_obj]))
-        return report
+    category = 'instances'
 
     def fix(self, id_obj, instance):
         return super(RestoreInstances, self).fix(id_obj, instance)
@@ -120,7 +110,7 @@ class RestoreInstances(RestoreState):
             instance = self.nova_client.servers.get(id_obj)
             try:
                 reduce(lambda res, f: f(instance), map_status[curr][was], None)
-            except TimeoutException as e:
+            except WaitException as e:
                 return error_report
             if curr in map_status:
                 return fix_report
@@ -130,12 +120,7 @@ class RestoreInstances(RestoreState):
             return ReportObjConflict(id_obj, obj, "No change property", FIX)
 
     def __wait_for_status(self, getter, id, status, limit_retry=60):
-        count = 0
-        while getter.get(id).status.lower() != status.lower():
-            time.sleep(1)
-            count += 1
-            if count > limit_retry:
-                raise TimeoutException(getter.get(id).status.lower(), status, "Timeout exp")
+        waiter.wait_for_status(getter, id, status, timeout=limit_retry)
 
     def __fix_change_name(self, id_obj, obj):
         if obj.value.was != obj.value.curr:
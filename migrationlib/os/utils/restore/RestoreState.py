@@ -15,14 +15,24 @@
 from migrationlib.os.utils.statecloud.StateCloud import StateCloud
 from migrationlib.os.utils.snapshot.Snapshot import *
 from Report import Report
-import time
+from cloudferrylib.utils import waiter
 __author__ = 'mirrorcoder'
 
 
 class RestoreState(StateCloud):
+    # category of diff objects fixed by this class
+    category = None
 
     def restore(self, diff_snapshot):
-        return Report()
+
+        """ Fix objects of category in diff_snapshot: a diff Snapshot or
+        (category, id, DiffObject) as streamed by SnapshotState.iter_diff. """
+
+        report = Report()
+        for category, id_obj, obj in iter_diff(diff_snapshot):
+            if category == self.category:
+                report.add(id_obj, category, self.fix(id_obj, obj))
+        return report
 
     def fix(self, id_obj, obj):
         return {
@@ -41,5 +51,10 @@ class RestoreState(StateCloud):
         raise NotImplemented()
 
     def __wait_for_status(self, getter, id, status):
-        while getter.get(id).status != status:
-            time.sleep(1)
\ No newline at end of file
+        waiter.wait_for_status(getter, id, status)
+
+
+def iter_diff(diff_snapshot):
+    if isinstance(diff_snapshot, Snapshot):
+        return diff_snapshot.iter_objects()
+    return diff_snapshot
\ No newline at end of file
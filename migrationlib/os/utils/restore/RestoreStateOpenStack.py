@@ -11,7 +11,7 @@
 # implied.
 # See the License for the specific language governing permissions and#
 # limitations under the License.
-from RestoreState import RestoreState
+from RestoreState import RestoreState, iter_diff
 from RestoreInstances import RestoreInstances
 from RestoreImages import RestoreImages
 from RestoreVolumes import RestoreVolumes
@@ -26,7 +26,12 @@ class RestoreStateOpenStack(RestoreState):
         super(RestoreStateOpenStack, self).__init__(cloud, list_subclass)
 
     def restore(self, diff_snapshot):
+
+        """ Fix objects of diff_snapshot one by one, as they are streamed. """
+
         report = Report()
-        for report_class in self.list_subclass:
-            report.union(report_class.restore(diff_snapshot))
+        restorers = dict((report_class.category, report_class) for report_class in self.list_subclass)
+        for category, id_obj, obj in iter_diff(diff_snapshot):
+            if category in restorers:
+                report.add(id_obj, category, restorers[category].fix(id_obj, obj))
         return report
\ No newline at end of file
@@ -13,6 +13,8 @@
 # limitations under the License.
 from RestoreState import RestoreState
 from Report import *
+from cloudferrylib.utils import waiter
+from cloudferrylib.utils.waiter import WaitException
 __author__ = 'mirrorcoder'
 
 
@@ -26,28 +28,11 @@ func_restore = {
 
 
 def __wait_for_status(getter, id, status, limit_retry=60):
-    count = 0
-    while getter.get(id).status.lower() != status.lower():
-        time.sleep(1)
-        count += 1
-        if count > limit_retry:
-            raise TimeoutException(getter.get(id).status.lower(), status, "Timeout exp")
-
-
-class TimeoutException(Exception):
-    def __init__(self, status_obj, exp_status, msg):
-        self.status_obj = status_obj
-        self.exp_status = exp_status
-        self.msg = msg
+    waiter.wait_for_status(getter, id, status, timeout=limit_retry)
 
 
 class RestoreVolumes(RestoreState):
-    def restore(self, diff_snapshot):
-        report = Report()
-        volumes = diff_snapshot.convert_to_dict()['volumes']
-        for id_obj in volumes:
-            report.addVolume(id_obj, self.fix(id_obj, volumes[id_obj]))
-        return report
+    category = 'volumes'
 
     def fix(self, id_obj, instance):
         return super(RestoreVolumes, self).fix(id_obj, instance)
@@ -91,7 +76,7 @@ class RestoreVolumes(RestoreState):
                     volume = self.cinder_client.volumes.get(attach)
                     func_restore['attach'](was_attachment[attach]['server_id'], was_attachment[attach]['device'])(volume)
                     func_restore['status']('in-use')(volume, self.cinder_client.volumes)
-                except TimeoutException as e:
+                except WaitException as e:
                     return ReportObjConflict(id_obj, obj, "Error restore attachments",
                                              CONFLICT)
         return ReportObjConflict(id_obj, obj, "Attachments restore", FIX)
@@ -116,7 +101,7 @@ class RestoreVolumes(RestoreState):
             volume = self.cinder_client.servers.get(id_obj)
             try:
                 reduce(lambda res, f: f(volume), map_status[curr][was], None)
-            except TimeoutException as e:
+            except WaitException as e:
                 return error_report
             if curr in map_status:
                 return fix_report
@@ -12,15 +12,16 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 from Rollback import *
-from migrationlib.os.utils.snapshot.Snapshot import Snapshot
+from cloudferrylib.utils.journal import read_journal, SNAPSHOTS
+from migrationlib.os.utils.snapshot.SnapshotDelta import load_snapshot
 from scheduler.transaction.TaskTransaction import NO_ERROR, ERROR
 import os
-import json
 import shutil
 from migrationlib.os.utils.restore.RestoreStateOpenStack import RestoreStateOpenStack
 from migrationlib.os.utils.snapshot.SnapshotStateOpenStack import SnapshotStateOpenStack
+from migrationlib.os.utils.snapshot.SnapshotStore import SnapshotStore
+from StatusStore import StatusStore, STATUS_FILE
 from scheduler.transaction.TaskTransaction import TaskTransactionEnd
-from utils import load_json_from_file, dump_to_file
 __author__ = 'mirrorcoder'
 
 PATH_TO_ROLLBACK = 'transaction/rollback'
@@ -88,14 +89,10 @@ class RollbackOpenStack(Rollback):
         prefix = 'snapshots'
         importer = namespace.vars['inst_importer']
         exporter = namespace.vars['inst_exporter']
-        snapshot_source = SnapshotStateOpenStack(exporter).create_snapshot()
-        snapshot_dest = SnapshotStateOpenStack(importer).create_snapshot()
-        path_source = "%s/source/%s.snapshot" % (prefix, snapshot_source.timestamp)
-        path_dest = "%s/dest/%s.snapshot" % (prefix, snapshot_dest.timestamp)
-        namespace.vars['snapshots']['source'].append({'path': path_source, 'timestamp': snapshot_source.timestamp})
-        namespace.vars['snapshots']['dest'].append({'path': path_dest, 'timestamp': snapshot_dest.timestamp})
-        dump_to_file(path_source, snapshot_source)
-        dump_to_file(path_dest, snapshot_dest)
+        namespace.vars['snapshots']['source'].append(SnapshotStore("%s/source" % prefix)
+                                                     .take(SnapshotStateOpenStack(exporter)))
+        namespace.vars['snapshots']['dest'].append(SnapshotStore("%s/dest" % prefix)
+                                                   .take(SnapshotStateOpenStack(importer)))
 
     def is_exclude(self, task=None):
         if task:
@@ -103,15 +100,19 @@ class RollbackOpenStack(Rollback):
                 return True
         return False
 
-    def get_snapshots(self, __transaction__, cloud, path, is_do_snapshot_two=False):
-        path_to_snap = __transaction__.prefix_path+path
-        list_snapshots = os.listdir(path_to_snap)
-        list_snapshots.sort()
-        snapshot_one_s = Snapshot(load_json_from_file(path_to_snap+list_snapshots[0]))
-        if is_do_snapshot_two:
-            snapshot_two_s = SnapshotStateOpenStack(cloud).create_snapshot()\
-                if len(list_snapshots) < 2 else \
-                Snapshot(load_json_from_file(path_to_snap+list_snapshots[-1]))
+    def get_snapshots(self, __transaction__, cloud, position, is_do_snapshot_two=False):
+
+        """ Snapshots of cloud position ('source' or 'dest') recorded at the
+        begin of the transaction and at its end. Without an end record, or
+        if is_do_snapshot_two is not set, the second one is taken now. """
+
+        path_to_trans = __transaction__.prefix_path
+        records = [record[SNAPSHOTS][position]
+                   for record in read_journal(path_to_trans+"tasks.trans", replay=False)
+                   if SNAPSHOTS in record]
+        snapshot_one_s = load_snapshot(path_to_trans+records[0])
+        if is_do_snapshot_two and len(records) > 1:
+            snapshot_two_s = load_snapshot(path_to_trans+records[-1])
         else:
             snapshot_two_s = SnapshotStateOpenStack(cloud).create_snapshot()
         return snapshot_one_s, snapshot_two_s
@@ -119,18 +120,18 @@ class RollbackOpenStack(Rollback):
     def restore_state_openstack(self, exporter, importer, __transaction__):
         snapshot_one_s, snapshot_two_s = self.get_snapshots(__transaction__,
                                                             exporter,
-                                                            path="source/")
+                                                            position='source')
         snapshot_one_d, snapshot_two_d = self.get_snapshots(__transaction__,
                                                             importer,
-                                                            path="dest/",
+                                                            position='dest',
                                                             is_do_snapshot_two=True)
         report_s = self.restore_from_snapshot(snapshot_one_s, snapshot_two_s, exporter)
         report_d = self.restore_from_snapshot(snapshot_one_d, snapshot_two_d, importer)
         return report_s, report_d
 
     def restore_from_snapshot(self, snapshot_one, snapshot_two, inst_exporter):
-        return RestoreStateOpenStack(inst_exporter).restore(SnapshotStateOpenStack.diff_snapshot(snapshot_one,
-                                                                                                 snapshot_two))
+        return RestoreStateOpenStack(inst_exporter).restore(SnapshotStateOpenStack.iter_diff(snapshot_one,
+                                                                                             snapshot_two))
 
     def cp_info_transaction(self, __transaction__, path_to_instance):
         if os.path.exists(path_to_instance):
@@ -139,22 +140,14 @@ class RollbackOpenStack(Rollback):
         shutil.copytree(path_to_file_trans, path_to_instance)
 
     def delete_record_from_status_file(self, __transaction__, instance_id):
-        path_to_status = __transaction__.prefix+'status.inf'
-        path_to_status_temp = PATH_TO_ROLLBACK+'/status.inf.temp'
-        with open(path_to_status_temp, 'w+') as t:
-            with open(path_to_status, 'r+') as f:
-                for item in f.readlines():
-                    if item.find(instance_id) == -1:
-                        t.write(item)
-        os.remove(path_to_status)
-        os.renames(path_to_status_temp, path_to_status)
+        StatusStore.load(__transaction__.prefix+STATUS_FILE).delete(instance_id)
 
     def check_instance(self, namespace, __transaction__, instance_id):
         obj = {}
         obj_b = {}
         if self.check_status_file(__transaction__, namespace):
-            obj_1 = self.find_obj_to_file(__transaction__.prefix+'status.inf', instance_id)
-            obj_2 = self.find_obj_to_file(__transaction__.prefix+'status.inf', instance_id, 1)
+            obj_1 = self.find_obj_to_file(__transaction__.prefix+STATUS_FILE, instance_id)
+            obj_2 = self.find_obj_to_file(__transaction__.prefix+STATUS_FILE, instance_id, 1)
             for o in [obj_2, obj_1]:
                 if o:
                     if o['event'] == 'event_end':
@@ -168,23 +161,14 @@ class RollbackOpenStack(Rollback):
         return obj
 
     def check_status_file(self, __transaction__, namespace):
-        if not os.path.exists(__transaction__.prefix+"/status.inf"):
+        if not StatusStore.load(__transaction__.prefix+STATUS_FILE).exists():
             namespace.vars['__rollback_status__'] = RESTART
             return False
         return True
 
     def find_obj_to_file(self, path, instance_id, skip=0):
-        obj = {}
-        skip_curr = 0
-        with open(path, 'r') as f:
-            for item in f.readlines():
-                if item.find(instance_id) != -1:
-                    if skip_curr < skip:
-                        skip_curr += 1
-                        continue
-                    obj = json.loads(item)
-                    break
-        return obj
+        records = StatusStore.load(path).get(instance_id)
+        return records[skip] if skip < len(records) else {}
 
     def restart_status(self, *args, **kwargs):
         if self.skip_all_tasks:
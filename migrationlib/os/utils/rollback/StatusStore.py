@@ -0,0 +1,165 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import contextlib
+import fcntl
+import json
+import os
+import threading
+
+from utils import get_log
+
+__author__ = 'mirrorcoder'
+
+STATUS_FILE = 'status.inf'
+# record hiding the records of its transaction written before it
+TOMBSTONE = 'deleted'
+
+LOG = get_log(__name__)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class StatusStore(object):
+
+    """
+        Status records of transactions, kept in status.inf: an append-only
+        file of json lines, read into an index by id_transaction. Reads
+        only parse lines appended since the previous read, by any process.
+        delete() appends a tombstone instead of rewriting the file; the
+        file is compacted on open once dead records outnumber live ones.
+        status.inf files of former runs are the same format and are read
+        as they are. Appends and compaction hold flock on <path>.lock.
+
+            store = StatusStore.load(prefix + STATUS_FILE)
+            store.add({'id_transaction': id, 'status': status, 'event': event})
+            store.get(id)  # records of the transaction, oldest first
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + '.lock'
+        self.lock = threading.Lock()
+        self.records = {}
+        self.dead = 0
+        self.offset = 0
+        self.inode = None
+        self.refresh()
+        if self.dead > self.size():
+            self.compact()
+
+    @staticmethod
+    def load(path):
+        path = os.path.normpath(path)
+        with _stores_lock:
+            if path not in _stores:
+                _stores[path] = StatusStore(path)
+            return _stores[path]
+
+    def add(self, record):
+        with self.__locked():
+            with open(self.path, 'a+') as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell():
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != "\n":
+                        # end the line torn by a crash
+                        f.write("\n")
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def get(self, id_transaction):
+        self.refresh()
+        return list(self.records.get(str(id_transaction), []))
+
+    def delete(self, id_transaction):
+        self.add({'id_transaction': id_transaction, TOMBSTONE: True})
+        self.refresh()
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def size(self):
+        return sum(len(records) for records in self.records.itervalues())
+
+    def refresh(self):
+        with self.lock:
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                self.records = {}
+                self.dead = 0
+                self.offset = 0
+                self.inode = stat.st_ino
+            if stat.st_size == self.offset:
+                return
+            with open(self.path) as f:
+                f.seek(self.offset)
+                for line in f:
+                    if not line.endswith("\n"):
+                        # being appended
+                        break
+                    self.offset += len(line)
+                    self.__index(line)
+
+    def compact(self):
+
+        """ Rewrite the file with live records only. """
+
+        with self.__locked():
+            with open(self.path) as status:
+                records = [self.__parse(line) for line in status]
+            last_tombstone = {}
+            for i, record in enumerate(records):
+                if record and record.get(TOMBSTONE):
+                    last_tombstone[str(record['id_transaction'])] = i
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                for i, record in enumerate(records):
+                    if record and i > last_tombstone.get(str(record['id_transaction']), -1):
+                        f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(tmp_path, self.path)
+        LOG.info("Status file %s compacted, %s dead records removed", self.path, self.dead)
+        self.refresh()
+
+    @contextlib.contextmanager
+    def __locked(self):
+        with open(self.lock_path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def __index(self, line):
+        record = self.__parse(line)
+        if not record:
+            return
+        id_transaction = str(record['id_transaction'])
+        if record.get(TOMBSTONE):
+            self.dead += len(self.records.pop(id_transaction, [])) + 1
+        else:
+            self.records.setdefault(id_transaction, []).append(record)
+
+    def __parse(self, line):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            LOG.warning("Skip corrupted record of %s: %s", self.path, line.strip())
+            return None
+        return record if 'id_transaction' in record else None
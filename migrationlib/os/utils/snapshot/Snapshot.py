@@ -7,6 +7,8 @@ ADD = "add"
 CHANGE = "change"
 DELETE = "delete"
 
+CATEGORIES = ['instances', 'images', 'volumes', 'tenants', 'users', 'security_groups']
+
 
 class DiffValue:
     def __init__(self, was, curr):
@@ -65,9 +67,18 @@ class Snapshot:
         self.security_groups[id] = kwargs if not diff_obj else diff_obj
 
     def union(self, snapshot, exclude=['timestamp']):
-        snapshot_dict = self.excluding_fields(snapshot.convert_to_dict(), exclude)
-        for item in snapshot_dict:
-            self.__dict__[item].update(snapshot_dict[item])
+        for category in CATEGORIES:
+            if category not in exclude:
+                getattr(self, category).update(getattr(snapshot, category))
+
+    def iter_objects(self):
+
+        """ (category, id, obj) of every object, a diff snapshot read as
+        SnapshotState.iter_diff output. """
+
+        for category in CATEGORIES:
+            for id, obj in getattr(self, category).iteritems():
+                yield category, id, obj
 
     @staticmethod
     def excluding_fields(snapshot_dict, exclude):
@@ -0,0 +1,156 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+import json
+import time
+
+from cloudferrylib.utils.fingerprint import fingerprint
+from Snapshot import Snapshot, CATEGORIES
+from utils import load_json_from_file
+__author__ = 'mirrorcoder'
+
+# status of servers listed by changes-since after their deletion
+DELETED = 'DELETED'
+
+_bases = {}
+
+
+def object_fingerprint(obj):
+    return fingerprint(obj, ignore_case=False)
+
+
+class SnapshotBase(object):
+
+    """
+        Full snapshot shared by deltas, with a fingerprint of every object.
+        Loaded once per process and path.
+    """
+
+    def __init__(self, path, snapshot):
+        self.path = path
+        self.snapshot = snapshot
+        self.fingerprints = dict((category, dict((id, object_fingerprint(obj))
+                                                 for id, obj in getattr(snapshot, category).iteritems()))
+                                 for category in CATEGORIES)
+
+    @staticmethod
+    def load(path):
+        if path not in _bases:
+            _bases[path] = SnapshotBase(path, Snapshot(load_json_from_file(path)))
+        return _bases[path]
+
+    def size(self):
+        return sum(len(self.fingerprints[category]) for category in CATEGORIES)
+
+
+class SnapshotDelta(object):
+
+    """
+        Snapshot of a cloud stored as changes against a base snapshot:
+        changes[category][id] is the current object, or None if the object
+        of the base was deleted. Objects equal to the base (by fingerprint)
+        are not stored.
+    """
+
+    def __init__(self, base, changes=None, timestamp=None):
+        self.base = base
+        self.changes = dict((category, {}) for category in CATEGORIES)
+        if changes:
+            for category in changes:
+                self.changes[category].update(changes[category])
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.fingerprints = dict((category, {}) for category in CATEGORIES)
+
+    def update(self, category, objects, complete=True):
+
+        """ Take listed objects of category. complete - objects is the full
+        listing, so objects of the base missing from it are deleted,
+        else deleted objects are listed with status DELETED. """
+
+        base = getattr(self.base.snapshot, category)
+        fingerprints = self.base.fingerprints[category]
+        changes = self.changes[category]
+        for id, obj in objects.iteritems():
+            if not complete and obj.get('status') == DELETED:
+                if id in base:
+                    changes[id] = None
+            else:
+                obj_fingerprint = object_fingerprint(obj)
+                if fingerprints.get(id) != obj_fingerprint:
+                    changes[id] = obj
+                    self.fingerprints[category][id] = obj_fingerprint
+        if complete:
+            for id in base:
+                if id not in objects:
+                    changes[id] = None
+
+    def get(self, category, id):
+        changes = self.changes[category]
+        if id in changes:
+            return changes[id]
+        return getattr(self.base.snapshot, category).get(id)
+
+    def fingerprint(self, category, id):
+
+        """ Fingerprint of object id, taken from the base if unchanged. """
+
+        changes = self.changes[category]
+        if id not in changes:
+            return self.base.fingerprints[category].get(id)
+        fingerprints = self.fingerprints[category]
+        if id not in fingerprints:
+            obj = changes[id]
+            fingerprints[id] = None if obj is None else object_fingerprint(obj)
+        return fingerprints[id]
+
+    def size(self):
+        return sum(len(self.changes[category]) for category in CATEGORIES)
+
+    def objects(self, category):
+        objects = dict(getattr(self.base.snapshot, category))
+        for id, obj in self.changes[category].iteritems():
+            if obj is None:
+                objects.pop(id, None)
+            else:
+                objects[id] = obj
+        return objects
+
+    def materialize(self):
+        snapshot = Snapshot()
+        for category in CATEGORIES:
+            setattr(snapshot, category, self.objects(category))
+        snapshot.timestamp = self.timestamp
+        return snapshot
+
+    def convert_to_dict(self):
+        return {
+            'base': self.base.path,
+            'changes': self.changes,
+            'timestamp': self.timestamp
+        }
+
+    def dump(self, path):
+        with open(path, "w+") as f:
+            json.dump(self.convert_to_dict(), f)
+
+
+def load_snapshot(path):
+
+    """ Snapshot or SnapshotDelta stored at path. """
+
+    snapshot_dict = load_json_from_file(path)
+    if 'base' in snapshot_dict:
+        return SnapshotDelta(SnapshotBase.load(snapshot_dict['base']),
+                             snapshot_dict['changes'],
+                             snapshot_dict['timestamp'])
+    return Snapshot(snapshot_dict)
@@ -17,6 +17,8 @@ __author__ = 'mirrorcoder'
 
 
 class SnapshotImages(SnapshotState):
+    category = 'images'
+
     def create_snapshot(self):
         snapshot = Snapshot()
         [snapshot.addImage(id=image.id,
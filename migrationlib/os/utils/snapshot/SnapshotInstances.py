@@ -11,16 +11,30 @@
 # implied.
 # See the License for the specific language governing permissions and#
 # limitations under the License.
+import datetime
+
 from SnapshotState import SnapshotState
 from Snapshot import Snapshot
 __author__ = 'mirrorcoder'
 
 
 class SnapshotInstances(SnapshotState):
-    def create_snapshot(self):
+    category = 'instances'
+    incremental = True
+
+    def create_snapshot(self, changes_since=None):
+
+        """ changes_since - timestamp, list only servers changed after it
+        (deleted ones with status DELETED). """
+
         snapshot = Snapshot()
+        if changes_since is None:
+            servers = self.nova_client.servers.list()
+        else:
+            since = datetime.datetime.utcfromtimestamp(changes_since).isoformat()
+            servers = self.nova_client.servers.list(search_opts={'changes-since': since})
         [snapshot.addInstance(id=instance.id,
                               status=instance.status,
                               name=instance.name)
-         for instance in self.nova_client.servers.list()]
+         for instance in servers]
         return snapshot
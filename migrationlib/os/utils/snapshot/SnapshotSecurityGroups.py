@@ -0,0 +1,39 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+from SnapshotState import SnapshotState
+from Snapshot import Snapshot
+__author__ = 'mirrorcoder'
+
+
+class SnapshotSecurityGroups(SnapshotState):
+    category = 'security_groups'
+
+    def create_snapshot(self):
+        snapshot = Snapshot()
+        if self.cloud.network_service() == 'neutron':
+            [snapshot.addSecurityGroup(id=security_group['id'],
+                                       name=security_group['name'],
+                                       description=security_group['description'],
+                                       tenant_id=security_group['tenant_id'],
+                                       rules=security_group['security_group_rules'])
+             for security_group in self.network_client.list_security_groups()['security_groups']]
+        else:
+            # nova-network ids are integers, json keeps only string keys
+            [snapshot.addSecurityGroup(id=str(security_group.id),
+                                       name=security_group.name,
+                                       description=security_group.description,
+                                       tenant_id=security_group.tenant_id,
+                                       rules=security_group.rules)
+             for security_group in self.nova_client.security_groups.list()]
+        return snapshot
@@ -12,11 +12,17 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 from Snapshot import *
+from SnapshotDelta import SnapshotDelta
 from migrationlib.os.utils.statecloud.StateCloud import StateCloud
 __author__ = 'mirrorcoder'
 
 
 class SnapshotState(StateCloud):
+    # category of Snapshot filled by create_snapshot
+    category = None
+    # create_snapshot accepts changes_since
+    incremental = False
+
     def __init__(self, cloud, list_subclass=[]):
         super(SnapshotState, self).__init__(cloud, list_subclass)
 
@@ -25,19 +31,63 @@ class SnapshotState(StateCloud):
 
     @staticmethod
     def diff_snapshot(snapshot_one, snapshot_two):
-        snapshot_one_res = Snapshot.excluding_fields(snapshot_one.convert_to_dict(), ['timestamp'])
-        snapshot_two_res = Snapshot.excluding_fields(snapshot_two.convert_to_dict(), ['timestamp'])
         snapshot_diff = Snapshot()
         snapshot_diff.timestamp = snapshot_two.timestamp - snapshot_one.timestamp
-        for item_two in snapshot_two_res:
-            for obj in snapshot_two_res[item_two]:
-                if not obj in snapshot_one_res[item_two]:
-                    snapshot_diff.add(obj, item_two, DiffObject(ADD, snapshot_two_res[item_two][obj]))
-                elif snapshot_two_res[item_two][obj] != snapshot_one_res[item_two][obj]:
-                    snapshot_diff.add(obj, item_two, DiffObject(CHANGE,
-                                                                DiffValue(snapshot_one_res[item_two][obj],
-                                                                          snapshot_two_res[item_two][obj])))
-            for obj in snapshot_one_res[item_two]:
-                if not obj in snapshot_two_res[item_two]:
-                    snapshot_diff.add(obj, item_two, DiffObject(DELETE, snapshot_one_res[item_two][obj]))
+        for category, obj, diff_obj in SnapshotState.iter_diff(snapshot_one, snapshot_two):
+            snapshot_diff.add(obj, category, diff_obj)
         return snapshot_diff
+
+    @staticmethod
+    def iter_diff(snapshot_one, snapshot_two):
+
+        """ Generator of (category, id, DiffObject) for objects differing
+        between snapshot_one and snapshot_two (Snapshot or SnapshotDelta).
+        Ids are matched by set operations; objects of a common base are
+        skipped by identity or by fingerprint without comparing them. """
+
+        if isinstance(snapshot_one, SnapshotDelta) and isinstance(snapshot_two, SnapshotDelta) \
+                and snapshot_one.base is snapshot_two.base:
+            # only objects changed in one of the deltas can differ
+            for category in CATEGORIES:
+                for obj in set(snapshot_one.changes[category]) | set(snapshot_two.changes[category]):
+                    diff_obj = diff_object(snapshot_one.get(category, obj), snapshot_two.get(category, obj))
+                    if diff_obj:
+                        yield category, obj, diff_obj
+            return
+        is_deltas = isinstance(snapshot_one, SnapshotDelta) and isinstance(snapshot_two, SnapshotDelta)
+        for category in CATEGORIES:
+            objects_one = get_objects(snapshot_one, category)
+            objects_two = get_objects(snapshot_two, category)
+            ids_one = objects_one.viewkeys()
+            ids_two = objects_two.viewkeys()
+            for obj in ids_two - ids_one:
+                yield category, obj, DiffObject(ADD, objects_two[obj])
+            for obj in ids_one - ids_two:
+                yield category, obj, DiffObject(DELETE, objects_one[obj])
+            for obj in ids_one & ids_two:
+                was = objects_one[obj]
+                curr = objects_two[obj]
+                if was is curr:
+                    continue
+                if is_deltas:
+                    if snapshot_one.fingerprint(category, obj) == snapshot_two.fingerprint(category, obj):
+                        continue
+                elif was == curr:
+                    continue
+                yield category, obj, DiffObject(CHANGE, DiffValue(was, curr))
+
+
+def get_objects(snapshot, category):
+    if isinstance(snapshot, SnapshotDelta):
+        return snapshot.objects(category)
+    return getattr(snapshot, category)
+
+
+def diff_object(was, curr):
+    if was is None and curr is not None:
+        return DiffObject(ADD, curr)
+    if was is not None and curr is None:
+        return DiffObject(DELETE, was)
+    if was is not curr and was != curr:
+        return DiffObject(CHANGE, DiffValue(was, curr))
+    return None
@@ -2,22 +2,76 @@ from Snapshot import *
 from SnapshotInstances import SnapshotInstances
 from SnapshotImages import SnapshotImages
 from SnapshotVolumes import SnapshotVolumes
+from SnapshotSecurityGroups import SnapshotSecurityGroups
+from SnapshotUsers import SnapshotUsers
+from SnapshotTenants import SnapshotTenants
 from SnapshotState import SnapshotState
+from SnapshotDelta import SnapshotDelta
+from cloudferrylib.scheduler.executor import ThreadPoolExecutor
+from utils import get_log
 __author__ = 'mirrorcoder'
 
+# allowance for the clock of the cloud behind the local one
+CLOCK_SKEW = 300  # s
+
+LOG = get_log(__name__)
+
 # TODO: add creating snapshot of openstack service (glance, cinder, nova(instance, network), network)
 
 
 class SnapshotStateOpenStack(SnapshotState):
 
-    #TODO: list security groups
-    #TODO: list users
-    #TODO: list tenants
-    def __init__(self, cloud, list_subclass=[SnapshotInstances, SnapshotVolumes, SnapshotImages]):
+    """
+        Snapshot of every collector of list_subclass. Collectors list
+        their resources concurrently, one thread each, so a snapshot takes
+        as long as the slowest listing.
+    """
+
+    def __init__(self, cloud, list_subclass=[SnapshotInstances, SnapshotVolumes, SnapshotImages,
+                                             SnapshotSecurityGroups, SnapshotUsers, SnapshotTenants]):
         super(SnapshotStateOpenStack, self).__init__(cloud, list_subclass)
 
     def create_snapshot(self):
         snapshot = Snapshot()
-        for snapshot_class in self.list_subclass:
-            snapshot.union(snapshot_class.create_snapshot())
+        for collected in self.collect(lambda snapshot_class: snapshot_class.create_snapshot()):
+            snapshot.union(collected)
         return snapshot
+
+    def create_delta(self, base):
+
+        """ Snapshot as changes against base (SnapshotBase). Incremental
+        collectors list only objects changed since the base was taken. """
+
+        delta = SnapshotDelta(base)
+        changes_since = base.snapshot.timestamp - CLOCK_SKEW
+        listings = self.collect(lambda snapshot_class: self.list_changes(snapshot_class, changes_since))
+        for snapshot_class, (snapshot, complete) in zip(self.list_subclass, listings):
+            delta.update(snapshot_class.category,
+                         getattr(snapshot, snapshot_class.category),
+                         complete)
+        return delta
+
+    @staticmethod
+    def list_changes(snapshot_class, changes_since):
+
+        """ (snapshot, complete) of snapshot_class: objects changed since
+        changes_since if the collector can filter them, else all. """
+
+        if snapshot_class.incremental:
+            try:
+                return snapshot_class.create_snapshot(changes_since=changes_since), False
+            except Exception as e:
+                LOG.warning("Filtered listing of %s failed (%s), listing all",
+                            snapshot_class.category, e)
+        return snapshot_class.create_snapshot(), True
+
+    def collect(self, func):
+
+        """ func(collector) of every collector, run in parallel, in the
+        order of list_subclass. """
+
+        executor = ThreadPoolExecutor(max(len(self.list_subclass), 1))
+        try:
+            return executor.map(func, self.list_subclass)
+        finally:
+            executor.shutdown(wait=False)
@@ -0,0 +1,96 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+import os
+import shutil
+
+from SnapshotDelta import SnapshotBase
+from utils import dump_to_file, get_log, load_json_from_file
+__author__ = 'mirrorcoder'
+
+BASE_PREFIX = "base-"
+SUFFIX = ".snapshot"
+TMP_SUFFIX = ".tmp"
+# a delta with more changes than this part of the base becomes a new base
+REBASE_RATIO = 0.5
+
+LOG = get_log(__name__)
+
+
+class SnapshotStore(object):
+
+    """
+        Snapshots of one cloud in directory path. The first snapshot is
+        written in full as base-<timestamp>.snapshot, the next ones as
+        <timestamp>.snapshot holding only the changes against the latest
+        base. Both are read back with SnapshotDelta.load_snapshot.
+    """
+
+    def __init__(self, path, incremental=True):
+        self.path = path
+        self.incremental = incremental
+        if not os.path.exists(path):
+            os.makedirs(path)
+
+    def take(self, snapshot_state):
+
+        """ Snapshot the cloud of snapshot_state, returns the record
+        {'path': ..., 'timestamp': ...} of the written file. """
+
+        base = self.get_base() if self.incremental else None
+        if base:
+            delta = snapshot_state.create_delta(base)
+            if delta.size() <= base.size() * REBASE_RATIO:
+                path = "%s/%r%s" % (self.path, delta.timestamp, SUFFIX)
+                delta.dump(path + TMP_SUFFIX)
+                os.rename(path + TMP_SUFFIX, path)
+                return {'path': path, 'timestamp': delta.timestamp}
+            LOG.info("Snapshot %s differs from base %s in %s objects, rebasing",
+                     self.path, base.path, delta.size())
+            snapshot = delta.materialize()
+        else:
+            snapshot = snapshot_state.create_snapshot()
+        prefix = BASE_PREFIX if self.incremental else ""
+        path = "%s/%s%r%s" % (self.path, prefix, snapshot.timestamp, SUFFIX)
+        dump_to_file(path + TMP_SUFFIX, snapshot)
+        os.rename(path + TMP_SUFFIX, path)
+        return {'path': path, 'timestamp': snapshot.timestamp}
+
+    def get_base(self):
+        bases = [name for name in os.listdir(self.path)
+                 if name.startswith(BASE_PREFIX) and name.endswith(SUFFIX)]
+        if not bases:
+            return None
+        bases.sort(key=lambda name: float(name[len(BASE_PREFIX):-len(SUFFIX)]))
+        return SnapshotBase.load("%s/%s" % (self.path, bases[-1]))
+
+    def copy(self, record):
+
+        """ Copy the snapshot of record, taken by another store, into this
+        store. A delta is copied along with its base and points to the
+        copy of the base. Returns the record of the copy. """
+
+        snapshot_dict = load_json_from_file(record['path'])
+        if 'base' not in snapshot_dict:
+            path = "%s/%s" % (self.path, os.path.basename(record['path']))
+            shutil.copy(record['path'], path)
+            return {'path': path, 'timestamp': record['timestamp']}
+        base = "%s/%s" % (self.path, os.path.basename(snapshot_dict['base']))
+        if not os.path.exists(base):
+            shutil.copy(snapshot_dict['base'], base + TMP_SUFFIX)
+            os.rename(base + TMP_SUFFIX, base)
+        snapshot_dict['base'] = base
+        path = "%s/%r%s" % (self.path, record['timestamp'], SUFFIX)
+        dump_to_file(path + TMP_SUFFIX, snapshot_dict)
+        os.rename(path + TMP_SUFFIX, path)
+        return {'path': path, 'timestamp': record['timestamp']}
@@ -17,6 +17,8 @@ __author__ = 'mirrorcoder'
 
 
 class SnapshotVolumes(SnapshotState):
+    category = 'volumes'
+
     def create_snapshot(self):
         snapshot = Snapshot()
         [snapshot.addVolume(id=volume.id,
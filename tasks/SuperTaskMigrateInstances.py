@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and#
 # limitations under the License.
 
+from scheduler.Scheduler import Scheduler
 from scheduler.SuperTask import SuperTask
 from SuperTaskImportInstance import SuperTaskImportInstance
 from SuperTaskExportInstance import SuperTaskExportInstance
@@ -20,8 +21,15 @@ from scheduler.transaction.TaskTransaction import TaskTransactionBegin, TaskTran
 from tasks.TaskCreateSnapshotOs import TaskCreateSnapshotOs
 from migrationlib.os.utils.rollback.RollbackOpenStack import RollbackOpenStack
 from tasks.TaskRestoreSourceCloud import TaskRestoreSourceCloud
+from cloudferrylib.scheduler.dispatcher import Dispatcher
+from cloudferrylib.scheduler.executor import get_executor
+from utils import get_log
 __author__ = 'mirrorcoder'
 
+LOG = get_log(__name__)
+
+DEFAULT_CEPH_POOL = 'compute'
+
 
 class SuperTaskMigrateInstances(SuperTask):
 
@@ -31,17 +39,67 @@ class SuperTaskMigrateInstances(SuperTask):
                 yield instance
 
     def run(self, config=None, inst_exporter=None, inst_importer=None, __rollback_status__=None, **kwargs):
-        supertasks_migrate = []
-        for instance in self.search_instances_by_search_opts(config, inst_exporter):
-            supertasks_migrate.append(TaskCreateSnapshotOs())
-            supertasks_migrate.append(TaskTransactionBegin(
-                transaction_listener=TransactionsListenerOs(instance,
-                                                            rollback=RollbackOpenStack(instance.id,
-                                                                                       inst_exporter,
-                                                                                       inst_importer))))
-            supertasks_migrate.append(SuperTaskExportInstance(instance=instance))
-            supertasks_migrate.append(SuperTaskImportInstance())
-            supertasks_migrate.append(TaskCreateSnapshotOs())
-            supertasks_migrate.append(TaskTransactionEnd())
-            supertasks_migrate.append(TaskRestoreSourceCloud())
-        return supertasks_migrate
\ No newline at end of file
+        parallel = config.get('parallel', {})
+        instances = self.search_instances_by_search_opts(config, inst_exporter)
+        if parallel.get('instances', 1) <= 1:
+            supertasks_migrate = []
+            for instance in instances:
+                supertasks_migrate.extend(self.get_pipeline(instance, inst_exporter, inst_importer))
+            return supertasks_migrate
+        self.migrate_parallel(config, parallel, instances, inst_exporter, inst_importer)
+        return []
+
+    def get_pipeline(self, instance, inst_exporter, inst_importer):
+        return [TaskCreateSnapshotOs(),
+                TaskTransactionBegin(
+                    transaction_listener=TransactionsListenerOs(instance,
+                                                                rollback=RollbackOpenStack(instance.id,
+                                                                                           inst_exporter,
+                                                                                           inst_importer))),
+                SuperTaskExportInstance(instance=instance),
+                SuperTaskImportInstance(),
+                TaskCreateSnapshotOs(),
+                TaskTransactionEnd(),
+                TaskRestoreSourceCloud()]
+
+    def migrate_parallel(self, config, parallel, instances, inst_exporter, inst_importer):
+
+        """
+            Run pipelines of several instances at once.
+            Every pipeline is run by its own Scheduler in a forked process
+            and namespace, so its transaction listener journals and commits
+            the status of the instance as in serial mode.
+            Number of pipelines per compute host and per Ceph pool is limited
+            by parallel:per_compute_host and parallel:per_ceph_pool.
+        """
+
+        dispatcher = Dispatcher(get_executor(max_workers=parallel['instances']),
+                                {'host': parallel.get('per_compute_host', 1),
+                                 'pool': parallel.get('per_ceph_pool', parallel['instances'])})
+        pool = self.get_ceph_pool(config)
+        futures = {}
+        for instance in instances:
+            pipeline = self.get_pipeline(instance, inst_exporter, inst_importer)
+            futures[instance.id] = dispatcher.submit(self.run_pipeline,
+                                                     {'host': getattr(instance, 'OS-EXT-SRV-ATTR:host'),
+                                                      'pool': pool},
+                                                     self.namespace.fork(),
+                                                     pipeline)
+        dispatcher.join(futures.values())
+        for instance_id, future in futures.iteritems():
+            if future.result():
+                LOG.error("Migration of instance %s failed with exit code %s", instance_id, future.result())
+
+    @staticmethod
+    def get_ceph_pool(config):
+        ephemeral_drives = config['clouds']['source'].get('ephemeral_drives', {})
+        if not ephemeral_drives.get('ceph'):
+            return None
+        return ephemeral_drives.get('pool', DEFAULT_CEPH_POOL)
+
+    @staticmethod
+    def run_pipeline(namespace, tasks):
+        scheduler = Scheduler(namespace)
+        for task in tasks:
+            scheduler.addTask(task)
+        scheduler.run()
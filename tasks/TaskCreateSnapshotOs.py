@@ -14,9 +14,10 @@
 
 import os
 
+from cloudferrylib.scheduler.executor import ThreadPoolExecutor
 from cloudferrylib.scheduler.task import Task
 from migrationlib.os.utils.snapshot.SnapshotStateOpenStack import SnapshotStateOpenStack
-from utils import dump_to_file
+from migrationlib.os.utils.snapshot.SnapshotStore import SnapshotStore
 
 __author__ = 'mirrorcoder'
 
@@ -28,19 +29,23 @@ class TaskCreateSnapshotOs(Task):
         super(TaskCreateSnapshotOs, self).__init__(namespace=namespace)
         self.__init_directory(self.prefix)
 
-    def run(self, inst_exporter=None, inst_importer=None, snapshots={'source': [], 'dest': []}, **kwargs):
-        snapshot_source = SnapshotStateOpenStack(inst_exporter).create_snapshot()
-        snapshot_dest = SnapshotStateOpenStack(inst_importer).create_snapshot()
-        path_source = "%s/source/%s.snapshot" % (self.prefix, snapshot_source.timestamp)
-        path_dest = "%s/dest/%s.snapshot" % (self.prefix, snapshot_dest.timestamp)
-        snapshots['source'].append({'path': path_source, 'timestamp': snapshot_source.timestamp})
-        snapshots['dest'].append({'path': path_dest, 'timestamp': snapshot_dest.timestamp})
-        dump_to_file(path_source, snapshot_source)
-        dump_to_file(path_dest, snapshot_dest)
+    def run(self, inst_exporter=None, inst_importer=None, snapshots={'source': [], 'dest': []}, config=None,
+            **kwargs):
+        incremental = (config or {}).get('incremental_snapshots', True)
+        # both clouds at once
+        executor = ThreadPoolExecutor(2)
+        source = executor.submit(self.__take, "source", inst_exporter, incremental)
+        dest = executor.submit(self.__take, "dest", inst_importer, incremental)
+        executor.shutdown(wait=False)
+        snapshots['source'].append(source.result())
+        snapshots['dest'].append(dest.result())
         return {
             'snapshots': snapshots
         }
 
+    def __take(self, name, cloud, incremental):
+        return SnapshotStore("%s/%s" % (self.prefix, name), incremental).take(SnapshotStateOpenStack(cloud))
+
     def __init_directory(self, prefix):
         if not os.path.exists("%s/source" % prefix):
             os.makedirs("%s/source" % prefix)
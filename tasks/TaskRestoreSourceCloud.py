@@ -16,8 +16,7 @@ from cloudferrylib.scheduler.task import Task
 from migrationlib.os.utils.restore.RestoreStateOpenStack import RestoreStateOpenStack
 from migrationlib.os.utils.snapshot.SnapshotStateOpenStack import SnapshotStateOpenStack
 from migrationlib.os.utils.restore.NoReport import NoReport
-from utils import load_json_from_file
-from migrationlib.os.utils.snapshot.Snapshot import Snapshot
+from migrationlib.os.utils.snapshot.SnapshotDelta import load_snapshot
 __author__ = 'mirrorcoder'
 
 
@@ -29,10 +28,10 @@ class TaskRestoreSourceCloud(Task):
     def run(self, inst_exporter=None, snapshots={'source': [], 'dest': []}, **kwargs):
         report = NoReport()
         if len(snapshots['source']) > 1:
-            snapshot_one = Snapshot(load_json_from_file(snapshots['source'][-2]['path']))
-            snapshot_two = Snapshot(load_json_from_file(snapshots['source'][-1]['path']))
-            report = RestoreStateOpenStack(inst_exporter).restore(SnapshotStateOpenStack.diff_snapshot(snapshot_one,
-                                                                                                       snapshot_two))
+            snapshot_one = load_snapshot(snapshots['source'][-2]['path'])
+            snapshot_two = load_snapshot(snapshots['source'][-1]['path'])
+            report = RestoreStateOpenStack(inst_exporter).restore(SnapshotStateOpenStack.iter_diff(snapshot_one,
+                                                                                                   snapshot_two))
         return {
             'last_report_source': report
         }
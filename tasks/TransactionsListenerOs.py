@@ -1,5 +1,4 @@
 import os
-import json
 import shutil
 import time
 import uuid
@@ -8,7 +7,9 @@ import copy
 from scheduler.transaction.TaskTransaction import TransactionsListener
 from scheduler.transaction.TaskTransaction import ERROR, NO_ERROR
 from migrationlib.os.utils.rollback.Rollback import Rollback
-from cloudferrylib.scheduler.namespace import Namespace
+from migrationlib.os.utils.rollback.StatusStore import StatusStore, STATUS_FILE
+from migrationlib.os.utils.snapshot.SnapshotStore import SnapshotStore
+from cloudferrylib.utils.journal import JournalWriter, KeyDelta, CHANGES, DELETED, SNAPSHOTS
 from utils import convert_to_dict
 
 __author__ = 'mirrorcoder'
@@ -33,6 +34,7 @@ class TransactionsListenerOs(TransactionsListener):
         self.error_status = NO_ERROR
         self.rollback = rollback
         self.f = None
+        self.namespace_delta = KeyDelta(convert_to_dict)
 
     def event_begin(self, namespace=None, *args, **kwargs):
         handler = self.handler_begin
@@ -86,10 +88,11 @@ class TransactionsListenerOs(TransactionsListener):
     def handler_begin(self, namespace=None, **kwargs):
         self.__init_directory(self.prefix, self.prefix_path, self.rewrite)
         self.__commit_status(self.id_transaction, self.error_status, 'event_begin')
-        self.f = open(self.prefix_path+"tasks.trans", "a+")
+        self.f = JournalWriter(self.prefix_path+"tasks.trans")
+        transaction = dict(self.transaction)
         if 'snapshots' in namespace.vars:
-            self.__save_snapshots(namespace.vars['snapshots'])
-        self.__add_obj_to_file(self.transaction, self.f)
+            transaction[SNAPSHOTS] = self.__save_snapshots(namespace.vars['snapshots'])
+        self.__add_obj_to_journal(transaction, sync=True)
         return False
 
     def handler_can_run_next_task(self, namespace=None, task=None, skip=None, **kwargs):
@@ -98,29 +101,29 @@ class TransactionsListenerOs(TransactionsListener):
     def handler_task(self, namespace=None, task=None, skip=None, **kwargs):
         task_obj = dict()
         task_obj['event'] = 'event task'
-        task_obj['namespace'] = convert_to_dict(self.__prepare_dict(namespace.vars))
+        task_obj[CHANGES], task_obj[DELETED] = self.namespace_delta(self.__prepare_dict(namespace.vars))
         task_obj['task'] = str(task)
         task_obj['skip'] = skip
-        self.__add_obj_to_file(task_obj, self.f)
+        self.__add_obj_to_journal(task_obj)
         return True
 
     def handler_error(self, namespace=None, task=None, exception=None, **kwargs):
         task_error_obj = dict()
         task_error_obj['event'] = 'event error'
-        task_error_obj['namespace'] = convert_to_dict(Namespace(self.__prepare_dict(namespace.vars)))
+        task_error_obj[CHANGES], task_error_obj[DELETED] = self.namespace_delta(self.__prepare_dict(namespace.vars))
         task_error_obj['task'] = str(task)
         task_error_obj['exception'] = str(exception)
-        self.__add_obj_to_file(task_error_obj, self.f)
+        self.__add_obj_to_journal(task_error_obj, sync=True)
         self.error_status = ERROR
         return False
 
     def handler_end(self, namespace=None, **kwargs):
         if self.f:
-            if 'snapshots' in namespace.vars:
-                self.__save_snapshots(namespace.vars['snapshots'])
             task_end = dict()
             task_end['event'] = 'event end'
-            self.__add_obj_to_file(task_end, self.f)
+            if 'snapshots' in namespace.vars:
+                task_end[SNAPSHOTS] = self.__save_snapshots(namespace.vars['snapshots'])
+            self.__add_obj_to_journal(task_end)
             self.f.close()
             self.__commit_status(self.id_transaction, self.error_status, 'event_end')
             if self.error_status == NO_ERROR:
@@ -130,9 +133,8 @@ class TransactionsListenerOs(TransactionsListener):
             return True
 
     def __commit_status(self, id_transaction, status, event):
-        commit = {'id_transaction': id_transaction, 'status': status, 'event': event}
-        with open(self.prefix+"/status.inf", "a+") as f:
-            self.__add_obj_to_file(commit, f)
+        commit = {'id_transaction': id_transaction, 'status': status, 'event': event, 'timestamp': time.time()}
+        StatusStore.load(self.prefix+STATUS_FILE).add(commit)
 
     def __init_directory(self, prefix, prefix_path, rewrite):
         if rewrite and os.path.exists(prefix_path):
@@ -144,12 +146,9 @@ class TransactionsListenerOs(TransactionsListener):
         if not os.path.exists(prefix_path+"dest/"):
             os.makedirs(prefix_path+"dest/")
 
-    def __add_obj_to_file(self, obj_dict, f):
+    def __add_obj_to_journal(self, obj_dict, sync=False):
         obj_dict['timestamp'] = time.time()
-        json.dump(obj_dict, f)
-        f.write("\n")
-        f.flush()
-        os.fsync(f)
+        self.f.write(obj_dict, sync)
 
     def __prepare_dict(self, dict_namespace, exclude_fields=['config', 'res_importer', 'res_exporter', 'resources']):
         result = copy.copy(dict_namespace)
@@ -159,8 +158,14 @@ class TransactionsListenerOs(TransactionsListener):
         return result
 
     def __save_snapshots(self, snapshots):
-        source = snapshots['source'][-1]
-        dest = snapshots['dest'][-1]
-        shutil.copy(source['path'], (self.prefix_path+"source/%s.snapshot") % source['timestamp'])
-        shutil.copy(dest['path'], (self.prefix_path+"dest/%s.snapshot") % dest['timestamp'])
+
+
+        """ Copy the latest snapshots of both clouds into the transaction,
+        returns their paths relative to the transaction directory. """
+
+        paths = {}
+        for cloud in ('source', 'dest'):
+            path = SnapshotStore(self.prefix_path+cloud).copy(snapshots[cloud][-1])['path']
+            paths[cloud] = os.path.relpath(path, self.prefix_path)
+        return paths
 
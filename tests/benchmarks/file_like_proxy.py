@@ -0,0 +1,119 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+"""
+    Throughput and CPU per GB of FileLikeProxy.speed_limited_read
+    against the former string-buffer implementation. The limit is set
+    high enough to never sleep, so only the buffering cost is measured:
+
+        python -m tests.benchmarks.file_like_proxy [size_mb] [read_size]
+"""
+
+import os
+import sys
+import time
+
+from migrationlib.os.utils import FileLikeProxy
+
+__author__ = 'mirrorcoder'
+
+UNLIMITED = '1000000mb'
+BLOCK = memoryview('x' * 64 * 1024 * 1024)
+
+
+class FakeResponse(object):
+
+    """ Like httplib response: read(size) returns size bytes in a new
+    string. """
+
+    def __init__(self, length):
+        self.length = length
+        self.left = length
+
+    def read(self, size=len(BLOCK)):
+        size = min(size, len(BLOCK), self.left)
+        self.left -= size
+        return BLOCK[:size].tobytes()
+
+    def close(self):
+        pass
+
+
+class FakeSource(object):
+    def __init__(self, length):
+        self.length = length
+
+    def get_ref_image(self, image_id):
+        return FakeResponse(self.length)
+
+
+class StringBufferProxy(object):
+
+    """ The former speed_limited_read: str concatenation and slicing. """
+
+    def __init__(self, transfer_object, speed_limit):
+        self.resp = transfer_object['resource_src'].get_ref_image(
+            transfer_object['id'])
+        self.speed_limit = FileLikeProxy.parse_speed_limit(speed_limit)
+        self.buffer = ''
+        self.prev_send_time = 0
+
+    def read(self, *args, **kwargs):
+        if len(self.buffer) < FileLikeProxy.CHUNK_SIZE:
+            self.buffer += self.resp.read(*args, **kwargs)
+
+        res = self.buffer[0:FileLikeProxy.CHUNK_SIZE]
+        self.buffer = self.buffer[FileLikeProxy.CHUNK_SIZE::]
+
+        cur_send_time = time.time()
+        sleep_time = float(len(res)) / self.speed_limit
+        sleep_time -= cur_send_time - self.prev_send_time
+        time.sleep(max((0, sleep_time)))
+        self.prev_send_time = cur_send_time
+        return res
+
+
+def run(proxy, read_size):
+    cpu = sum(os.times()[:2])
+    wall = time.time()
+    total = 0
+    while True:
+        data = proxy.read(read_size)
+        if not data:
+            break
+        total += len(data)
+    return total, time.time() - wall, sum(os.times()[:2]) - cpu
+
+
+def main(size_mb=1024, read_size=FileLikeProxy.CHUNK_SIZE):
+    length = size_mb * 1024 * 1024
+    transfer_object = {'resource_src': FakeSource(length),
+                       'id': 'fake_id',
+                       'name': 'fake_name',
+                       'size': length}
+    proxies = [
+        ('string buffer', StringBufferProxy(transfer_object, UNLIMITED)),
+        ('direct read', FileLikeProxy.FileLikeProxy(
+            transfer_object, lambda *args: None, UNLIMITED))]
+    print "%s MB, read(%s)" % (size_mb, read_size)
+    print "%-15s %12s %12s %12s" % ('proxy', 'MB/s', 'cpu s/GB', 'bytes')
+    for name, proxy in proxies:
+        total, wall, cpu = run(proxy, read_size)
+        gb = float(total) / 1024 ** 3
+        print "%-15s %12.1f %12.3f %12s" % (
+            name, total / 1024.0 ** 2 / wall, cpu / gb if gb else 0, total)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
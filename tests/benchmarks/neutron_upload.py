@@ -0,0 +1,150 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+"""
+    Resource matching of the NeutronNetwork upload phase on a synthetic
+    tenant: N networks with a subnet and a floating ip each, all networks
+    already present on the destination. ResourceIndex lookups against
+    the former linear get_res_by_hash/get_res_hash_by_id scans, Neutron
+    calls are answered in memory:
+
+        python -m tests.benchmarks.neutron_upload [networks]
+"""
+
+import sys
+import time
+
+from cloudferrylib.os.network import neutron
+
+__author__ = 'mirrorcoder'
+
+
+class FakeNeutronClient(object):
+    def __init__(self):
+        self.calls = 0
+
+    def create_subnet(self, info):
+        self.calls += 1
+        return {'subnet': {'id': 'dst_subnet_%s' % self.calls}}
+
+    def delete_floatingip(self, floatingip_id):
+        self.calls += 1
+
+    def create_floatingip(self, info):
+        self.calls += 1
+
+
+class FakeIdentityClient(object):
+    def get_tenant_id_by_name(self, name):
+        return 'dst_' + name
+
+
+def fixture(count):
+    src_nets, dst_nets, subnets, src_floats, dst_floats = [], [], [], [], []
+    for i in xrange(count):
+        tenant = 'tenant_%s' % (i % 100)
+        src_nets.append({'id': 'src_net_%s' % i, 'res_hash': 'net_%s' % i})
+        dst_nets.append({'id': 'dst_net_%s' % i, 'res_hash': 'net_%s' % i})
+        subnets.append({'id': 'src_subnet_%s' % i,
+                        'name': 'subnet_%s' % i,
+                        'network_id': 'src_net_%s' % i,
+                        'tenant_name': tenant,
+                        'enable_dhcp': True,
+                        'cidr': '10.%s.%s.0/24' % (i / 256 % 256, i % 256),
+                        'allocation_pools': [],
+                        'gateway_ip': None,
+                        'ip_version': 4,
+                        'res_hash': 'subnet_%s' % i})
+        address = '172.%s.%s.1' % (i / 256 % 256, i % 256)
+        src_floats.append({'floating_network_id': 'src_net_%s' % i,
+                           'floating_ip_address': address,
+                           'tenant_name': tenant})
+        dst_floats.append({'id': 'dst_float_%s' % i,
+                           'floating_network_id': 'dst_net_%s' % i,
+                           'floating_ip_address': address,
+                           'tenant_id': 'admin'})
+    return src_nets, dst_nets, subnets, src_floats, dst_floats
+
+
+def make_network(dst_nets):
+    network = neutron.NeutronNetwork.__new__(neutron.NeutronNetwork)
+    network.neutron_client = FakeNeutronClient()
+    network.identity_client = FakeIdentityClient()
+    network.listings = None
+    network.get_networks = lambda: list(dst_nets)
+    network.get_subnets = lambda: []
+    return network
+
+
+def linear_get_res_by_hash(existing_resources, resource_hash):
+    for resource in existing_resources:
+        if resource['res_hash'] == resource_hash:
+            return resource
+
+
+def linear_get_res_hash_by_id(resources, resource_id):
+    for resource in resources:
+        if resource['id'] == resource_id:
+            return resource['res_hash']
+
+
+def linear_upload(network, src_nets, subnets, src_floats, dst_floats):
+
+    """ The former matching of upload_subnets and recreate_floatingips. """
+
+    existing_nets = network.get_networks()
+    existing_subnets_hashlist = \
+        [ex_snet['res_hash'] for ex_snet in network.get_subnets()]
+    for snet in subnets:
+        net_hash = linear_get_res_hash_by_id(src_nets, snet['network_id'])
+        linear_get_res_by_hash(existing_nets, net_hash)['id']
+        if snet['res_hash'] not in existing_subnets_hashlist:
+            network.neutron_client.create_subnet({})
+    for src_float in src_floats:
+        ext_net_hash = \
+            linear_get_res_hash_by_id(src_nets,
+                                      src_float['floating_network_id'])
+        ext_net = linear_get_res_by_hash(existing_nets, ext_net_hash)
+        for floating in dst_floats:
+            if floating['floating_ip_address'] == \
+                    src_float['floating_ip_address']:
+                if floating['floating_network_id'] == ext_net['id']:
+                    if floating['tenant_id'] != 'dst_tenant':
+                        network.neutron_client.delete_floatingip(
+                            floating['id'])
+                        network.neutron_client.create_floatingip({})
+
+
+def indexed_upload(network, src_nets, subnets, src_floats, dst_floats):
+    network.upload_subnets(src_nets, subnets)
+    network.recreate_floatingips(src_floats, src_nets,
+                                 network.get_networks(), dst_floats)
+
+
+def main(count=10000):
+    src_nets, dst_nets, subnets, src_floats, dst_floats = fixture(count)
+    print "%s networks, %s subnets, %s floating ips" % (
+        count, len(subnets), len(src_floats))
+    print "%-10s %12s %12s" % ('matching', 'seconds', 'api calls')
+    for name, upload in (('linear', linear_upload),
+                         ('indexed', indexed_upload)):
+        network = make_network(dst_nets)
+        start = time.time()
+        upload(network, src_nets, subnets, src_floats, dst_floats)
+        print "%-10s %12.3f %12s" % (name, time.time() - start,
+                                     network.neutron_client.calls)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
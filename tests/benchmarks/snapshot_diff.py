@@ -0,0 +1,115 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+"""
+    Diff of two synthetic snapshots of N objects split between instances,
+    volumes and images, 1% of them changed, added or deleted. The former
+    nested-dict diff_snapshot against SnapshotState.iter_diff on full
+    snapshots (as loaded from json, no object shared), on snapshots
+    materialized from one base and on deltas of one base:
+
+        python -m tests.benchmarks.snapshot_diff [objects]
+"""
+
+import copy
+import sys
+import time
+
+from migrationlib.os.utils.snapshot.Snapshot import *
+from migrationlib.os.utils.snapshot.SnapshotDelta import SnapshotBase, SnapshotDelta
+from migrationlib.os.utils.snapshot.SnapshotState import SnapshotState
+
+__author__ = 'mirrorcoder'
+
+
+def fixture(count):
+    snapshot = Snapshot()
+    snapshot.timestamp = 0
+    for i in xrange(count):
+        id = 'object_%s' % i
+        if i % 3 == 0:
+            snapshot.instances[id] = {'name': 'server_%s' % i, 'status': 'ACTIVE'}
+        elif i % 3 == 1:
+            snapshot.volumes[id] = {'display_name': 'volume_%s' % i, 'status': 'in-use',
+                                    'attachments': [{'id': id, 'server_id': 'object_%s' % (i - 1),
+                                                     'device': '/dev/vdb'}]}
+        else:
+            snapshot.images[id] = {'name': 'image_%s' % i, 'disk_format': 'qcow2',
+                                   'checksum': '%032x' % i}
+    return snapshot
+
+
+def changes(snapshot):
+    res = dict((category, {}) for category in CATEGORIES)
+    for category in ('instances', 'volumes', 'images'):
+        for i, id in enumerate(sorted(getattr(snapshot, category))[::100]):
+            if i % 3 == 0:
+                res[category][id] = dict(getattr(snapshot, category)[id], status='ERROR')
+            elif i % 3 == 1:
+                res[category][id] = None
+            else:
+                res[category][id + '_new'] = dict(getattr(snapshot, category)[id])
+    return res
+
+
+def nested_diff(snapshot_one, snapshot_two):
+
+    """ The former SnapshotState.diff_snapshot. """
+
+    snapshot_one_res = Snapshot.excluding_fields(snapshot_one.convert_to_dict(), ['timestamp'])
+    snapshot_two_res = Snapshot.excluding_fields(snapshot_two.convert_to_dict(), ['timestamp'])
+    snapshot_diff = Snapshot()
+    for item_two in snapshot_two_res:
+        for obj in snapshot_two_res[item_two]:
+            if not obj in snapshot_one_res[item_two]:
+                snapshot_diff.add(obj, item_two, DiffObject(ADD, snapshot_two_res[item_two][obj]))
+            elif snapshot_two_res[item_two][obj] != snapshot_one_res[item_two][obj]:
+                snapshot_diff.add(obj, item_two, DiffObject(CHANGE,
+                                                            DiffValue(snapshot_one_res[item_two][obj],
+                                                                      snapshot_two_res[item_two][obj])))
+        for obj in snapshot_one_res[item_two]:
+            if not obj in snapshot_two_res[item_two]:
+                snapshot_diff.add(obj, item_two, DiffObject(DELETE, snapshot_one_res[item_two][obj]))
+    return sum(len(getattr(snapshot_diff, category)) for category in CATEGORIES)
+
+
+def streamed_diff(snapshot_one, snapshot_two):
+    return sum(1 for diff in SnapshotState.iter_diff(snapshot_one, snapshot_two))
+
+
+def measure(name, diff, snapshot_one, snapshot_two):
+    start = time.time()
+    count = diff(snapshot_one, snapshot_two)
+    print "%-28s %10.3f %10s" % (name, time.time() - start, count)
+
+
+def main(count=100000):
+    base = SnapshotBase('base', fixture(count))
+    empty = SnapshotDelta(base, timestamp=0)
+    delta = SnapshotDelta(base, changes(base.snapshot), timestamp=1)
+    full_one = copy.deepcopy(base.snapshot)
+    full_two = copy.deepcopy(delta.materialize())
+    shared_one = empty.materialize()
+    shared_two = delta.materialize()
+    print "%s objects, %s changed" % (count, delta.size())
+    print "%-28s %10s %10s" % ('diff', 'seconds', 'diffs')
+    measure('nested, full', nested_diff, full_one, full_two)
+    measure('iter_diff, full', streamed_diff, full_one, full_two)
+    measure('nested, materialized', nested_diff, shared_one, shared_two)
+    measure('iter_diff, materialized', streamed_diff, shared_one, shared_two)
+    measure('iter_diff, deltas', streamed_diff, empty, delta)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
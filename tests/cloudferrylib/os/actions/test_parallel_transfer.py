@@ -0,0 +1,85 @@
+# Copyright 2014: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+import mock
+from oslotest import mockpatch
+
+from cloudferrylib.os.actions import parallel_transfer
+from cloudferrylib.scheduler import executor
+from cloudferrylib.utils import bandwidth
+from cloudferrylib.utils import utils
+from tests import test
+
+
+class ParallelTransferTest(test.TestCase):
+    def setUp(self):
+        super(ParallelTransferTest, self).setUp()
+        self.useFixture(mockpatch.PatchObject(
+            parallel_transfer, 'get_executor',
+            new=lambda name, workers: executor.get_executor(executor.THREAD,
+                                                            workers)))
+        self.tunnel = utils.wrapper_singletone_ssh_tunnel("9000-9010")
+        self.useFixture(mockpatch.PatchObject(utils, 'up_ssh_tunnel',
+                                              new=self.tunnel, create=True))
+        self.cfg = mock.Mock(transfer_workers=4,
+                             transfer_per_src_host=2,
+                             transfer_per_dst_host=2)
+
+    def test_transfer(self):
+        fake_transfer = mock.Mock(return_value=None)
+        transfer = parallel_transfer.ParallelTransfer(self.cfg)
+        transfer.add(fake_transfer, 'src', 'dst', True, 'path1')
+        transfer.add(fake_transfer, 'src', 'dst', True, 'path2')
+        transfer.add(fake_transfer, 'src', 'dst', False, 'path3')
+        transfer.join()
+        self.assertEqual(3, fake_transfer.call_count)
+        calls = dict((c[0][0], c[1]) for c in fake_transfer.call_args_list)
+        self.assertIn(calls['path1']['port'], range(9000, 9011))
+        self.assertIn(calls['path2']['port'], range(9000, 9011))
+        self.assertEqual({}, calls['path3'])
+        self.assertEqual([], self.tunnel.busy_port)
+
+    def test_ports_taken_by_running_transfers(self):
+        ports = []
+        fake_transfer = mock.Mock(
+            side_effect=lambda path, port: ports.append(
+                (port, list(self.tunnel.busy_port))))
+        transfer = parallel_transfer.ParallelTransfer(self.cfg)
+        for i in xrange(30):
+            transfer.add(fake_transfer, 'src', 'dst', True, 'path%s' % i)
+        transfer.join()
+        self.assertEqual(30, len(ports))
+        for port, busy in ports:
+            self.assertIn(port, busy)
+            self.assertLessEqual(len(busy), self.cfg.transfer_per_src_host)
+        self.assertEqual([], self.tunnel.busy_port)
+
+    def test_failed_transfer(self):
+        fake_transfer = mock.Mock(side_effect=Exception())
+        transfer = parallel_transfer.ParallelTransfer(self.cfg)
+        transfer.add(fake_transfer, 'src', 'dst', False, 'path1')
+        self.assertRaises(RuntimeError, transfer.join)
+
+    def test_bandwidth_reserved(self):
+        manager = bandwidth.BandwidthManager(4000000)
+        self.useFixture(mockpatch.PatchObject(bandwidth, 'manager',
+                                              new=manager))
+        fake_transfer = mock.Mock(return_value=None)
+        transfer = parallel_transfer.ParallelTransfer(self.cfg)
+        transfer.add(fake_transfer, 'src', 'dst', False, 'path1')
+        transfer.join()
+        fake_transfer.assert_called_once_with('path1', speed_limit=1000000)
+        self.assertEqual([], manager.streams)
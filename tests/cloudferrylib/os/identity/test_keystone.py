@@ -353,3 +353,91 @@ class KeystoneIdentityTestCase(test.TestCase):
                           'id': role},
                  'meta': {}})
         return fake_info
+
+    def test_lookups_cached(self):
+        fake_tenants_list = [self.fake_tenant_0, self.fake_tenant_1]
+        self.mock_client().tenants.list.return_value = fake_tenants_list
+        self.mock_client().tenants.list.reset_mock()
+
+        self.assertEqual('tenant_id_1',
+                         self.keystone_client.get_tenant_id_by_name(
+                             'tenant_name_1'))
+        self.assertEqual(self.fake_tenant_0,
+                         self.keystone_client.get_tenant_by_name(
+                             'tenant_name_0'))
+        get_tenant_name = self.keystone_client.get_tenants_func()
+        self.assertEqual('tenant_name_1', get_tenant_name('tenant_id_1'))
+        self.assertEqual('admin', get_tenant_name('fake_tenant_id'))
+        self.assertEqual(1, self.mock_client().tenants.list.call_count)
+
+    def test_create_tenant_indexed(self):
+        self.mock_client().tenants.list.return_value = [self.fake_tenant_0]
+        self.mock_client().tenants.create.return_value = self.fake_tenant_1
+        self.keystone_client.get_tenants_list()
+
+        self.keystone_client.create_tenant('tenant_name_1')
+
+        self.assertEqual('tenant_id_1',
+                         self.keystone_client.get_tenant_id_by_name(
+                             'tenant_name_1'))
+
+    def test_get_user_tenants_roles_from_db(self):
+        self.mock_client().tenants.list.return_value = [self.fake_tenant_0,
+                                                        self.fake_tenant_1]
+        self.mock_client().users.list.return_value = [self.fake_user_0,
+                                                      self.fake_user_1]
+        self.mock_client().roles.list.return_value = [self.fake_role_0,
+                                                      self.fake_role_1]
+        mysql_connector = mock.Mock()
+        mysql_connector.execute.return_value = [
+            ('user_id_0', 'tenant_id_1', 'role_id_1')]
+        self.keystone_client.mysql_connector = mysql_connector
+
+        user_tenants_roles = self.keystone_client._get_user_tenants_roles()
+
+        self.assertEqual({'user_name_0': {'tenant_name_1': [
+            {'role': {'name': 'role_name_1', 'id': 'role_id_1'}}]}},
+            user_tenants_roles)
+        self.assertFalse(self.mock_client().roles.roles_for_user.called)
+
+    def test_get_roles_assignments_db_fallback(self):
+        self.mock_client().tenants.list.return_value = [self.fake_tenant_0]
+        self.mock_client().users.list.return_value = [self.fake_user_0]
+        self.mock_client().roles.roles_for_user.return_value = [
+            self.fake_role_0]
+        mysql_connector = mock.Mock()
+        mysql_connector.execute.side_effect = Exception()
+        self.keystone_client.mysql_connector = mysql_connector
+
+        self.assertEqual([('user_id_0', 'tenant_id_0', 'role_id_0')],
+                         self.keystone_client._get_roles_assignments())
+        self.assertEqual(2, mysql_connector.execute.call_count)
+
+    def test_get_user_passwords(self):
+        self.mock_client().users.list.return_value = [self.fake_user_0,
+                                                      self.fake_user_1]
+        mysql_connector = mock.Mock()
+        mysql_connector.select_in.return_value = [('user_id_1', 'hash_1'),
+                                                  ('user_id_0', 'hash_0')]
+        self.keystone_client.mysql_connector = mysql_connector
+
+        self.assertEqual({'user_name_0': 'hash_0', 'user_name_1': 'hash_1'},
+                         self.keystone_client._get_user_passwords())
+        mysql_connector.select_in.assert_called_once_with(
+            "SELECT id, password FROM user WHERE id IN ({ids})",
+            ['user_id_0', 'user_id_1'])
+
+    def test_upload_user_passwords(self):
+        users = [{'user': {'name': 'user_name_0'},
+                  'meta': {'new_id': 'new_id_0', 'overwrite_password': True}},
+                 {'user': {'name': 'user_name_1'},
+                  'meta': {'new_id': 'new_id_1', 'overwrite_password': False}}]
+        mysql_connector = mock.Mock()
+        self.keystone_client.mysql_connector = mysql_connector
+
+        self.keystone_client._upload_user_passwords(
+            users, {'user_name_0': 'hash_0', 'user_name_1': 'hash_1'})
+
+        mysql_connector.execute_many.assert_called_once_with(
+            "UPDATE user SET password = :password WHERE id = :user_id",
+            [{'user_id': 'new_id_0', 'password': 'hash_0'}])
@@ -0,0 +1,121 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import hashlib
+import os
+import shutil
+import StringIO
+import tempfile
+
+from oslotest import mockpatch
+
+from migrationlib.os.utils import ChunkedTransfer
+from tests import test
+
+
+IMAGE_DATA = ''.join(chr(i % 251) for i in xrange(1000))
+
+
+class FakeResponse(StringIO.StringIO):
+    def __init__(self, data, status):
+        StringIO.StringIO.__init__(self, data)
+        self.status = status
+
+
+class FakeSource(object):
+    def __init__(self, data, fail_at=None, ignore_range=False):
+        self.data = data
+        self.fail_at = set(fail_at or [])
+        self.ignore_range = ignore_range
+        self.requests = []
+
+    def __call__(self, start, end):
+        self.requests.append((start, end))
+        if start in self.fail_at:
+            self.fail_at.remove(start)
+            return FakeResponse(self.data[start:start + 10], 206)
+        if self.ignore_range:
+            return FakeResponse(self.data, 200)
+        return FakeResponse(self.data[start:end + 1], 206)
+
+
+class ChunkedImageTransferTestCase(test.TestCase):
+    def setUp(self):
+        super(ChunkedImageTransferTestCase, self).setUp()
+        self.journal_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.journal_dir)
+        self.image = {'id': 'fake_image_id',
+                      'name': 'fake_image',
+                      'size': len(IMAGE_DATA),
+                      'checksum': hashlib.md5(IMAGE_DATA).hexdigest()}
+        self.useFixture(mockpatch.PatchObject(
+            ChunkedTransfer.time, 'sleep'))
+
+    def transfer(self, source, retries=ChunkedTransfer.RETRIES):
+        return ChunkedTransfer.ChunkedImageTransfer(
+            source, self.image, self.journal_dir, chunk_size=300,
+            retries=retries)
+
+    def read_all(self, transfer, size=128):
+        stream = transfer.get_ref_image(transfer.id)
+        return ''.join(iter(lambda: stream.read(size), ''))
+
+    def test_stream_by_chunks(self):
+        source = FakeSource(IMAGE_DATA)
+        transfer = self.transfer(source)
+        self.assertEqual(IMAGE_DATA, self.read_all(transfer))
+        self.assertEqual([(0, 299), (300, 599), (600, 899), (900, 999)],
+                         source.requests)
+        self.assertEqual([0, 300, 600, 900],
+                         [offset for offset, _ in transfer.journal.load()])
+        self.assertEqual(['fake_image_id.json'],
+                         os.listdir(self.journal_dir))
+
+    def test_retry_from_offset(self):
+        source = FakeSource(IMAGE_DATA, fail_at=[300])
+        self.assertEqual(IMAGE_DATA, self.read_all(self.transfer(source)))
+        self.assertEqual([(0, 299), (300, 599), (310, 599), (600, 899),
+                          (900, 999)], source.requests)
+
+    def test_restart_checks_journal(self):
+        source = FakeSource(IMAGE_DATA, fail_at=[600])
+        transfer = self.transfer(source, retries=0)
+        self.assertRaises(IOError, self.read_all, transfer)
+        self.assertEqual(2, len(transfer.journal.chunks))
+        source.data = IMAGE_DATA[:400] + 'x' + IMAGE_DATA[401:]
+        self.image['checksum'] = hashlib.md5(source.data).hexdigest()
+        transfer = self.transfer(source)
+        self.assertEqual(source.data, self.read_all(transfer))
+        self.assertEqual(4, len(transfer.journal.chunks))
+
+    def test_range_ignored(self):
+        source = FakeSource(IMAGE_DATA, ignore_range=True)
+        self.assertEqual(IMAGE_DATA, self.read_all(self.transfer(source)))
+
+    def test_checksum_mismatch(self):
+        self.image['checksum'] = 'fake_checksum'
+        transfer = self.transfer(FakeSource(IMAGE_DATA))
+        self.assertRaises(ChunkedTransfer.ChecksumMismatch,
+                          self.read_all, transfer)
+        self.assertEqual(0, len(transfer.journal.load()))
+
+    def test_proxy_and_cleanup(self):
+        transfer = self.transfer(FakeSource(IMAGE_DATA))
+        proxy = transfer.proxy(lambda *args: None)
+        data = ''.join(iter(lambda: proxy.read(256), ''))
+        proxy.close()
+        self.assertEqual(IMAGE_DATA, data)
+        transfer.cleanup()
+        self.assertEqual([], os.listdir(self.journal_dir))
@@ -0,0 +1,84 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import StringIO
+
+import mock
+from oslotest import mockpatch
+
+from cloudferrylib.utils import bandwidth
+from migrationlib.os.utils import FileLikeProxy
+from tests import test
+
+
+DATA = ''.join(chr(i % 251) for i in xrange(10000))
+
+
+class FakeSource(object):
+    def __init__(self, data):
+        self.data = data
+
+    def get_ref_image(self, image_id):
+        resp = StringIO.StringIO(self.data)
+        resp.length = len(self.data)
+        return resp
+
+
+class FileLikeProxyTestCase(test.TestCase):
+    def setUp(self):
+        super(FileLikeProxyTestCase, self).setUp()
+        self.transfer_object = {'resource_src': FakeSource(DATA),
+                                'id': 'fake_id',
+                                'name': 'fake_name',
+                                'size': len(DATA)}
+        self.useFixture(mockpatch.PatchObject(bandwidth, 'manager',
+                                              new=None))
+
+    def read_all(self, proxy, size):
+        return ''.join(iter(lambda: proxy.read(size), ''))
+
+    def test_packets_read_from_response(self):
+        self.useFixture(mockpatch.PatchObject(FileLikeProxy, 'CHUNK_SIZE',
+                                              new=4096))
+        proxy = FileLikeProxy.FileLikeProxy(self.transfer_object,
+                                            mock.Mock(), bucket=mock.Mock())
+        proxy.resp = mock.Mock(wraps=proxy.resp)
+        self.assertEqual(DATA[:4096], proxy.read(10000))
+        self.assertEqual(DATA[4096:4196], proxy.read(100))
+        self.assertEqual([((4096,),), ((100,),)],
+                         proxy.resp.read.call_args_list)
+
+    def test_speed_limited_read(self):
+        bucket = mock.Mock()
+        proxy = FileLikeProxy.FileLikeProxy(self.transfer_object,
+                                            mock.Mock(), bucket=bucket)
+        self.assertEqual(DATA, self.read_all(proxy, 3000))
+        self.assertEqual(len(DATA),
+                         sum(c[0][0] for c in bucket.consume.call_args_list))
+
+    def test_bandwidth_stream(self):
+        bandwidth.init_bandwidth('1mb')
+        proxy = FileLikeProxy.FileLikeProxy(self.transfer_object,
+                                            mock.Mock(), '-')
+        self.assertEqual([proxy.stream], proxy.buckets)
+        self.assertEqual(1, len(bandwidth.manager.streams))
+        self.assertEqual(DATA, self.read_all(proxy, 3000))
+        self.assertEqual([], bandwidth.manager.streams)
+
+    def test_no_limit(self):
+        proxy = FileLikeProxy.FileLikeProxy(self.transfer_object,
+                                            mock.Mock(), '-')
+        self.assertEqual([], proxy.buckets)
+        self.assertEqual(DATA, self.read_all(proxy, 3000))
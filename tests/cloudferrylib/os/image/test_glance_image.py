@@ -15,6 +15,7 @@
 
 import mock
 
+from glanceclient import exc as glance_exc
 from glanceclient.v1 import client as glance_client
 from oslotest import mockpatch
 
@@ -96,8 +97,7 @@ class GlanceImageTestCase(test.TestCase):
                           self.glance_image.get_image('fake_image_id_1'))
 
     def test_get_image_status(self):
-        fake_images = [self.fake_image_1, self.fake_image_2]
-        self.glance_mock_client().images.list.return_value = fake_images
+        self.glance_mock_client().images.get.return_value = self.fake_image_1
 
         self.assertEquals(self.fake_image_1.status,
                           self.glance_image.get_image_status(
@@ -110,10 +110,45 @@ class GlanceImageTestCase(test.TestCase):
         self.assertEquals('fake_resp_1',
                           self.glance_image.get_ref_image('fake_image_id_1'))
 
+    def test_get_ref_image_range(self):
+        body = mock.Mock(_resp='fake_range_resp')
+        raw_request = self.glance_mock_client().images.api.raw_request
+        raw_request.return_value = (mock.Mock(), body)
+
+        self.assertEqual('fake_range_resp',
+                         self.glance_image.get_ref_image_range(
+                             'fake_image_id_1', 10, 19))
+        raw_request.assert_called_once_with(
+            'GET', '/v1/images/fake_image_id_1',
+            headers={'Range': 'bytes=10-19'})
+
     def test_get_image_checksum(self):
-        fake_images = [self.fake_image_1, self.fake_image_2]
-        self.glance_mock_client().images.list.return_value = fake_images
+        self.glance_mock_client().images.get.return_value = self.fake_image_1
 
         self.assertEquals(self.fake_image_1.checksum,
                           self.glance_image.get_image_checksum(
                               'fake_image_id_1'))
+
+    def test_get_image_by_id(self):
+        self.glance_mock_client().images.get.side_effect = [
+            self.fake_image_1, glance_exc.HTTPNotFound()]
+
+        self.assertEquals(self.fake_image_1,
+                          self.glance_image.get_image_by_id('fake_image_id_1'))
+        self.assertIsNone(self.glance_image.get_image_by_id('fake_image_id_3'))
+        self.assertFalse(self.glance_mock_client().images.list.called)
+
+    def test_catalog_is_listed_once(self):
+        fake_images = [self.fake_image_1, self.fake_image_2]
+        self.glance_mock_client().images.list.return_value = fake_images
+        new_image = mock.Mock(id='fake_image_id_3', checksum='fake_checksum_3')
+        self.glance_mock_client().images.create.return_value = new_image
+
+        self.glance_image.get_image_list()
+        self.glance_image.create_image(name='fake_image_name')
+        self.glance_image.delete_image('fake_image_id_1')
+
+        self.assertEquals(new_image, self.glance_image.get_image_by_checksum(
+            'fake_checksum_3'))
+        self.assertIsNone(self.glance_image.get_image('fake_image_id_1'))
+        self.assertEquals(1, self.glance_mock_client().images.list.call_count)
@@ -0,0 +1,178 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from oslotest import mockpatch
+
+from migrationlib.os.utils import ImageStore
+from tests import test
+
+
+class ImageStoreTestCase(test.TestCase):
+    def setUp(self):
+        super(ImageStoreTestCase, self).setUp()
+        self.store_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.store_dir)
+        self.path = os.path.join(self.store_dir, ImageStore.STORE_FILE)
+        self.store = ImageStore.ImageStore(self.path, poll_interval=0.01)
+        self.produced = []
+
+    def produce(self, value):
+        def _produce():
+            self.produced.append(value)
+            return value
+        return _produce
+
+    def test_fetch_produces_once(self):
+        self.assertEqual('id1', self.store.fetch(ImageStore.DEST_IMAGE, 'md5',
+                                                 self.produce('id1')))
+        self.assertEqual('id1', self.store.fetch(ImageStore.DEST_IMAGE, 'md5',
+                                                 self.produce('id2')))
+        self.assertEqual(['id1'], self.produced)
+
+    def test_kinds_are_separate(self):
+        self.store.fetch(ImageStore.DEST_IMAGE, 'md5', self.produce('id1'))
+        self.assertEqual('/tmp/base/md5',
+                         self.store.fetch(ImageStore.BASE_IMAGE, 'md5',
+                                          self.produce('/tmp/base/md5')))
+
+    def test_index_persists_across_stores(self):
+        self.store.fetch(ImageStore.DEST_IMAGE, 'md5', self.produce('id1'))
+        store = ImageStore.ImageStore(self.path)
+        self.assertEqual('id1', store.fetch(ImageStore.DEST_IMAGE, 'md5',
+                                            self.produce('id2')))
+        self.assertEqual(['id1'], self.produced)
+
+    def test_stale_entry_is_produced_again(self):
+        self.store.fetch(ImageStore.DEST_IMAGE, 'md5', self.produce('id1'))
+        self.assertEqual('id2',
+                         self.store.fetch(ImageStore.DEST_IMAGE, 'md5',
+                                          self.produce('id2'),
+                                          lambda value: value != 'id1'))
+
+    def test_failed_produce_releases_claim(self):
+        def fail():
+            raise RuntimeError()
+        self.assertRaises(RuntimeError, self.store.fetch,
+                          ImageStore.DEST_IMAGE, 'md5', fail)
+        self.assertEqual('id1', self.store.fetch(ImageStore.DEST_IMAGE, 'md5',
+                                                 self.produce('id1')))
+
+    def test_forget(self):
+        self.store.fetch(ImageStore.DEST_IMAGE, 'md5', self.produce('id1'))
+        self.store.forget(ImageStore.DEST_IMAGE, 'md5')
+        self.store.fetch(ImageStore.DEST_IMAGE, 'md5', self.produce('id2'))
+        self.assertEqual(['id1', 'id2'], self.produced)
+
+    def test_threads_wait_for_transfer_in_flight(self):
+        started = threading.Event()
+        release = threading.Event()
+        results = []
+
+        def slow():
+            started.set()
+            release.wait()
+            return self.produce('id1')()
+
+        def fetch(produce):
+            results.append(self.store.fetch(ImageStore.DEST_IMAGE, 'md5',
+                                            produce))
+
+        owner = threading.Thread(target=fetch, args=(slow,))
+        owner.start()
+        started.wait()
+        waiters = [threading.Thread(target=fetch, args=(self.produce('id2'),))
+                   for _ in xrange(3)]
+        for waiter in waiters:
+            waiter.start()
+        release.set()
+        for thread in [owner] + waiters:
+            thread.join()
+        self.assertEqual(['id1'] * 4, results)
+        self.assertEqual(['id1'], self.produced)
+
+    def test_claim_of_dead_process_is_taken_over(self):
+        with open(self.path, 'w') as f:
+            json.dump({'entries': {},
+                       'in_flight': {'image:md5': {'pid': 2 ** 22 + 1,
+                                                   'since': time.time(),
+                                                   'expires': time.time() + 60}}}, f)
+        self.assertEqual('id1', self.store.fetch(ImageStore.DEST_IMAGE, 'md5',
+                                                 self.produce('id1')))
+
+    def test_corrupted_index_is_ignored(self):
+        with open(self.path, 'w') as f:
+            f.write('{')
+        self.assertEqual('id1', self.store.fetch(ImageStore.DEST_IMAGE, 'md5',
+                                                 self.produce('id1')))
+
+    def write_claim(self, claim):
+        with open(self.path, 'w') as f:
+            json.dump({'entries': {}, 'in_flight': {'image:md5': claim}}, f)
+
+    def test_expired_lease_is_taken_over(self):
+        self.write_claim({'pid': os.getppid(), 'since': 0, 'expires': time.time() - 1})
+        self.assertEqual('id1', self.store.fetch(ImageStore.DEST_IMAGE, 'md5',
+                                                 self.produce('id1')))
+
+    def test_live_lease_is_waited_for(self):
+        self.write_claim({'pid': os.getppid(), 'since': 0, 'expires': time.time() + 60})
+        polls = []
+
+        def sleep(interval):
+            polls.append(interval)
+            with open(self.path, 'w') as f:
+                json.dump({'entries': {'image:md5': 'id1'}, 'in_flight': {}}, f)
+        self.useFixture(mockpatch.PatchObject(ImageStore.time, 'sleep',
+                                              new=sleep))
+        self.assertEqual('id1', self.store.fetch(ImageStore.DEST_IMAGE, 'md5',
+                                                 self.produce('id2')))
+        self.assertEqual(1, len(polls))
+        self.assertEqual([], self.produced)
+
+    def test_lease_is_renewed_while_producing(self):
+        store = ImageStore.ImageStore(self.path, lease_time=0.03)
+        leases = []
+
+        def slow():
+            for _ in xrange(5):
+                time.sleep(0.02)
+                with open(self.path) as f:
+                    leases.append(json.load(f)['in_flight']['image:md5'])
+            return 'id1'
+        self.assertEqual('id1', store.fetch(ImageStore.DEST_IMAGE, 'md5', slow))
+        self.assertTrue(leases[-1]['expires'] > leases[0]['expires'])
+        with open(self.path) as f:
+            self.assertEqual({}, json.load(f)['in_flight'])
+
+    def test_old_claim_is_not_renewed(self):
+        store = ImageStore.ImageStore(self.path, lease_time=0.03, max_claim_age=0.04)
+        leases = []
+
+        def hung():
+            for _ in xrange(8):
+                time.sleep(0.02)
+                with open(self.path) as f:
+                    leases.append(json.load(f)['in_flight']['image:md5'])
+            return 'id1'
+        self.assertEqual('id1', store.fetch(ImageStore.DEST_IMAGE, 'md5', hung))
+        self.assertTrue(leases[-1]['expires'] < time.time())
+        self.assertTrue(leases[-1]['expires'] - leases[-1]['since'] < 0.04 + 0.03 * 2)
@@ -147,8 +147,9 @@ class NeutronTestCase(test.TestCase):
 
         self.neutron_mock_client().list_networks.return_value = \
             fake_networks_list
-        self.neutron_mock_client().show_subnet.return_value = \
-            {'subnet': {'name': 'fake_subnet_name_1'}}
+        self.neutron_mock_client().list_subnets.return_value = \
+            {'subnets': [{'id': 'fake_subnet_id_1',
+                          'name': 'fake_subnet_name_1'}]}
         self.neutron_network_client.get_resource_hash = \
             mock.Mock(return_value='fake_net_hash_1')
 
@@ -174,8 +175,9 @@ class NeutronTestCase(test.TestCase):
 
         self.neutron_mock_client().list_subnets.return_value = \
             fake_subnets_list
-        self.neutron_mock_client().show_network.return_value = \
-            {'network': {'name': 'fake_network_name_1'}}
+        self.neutron_mock_client().list_networks.return_value = \
+            {'networks': [{'id': 'fake_network_id_1',
+                           'name': 'fake_network_name_1'}]}
         self.neutron_network_client.get_resource_hash = \
             mock.Mock(return_value='fake_subnet_hash_1')
 
@@ -198,9 +200,10 @@ class NeutronTestCase(test.TestCase):
 
         self.neutron_mock_client().list_routers.return_value = \
             fake_routers_list
-        self.neutron_mock_client().show_network.return_value = \
-            {'network': {'name': 'fake_network_name_1',
-                         'tenant_id': 'fake_tenant_id_1'}}
+        self.neutron_mock_client().list_networks.return_value = \
+            {'networks': [{'id': 'fake_network_id_1',
+                           'name': 'fake_network_name_1',
+                           'tenant_id': 'fake_tenant_id_1'}]}
 
         fake_ports_list = {
             'ports': [{'fixed_ips': [{'subnet_id': 'fake_subnet_id_1',
@@ -243,9 +246,10 @@ class NeutronTestCase(test.TestCase):
 
         self.neutron_mock_client().list_floatingips.return_value = \
             fake_floatingips_list
-        self.neutron_mock_client().show_network.return_value = \
-            {'network': {'name': 'fake_network_name_1',
-                         'tenant_id': 'fake_tenant_id_1'}}
+        self.neutron_mock_client().list_networks.return_value = \
+            {'networks': [{'id': 'fake_network_id_1',
+                           'name': 'fake_network_name_1',
+                           'tenant_id': 'fake_tenant_id_1'}]}
 
         floatingips_info = [{'id': 'fake_floating_ip_id_1',
                              'floating_network_id': 'fake_network_id_1',
@@ -259,6 +263,34 @@ class NeutronTestCase(test.TestCase):
         floatings_info_result = self.neutron_network_client.get_floatingips()
         self.assertEquals(floatingips_info, floatings_info_result)
 
+    def test_read_info_lists_every_collection_once(self):
+        client = self.neutron_mock_client()
+        client.list_networks.return_value = {'networks': []}
+        client.list_subnets.return_value = {'subnets': []}
+        client.list_routers.return_value = {
+            'routers': [{'name': 'fake_router_name_1',
+                         'id': 'fake_router_id_1',
+                         'admin_state_up': True,
+                         'routes': [],
+                         'external_gateway_info': None,
+                         'tenant_id': 'fake_tenant_id_1'}]}
+        client.list_ports.return_value = {'ports': []}
+        client.list_floatingips.return_value = {'floatingips': []}
+        client.list_security_groups.return_value = {'security_groups': []}
+        self.neutron_network_client.get_resource_hash = \
+            mock.Mock(return_value='fake_router_hash')
+
+        self.neutron_network_client.read_info()
+
+        for listing in (client.list_networks, client.list_subnets,
+                        client.list_routers, client.list_ports,
+                        client.list_floatingips,
+                        client.list_security_groups):
+            self.assertEqual(1, listing.call_count)
+        self.assertFalse(client.show_network.called)
+        self.assertFalse(client.show_subnet.called)
+        self.assertIsNone(self.neutron_network_client.listings)
+
     def test_get_security_groups(self):
 
         fake_secgroups_list = {
@@ -435,6 +467,17 @@ class NeutronTestCase(test.TestCase):
         self.neutron_mock_client().create_network.\
             assert_called_once_with(network_info)
 
+    def test_upload_networks_matches_created_networks(self):
+
+        self.neutron_network_client.get_networks = \
+            mock.Mock(return_value=[])
+
+        self.neutron_network_client.upload_networks([self.net_1_info,
+                                                     self.net_1_info])
+
+        self.assertEqual(1,
+                         self.neutron_mock_client().create_network.call_count)
+
     def test_upload_subnets(self):
 
         src_net_info = copy.deepcopy(self.net_1_info)
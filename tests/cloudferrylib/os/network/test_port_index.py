@@ -0,0 +1,78 @@
+# Copyright 2014: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from cloudferrylib.os.network import port_index
+from tests import test
+
+
+def fake_port(port_id, device_id, device_owner, network_id, mac, *ips):
+    return {'id': port_id,
+            'device_id': device_id,
+            'device_owner': device_owner,
+            'network_id': network_id,
+            'mac_address': mac,
+            'fixed_ips': [{'subnet_id': 'fake_subnet_id',
+                           'ip_address': ip} for ip in ips]}
+
+
+class PortIndexTestCase(test.TestCase):
+    def setUp(self):
+        super(PortIndexTestCase, self).setUp()
+        self.ports = [
+            fake_port('port_0', 'router_1', 'network:router_interface',
+                      'net_1', 'mac_0', '10.0.0.1'),
+            fake_port('port_1', 'router_1', 'network:router_gateway',
+                      'net_ext', 'mac_1', '172.16.0.2'),
+            fake_port('port_2', 'vm_1', 'compute:nova',
+                      'net_1', 'mac_2', '10.0.0.3', '10.0.0.4')]
+        self.loader = mock.Mock(side_effect=lambda: list(self.ports))
+        self.index = port_index.PortIndex(self.loader)
+
+    def test_by_device(self):
+        self.assertEqual(self.ports[:2], self.index.by_device('router_1'))
+        self.assertEqual([self.ports[0]],
+                         self.index.by_device('router_1',
+                                              'network:router_interface'))
+        self.assertEqual([], self.index.by_device('router_2'))
+        self.assertEqual(1, self.loader.call_count)
+
+    def test_by_ip(self):
+        self.assertEqual(self.ports[2], self.index.by_ip('10.0.0.4'))
+        self.assertIsNone(self.index.by_ip('10.0.0.5'))
+
+    def test_by_mac(self):
+        self.assertEqual([self.ports[2]], self.index.by_mac('net_1', 'mac_2'))
+        self.assertEqual([], self.index.by_mac('net_ext', 'mac_2'))
+
+    def test_ports_without_optional_fields(self):
+        self.ports = [{'id': 'port_0', 'network_id': 'net_1',
+                       'mac_address': 'mac_0'}]
+        self.assertEqual(self.ports, self.index.by_mac('net_1', 'mac_0'))
+        self.assertIsNone(self.index.by_ip('10.0.0.1'))
+
+    def test_add_and_remove(self):
+        self.index.list()
+        new = fake_port('port_3', 'vm_2', 'compute:nova',
+                        'net_1', 'mac_3', '10.0.0.5')
+        self.assertEqual(new, self.index.add(new))
+        self.assertEqual(new, self.index.by_ip('10.0.0.5'))
+        self.index.remove(self.ports[2])
+        self.assertIsNone(self.index.by_ip('10.0.0.3'))
+        self.assertEqual([], self.index.by_device('vm_1'))
+        self.assertEqual([], self.index.by_mac('net_1', 'mac_2'))
+        self.assertEqual(self.ports[:2] + [new], self.index.list())
+        self.assertEqual(1, self.loader.call_count)
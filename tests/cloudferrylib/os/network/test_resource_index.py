@@ -0,0 +1,57 @@
+# Copyright 2014: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from cloudferrylib.os.network import resource_index
+from tests import test
+
+
+class ResourceIndexTestCase(test.TestCase):
+    def setUp(self):
+        super(ResourceIndexTestCase, self).setUp()
+        self.resources = [{'id': 'fake_id_1', 'res_hash': 'fake_hash_1'},
+                          {'id': 'fake_id_2', 'res_hash': 'fake_hash_2'},
+                          {'id': 'fake_id_3', 'res_hash': 'fake_hash_1'}]
+        self.index = resource_index.ResourceIndex(self.resources)
+
+    def test_first_resource_wins(self):
+        self.assertEqual(self.resources[0],
+                         self.index.get_by_hash('fake_hash_1'))
+        self.assertEqual('fake_hash_1',
+                         self.index.get_hash_by_id('fake_id_3'))
+
+    def test_missing(self):
+        self.assertIsNone(self.index.get_by_hash('fake_hash_3'))
+        self.assertIsNone(self.index.get_by_id('fake_id_4'))
+        self.assertIsNone(self.index.get_hash_by_id('fake_id_4'))
+        self.assertFalse(self.index.has_hash('fake_hash_3'))
+
+    def test_add(self):
+        new = {'id': 'fake_id_4', 'res_hash': 'fake_hash_3'}
+        self.assertEqual(new, self.index.add(new))
+        self.assertTrue(self.index.has_hash('fake_hash_3'))
+        self.assertEqual(new, self.index.get_by_id('fake_id_4'))
+        self.assertEqual(self.resources + [new], list(self.index))
+        self.assertEqual(4, len(self.index))
+
+    def test_resources_without_id(self):
+        index = resource_index.ResourceIndex([{'res_hash': 'fake_hash_1'}])
+        self.assertTrue(index.has_hash('fake_hash_1'))
+
+    def test_as_resource_index(self):
+        self.assertIs(self.index,
+                      resource_index.as_resource_index(self.index))
+        self.assertEqual(self.resources[1],
+                         resource_index.as_resource_index(
+                             self.resources).get_by_id('fake_id_2'))
@@ -0,0 +1,55 @@
+# Copyright 2014: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from cloudferrylib.os.storage import cinder_db
+from tests import test
+
+
+class CinderDBWriterTestCase(test.TestCase):
+    def test_flush(self):
+        connector = mock.MagicMock()
+        writer = cinder_db.CinderDBWriter(connector)
+        writer.patch_bootable('id_0', 'true')
+        writer.patch_bootable('id_1', False)
+        writer.patch_bootable('id_2', True)
+        writer.flush()
+
+        connection = connector.transaction().__enter__()
+        calls = connector.execute_in.call_args_list
+        self.assertEqual(
+            [mock.call("UPDATE volumes SET bootable = :bootable "
+                       "WHERE id IN ({ids})", ['id_1'],
+                       connection=connection, bootable=0),
+             mock.call("UPDATE volumes SET bootable = :bootable "
+                       "WHERE id IN ({ids})", ['id_0', 'id_2'],
+                       connection=connection, bootable=1)], calls)
+        self.assertEqual({}, writer.bootable)
+
+    def test_flush_nothing(self):
+        connector = mock.Mock()
+        cinder_db.CinderDBWriter(connector).flush()
+        self.assertFalse(connector.transaction.called)
+
+    def test_pop_script(self):
+        writer = cinder_db.CinderDBWriter(None)
+        writer.patch_bootable('id_1', True)
+        writer.patch_bootable('id_0', 'True')
+        self.assertEqual('START TRANSACTION;'
+                         'UPDATE volumes SET bootable=1 '
+                         'WHERE id IN ("id_0","id_1");COMMIT;',
+                         writer.pop_script())
+        self.assertIsNone(writer.pop_script())
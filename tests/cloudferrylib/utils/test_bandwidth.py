@@ -0,0 +1,144 @@
+# Copyright 2014: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import multiprocessing
+
+import mock
+from oslotest import mockpatch
+
+from cloudferrylib.utils import bandwidth
+from tests import test
+
+
+class TokenBucketTestCase(test.TestCase):
+    def setUp(self):
+        super(TokenBucketTestCase, self).setUp()
+        self.now = [100.0]
+        self.useFixture(mockpatch.PatchObject(
+            bandwidth.time, 'time', new=lambda: self.now[0]))
+        self.sleep = mock.Mock()
+        self.useFixture(mockpatch.PatchObject(
+            bandwidth.time, 'sleep', new=self.sleep))
+
+    def test_burst_then_rate(self):
+        bucket = bandwidth.TokenBucket(100, 100)
+        self.assertEqual(0, bucket.consume(100))
+        self.assertEqual(0.5, bucket.consume(50))
+        self.now[0] += 1.5
+        self.assertEqual(0, bucket.consume(100))
+        self.sleep.assert_called_once_with(0.5)
+
+    def test_shared_bucket(self):
+        bucket = bandwidth.TokenBucket(100, 100)
+        bucket.consume(100)
+        self.assertEqual(1, bucket.consume(100))
+        self.assertEqual(2, bucket.consume(100))
+
+    def test_set_rate(self):
+        bucket = bandwidth.TokenBucket(100)
+        bucket.consume(100)
+        bucket.set_rate(200)
+        self.assertEqual(200, bucket.burst)
+        self.assertEqual(0.5, bucket.consume(100))
+
+    def test_parse_speed_limit(self):
+        self.assertEqual(10 * 1024 * 1024,
+                         bandwidth.parse_speed_limit('10MB'))
+        self.assertEqual(0, bandwidth.parse_speed_limit('-'))
+
+
+class BandwidthManagerTestCase(test.TestCase):
+    def setUp(self):
+        super(BandwidthManagerTestCase, self).setUp()
+        self.manager = bandwidth.BandwidthManager(1000000)
+
+    def rates(self):
+        return [s.rate for s in self.manager.streams]
+
+    def test_fair_share(self):
+        self.manager.open_stream('a')
+        self.assertEqual([1000000], self.rates())
+        b = self.manager.open_stream('b', weight=3)
+        self.assertEqual([250000, 750000], self.rates())
+        b.close()
+        self.assertEqual([1000000], self.rates())
+
+    def test_reserve(self):
+        self.manager.open_stream('a')
+        pipe = self.manager.reserve('pipe', 0.25)
+        self.assertEqual(250000, pipe.rate)
+        self.assertEqual([750000, 250000], self.rates())
+        self.manager.reserve('pipe', 0.9)
+        self.assertEqual([bandwidth.MIN_RATE, 250000, 750000], self.rates())
+
+    def test_reserve_waits_for_free_budget(self):
+        pipe = self.manager.reserve('pipe', 1)
+        self.assertEqual(0, self.manager.free())
+        sleep = mock.Mock(side_effect=lambda interval: pipe.close())
+        self.useFixture(mockpatch.PatchObject(bandwidth.time, 'sleep',
+                                              new=sleep))
+        other = self.manager.reserve('other', 0.5)
+        self.assertEqual(1, sleep.call_count)
+        self.assertEqual(500000, other.rate)
+        self.assertEqual(500000, self.manager.free())
+
+    def test_budget_shared_with_forked_process(self):
+        def child():
+            self.manager.reserve('pipe', 0.25)
+        process = multiprocessing.Process(target=child)
+        process.start()
+        process.join()
+        self.assertEqual(750000, self.manager.free())
+        self.manager.open_stream('a')
+        self.assertEqual([750000], self.rates())
+
+    def test_live_streams_share_budget(self):
+        sleep = mock.Mock()
+        self.useFixture(mockpatch.PatchObject(bandwidth.time, 'sleep',
+                                              new=sleep))
+        stream = self.manager.open_stream('a')
+        stream.bucket.consume = mock.Mock(return_value=0)
+        stream.consume(bandwidth.MIN_RATE)
+        self.assertFalse(sleep.called)
+        self.manager.budget.consume(1000000)
+        self.assertTrue(stream.consume(1000) > 0)
+
+    def test_surplus_of_slow_stream(self):
+        slow = self.manager.open_stream('slow')
+        self.manager.open_stream('fast')
+        for s in self.manager.streams:
+            s.throughput = s.rate
+        slow.throughput = 100000
+        self.manager.rebalance()
+        self.assertEqual([120000, 880000], self.rates())
+
+    def test_measure_and_report(self):
+        self.manager.interval = 0
+        stream = self.manager.open_stream('a')
+        stream.consume(1000)
+        self.assertEqual(1000, stream.bytes)
+        self.assertIsNotNone(stream.throughput)
+        self.assertIn('a ', self.manager.report())
+
+    def test_throttle_stage(self):
+        self.assertEqual("pv -q -L 100 | ", bandwidth.throttle_stage(100))
+        self.assertEqual("", bandwidth.throttle_stage(None))
+
+    def test_init_bandwidth(self):
+        self.useFixture(mockpatch.PatchObject(bandwidth, 'manager'))
+        bandwidth.init_bandwidth('10MB')
+        self.assertEqual(10 * 1024 * 1024, bandwidth.get_manager().rate)
+        bandwidth.init_bandwidth('-')
+        self.assertIsNone(bandwidth.get_manager())
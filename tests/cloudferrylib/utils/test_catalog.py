@@ -0,0 +1,63 @@
+# Copyright 2014: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslotest import mockpatch
+
+from cloudferrylib.utils import catalog
+from tests import test
+
+
+class CatalogTestCase(test.TestCase):
+    def setUp(self):
+        super(CatalogTestCase, self).setUp()
+        self.now = [100.0]
+        self.useFixture(mockpatch.PatchObject(
+            catalog.time, 'time', new=lambda: self.now[0]))
+        self.items = [mock.Mock(id='id_0'), mock.Mock(id='id_1')]
+        for item in self.items:
+            item.name = 'same'
+        self.loader = mock.Mock(side_effect=lambda: list(self.items))
+        self.catalog = catalog.Catalog(self.loader, ttl=10)
+
+    def test_get(self):
+        self.assertEqual(self.items[1], self.catalog.get('id', 'id_1'))
+        self.assertEqual(self.items[0], self.catalog.get('name', 'same'))
+        self.assertEqual(self.items, self.catalog.get_all('name', 'same'))
+        self.assertIsNone(self.catalog.get('id', 'id_2'))
+        self.assertEqual(1, self.loader.call_count)
+
+    def test_ttl(self):
+        self.catalog.list()
+        self.now[0] += 11
+        self.catalog.list()
+        self.assertEqual(2, self.loader.call_count)
+
+    def test_add_and_invalidate(self):
+        self.catalog.list()
+        new = mock.Mock(id='id_2')
+        self.assertEqual(new, self.catalog.add(new))
+        self.assertEqual(new, self.catalog.get('id', 'id_2'))
+        self.catalog.invalidate()
+        self.assertIsNone(self.catalog.get('id', 'id_2'))
+        self.assertEqual(2, self.loader.call_count)
+
+    def test_remove(self):
+        self.catalog.list()
+        self.assertEqual([self.items[0]], self.catalog.remove('id', 'id_0'))
+        self.assertEqual([self.items[1]], self.catalog.list())
+        self.assertEqual([self.items[1]], self.catalog.get_all('name', 'same'))
+        self.assertEqual([], self.catalog.remove('id', 'id_0'))
+        self.assertEqual(1, self.loader.call_count)
@@ -0,0 +1,66 @@
+# Copyright 2014: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import os
+import subprocess
+import sys
+
+from cloudferrylib.utils import fingerprint
+from tests import test
+
+
+NETWORK = {'name': 'Net1',
+           'shared': False,
+           'tenant_name': u'admin',
+           'router:external': False,
+           'ips': ['10.0.0.2', '10.0.0.1'],
+           'allocation_pools': [{'start': '10.0.0.2', 'end': '10.0.0.254'}],
+           'id': 'fake_network_id'}
+
+
+class FingerprintTestCase(test.TestCase):
+    def test_field_selection(self):
+        other = dict(NETWORK, id='other_network_id')
+        self.assertEqual(
+            fingerprint.fingerprint(NETWORK, 'name', 'shared', 'tenant_name'),
+            fingerprint.fingerprint(other, 'name', 'shared', 'tenant_name'))
+        self.assertNotEqual(fingerprint.fingerprint(NETWORK),
+                            fingerprint.fingerprint(other))
+
+    def test_case_and_order_insensitive(self):
+        other = dict(NETWORK, name=u'NET1', ips=['10.0.0.1', '10.0.0.2'])
+        self.assertEqual(fingerprint.fingerprint(NETWORK, 'name', 'ips'),
+                         fingerprint.fingerprint(other, 'name', 'ips'))
+        self.assertNotEqual(
+            fingerprint.fingerprint(NETWORK, 'name', ignore_case=False),
+            fingerprint.fingerprint(other, 'name', ignore_case=False))
+
+    def test_values_are_bound_to_fields(self):
+        first = {'name': 'a', 'description': 'b'}
+        second = {'name': 'b', 'description': 'a'}
+        self.assertNotEqual(
+            fingerprint.fingerprint(first, 'name', 'description'),
+            fingerprint.fingerprint(second, 'name', 'description'))
+
+    def test_stable_across_processes(self):
+        code = ("from cloudferrylib.utils import fingerprint;"
+                "from tests.cloudferrylib.utils import test_fingerprint;"
+                "print fingerprint.fingerprint(test_fingerprint.NETWORK)")
+        root = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.dirname(os.path.abspath(__file__)))))
+        env = dict(os.environ, PYTHONHASHSEED='random')
+        out = subprocess.check_output([sys.executable, '-c', code],
+                                      cwd=root, env=env)
+        self.assertEqual(fingerprint.fingerprint(NETWORK), out.strip())
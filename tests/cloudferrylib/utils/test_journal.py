@@ -0,0 +1,107 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import os
+import shutil
+import tempfile
+import time
+
+import mock
+
+from cloudferrylib.utils import journal
+from tests import test
+
+
+class JournalTestCase(test.TestCase):
+    def setUp(self):
+        super(JournalTestCase, self).setUp()
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        self.path = os.path.join(path, 'tasks.trans')
+
+    def read(self, replay=True):
+        return list(journal.read_journal(self.path, replay))
+
+    @mock.patch('os.fsync')
+    def test_group_commit(self, fsync):
+        writer = journal.JournalWriter(self.path, interval=60, batch_size=3)
+        writer.write({'event': 1})
+        writer.write({'event': 2})
+        self.assertEqual([], self.read())
+        writer.write({'event': 3})
+        self.assertEqual([1, 2, 3], [r['event'] for r in self.read()])
+        self.assertEqual(1, fsync.call_count)
+        writer.write({'event': 4})
+        writer.close()
+        self.assertEqual(4, len(self.read()))
+        self.assertEqual(2, fsync.call_count)
+
+    def test_sync_write(self):
+        writer = journal.JournalWriter(self.path, interval=60)
+        writer.write({'event': 1})
+        writer.write({'event': 2}, sync=True)
+        self.assertEqual(2, len(self.read()))
+        writer.close()
+
+    def test_commit_after_interval(self):
+        writer = journal.JournalWriter(self.path, interval=0.01)
+        writer.write({'event': 1})
+        for _ in xrange(100):
+            if self.read():
+                break
+            time.sleep(0.01)
+        self.assertEqual(1, len(self.read()))
+        writer.close()
+
+    def test_replay_changes(self):
+        delta = journal.KeyDelta()
+        writer = journal.JournalWriter(self.path)
+        for namespace in ({'a': 1, 'b': [1]}, {'a': 1, 'b': [1, 2]}, {'b': [1, 2]}):
+            changes, deleted = delta(namespace)
+            writer.write({journal.CHANGES: changes, journal.DELETED: deleted})
+        writer.close()
+
+        raw = self.read(replay=False)
+        self.assertEqual([{'a': 1, 'b': [1]}, {'b': [1, 2]}, {}],
+                         [r[journal.CHANGES] for r in raw])
+        self.assertEqual(['a'], raw[2][journal.DELETED])
+        self.assertEqual([{'a': 1, 'b': [1]}, {'a': 1, 'b': [1, 2]}, {'b': [1, 2]}],
+                         [r[journal.NAMESPACE] for r in self.read()])
+
+    def test_immutable_values_converted_once(self):
+        convert = mock.Mock(side_effect=lambda value: repr(value))
+        delta = journal.KeyDelta(convert)
+        name, items = 'vm', [1]
+        delta({'name': name, 'items': items})
+        items.append(2)
+        changes, _ = delta({'name': name, 'items': items})
+        self.assertEqual({'items': '[1, 2]'}, changes)
+        self.assertEqual(3, convert.call_count)
+
+    def test_object_changed_in_place(self):
+        delta = journal.KeyDelta(lambda value: {'status': value.status})
+        obj = mock.Mock(status='building')
+        delta({'obj': obj})
+        obj.status = 'active'
+        changes, _ = delta({'obj': obj})
+        self.assertEqual({'obj': {'status': 'active'}}, changes)
+
+    def test_torn_line_and_full_records(self):
+        with open(self.path, 'w') as f:
+            f.write('{"namespace": {"a": 1}}\n'
+                    '{"changes": {"b": 2}, "deleted": []}\n'
+                    '{"changes": {"c"')
+        self.assertEqual([{'a': 1}, {'a': 1, 'b': 2}],
+                         [r[journal.NAMESPACE] for r in self.read()])
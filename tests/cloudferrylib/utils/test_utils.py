@@ -0,0 +1,103 @@
+# Copyright 2014: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+from oslotest import mockpatch
+
+from cloudferrylib.utils import utils
+from tests import test
+
+
+class SshTunnelPoolTestCase(test.TestCase):
+    def setUp(self):
+        super(SshTunnelPoolTestCase, self).setUp()
+        self.fake_run = mock.Mock()
+        self.useFixture(mockpatch.PatchObject(utils, 'run',
+                                              new=self.fake_run))
+        self.tunnel = utils.wrapper_singletone_ssh_tunnel("9000-9010")
+
+    def test_tunnel_reused(self):
+        with self.tunnel('compute', 'controller') as port_1:
+            pass
+        with self.tunnel('compute', 'controller') as port_2:
+            pass
+        self.assertEqual(port_1, port_2)
+        self.assertEqual(2, self.fake_run.call_count)
+        self.assertIn('pgrep', self.fake_run.call_args[0][0])
+        self.tunnel.close_tunnels()
+        self.assertEqual(3, self.fake_run.call_count)
+        self.assertIn('pkill', self.fake_run.call_args[0][0])
+        self.assertEqual([], self.tunnel.busy_port)
+
+    def test_dead_tunnel_evicted(self):
+        with self.tunnel('compute', 'controller') as port_1:
+            pass
+        self.fake_run.return_value = mock.Mock(succeeded=False)
+        with self.tunnel('compute', 'controller') as port_2:
+            self.assertEqual(port_1, port_2)
+            self.assertEqual(3, self.fake_run.call_count)
+            self.assertIn('-Nf', self.fake_run.call_args[0][0])
+        self.assertEqual([[port_2, 0]], self.tunnel.tunnels.values())
+
+    def test_tunnel_with_port_not_pooled(self):
+        with self.tunnel('compute', 'controller', port=9005) as port:
+            self.assertEqual(9005, port)
+        self.assertEqual(2, self.fake_run.call_count)
+        self.assertEqual({}, self.tunnel.tunnels)
+
+
+class ForwardAgentTestCase(test.TestCase):
+    def setUp(self):
+        super(ForwardAgentTestCase, self).setUp()
+        self.fake_local = mock.Mock(return_value="Agent pid 10\n/tmp/sock")
+        self.useFixture(mockpatch.PatchObject(utils, 'local',
+                                              new=self.fake_local))
+        self.useFixture(mockpatch.PatchObject(utils.forward_agent, 'agents',
+                                              new={}))
+        self.useFixture(mockpatch.PatchObject(utils.forward_agent,
+                                              'finalizer_pid', new=None))
+        self.fake_finalize = mock.Mock()
+        self.useFixture(mockpatch.PatchObject(utils, 'Finalize',
+                                              new=self.fake_finalize))
+        self.useFixture(mockpatch.PatchObject(utils.os, 'environ',
+                                              new={'SSH_AUTH_SOCK': '/tmp/own'}))
+
+    def test_one_agent(self):
+        for _ in range(2):
+            with utils.forward_agent('key'):
+                pass
+        self.assertEqual(1, self.fake_local.call_count)
+        self.assertEqual({'key': ('10', '/tmp/sock', utils.os.getpid())},
+                         utils.forward_agent.agents)
+        self.assertEqual(1, self.fake_finalize.call_count)
+
+    def test_environ_restored(self):
+        with utils.forward_agent('key'):
+            self.assertEqual('/tmp/sock', utils.os.environ['SSH_AUTH_SOCK'])
+            self.assertEqual('10', utils.os.environ['SSH_AGENT_PID'])
+        self.assertEqual({'SSH_AUTH_SOCK': '/tmp/own'}, utils.os.environ)
+
+    def test_kill_own_agents_only(self):
+        utils.forward_agent.agents.update({
+            'parent': ('9', '/tmp/parent', utils.os.getpid() + 1),
+            'own': ('10', '/tmp/sock', utils.os.getpid())})
+        utils.forward_agent.kill_agents()
+        self.fake_local.assert_called_once_with("kill -9 10")
+        self.assertEqual(['parent'], utils.forward_agent.agents.keys())
+
+    def test_ssh_command(self):
+        cmd = utils.ssh_command('compute', "'ls'")
+        self.assertIn('-oControlMaster=auto', cmd)
+        self.assertTrue(cmd.endswith("compute 'ls'"))
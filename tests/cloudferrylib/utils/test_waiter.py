@@ -0,0 +1,102 @@
+# Copyright 2014: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from cloudferrylib.utils import waiter
+from tests import test
+
+
+class StatusWaiterTestCase(test.TestCase):
+    def setUp(self):
+        super(StatusWaiterTestCase, self).setUp()
+        self.waiter = waiter.StatusWaiter()
+        self.fake_manager = mock.Mock()
+        self.fake_manager.list.return_value = [
+            mock.Mock(id='fake_id_1', status='available'),
+            mock.Mock(id='fake_id_2', status='AVAILABLE')]
+
+    def test_batched_list(self):
+        with self.waiter.cond:
+            futures = [self.waiter.wait(self.fake_manager, 'fake_id_%d' % i,
+                                        'available')
+                       for i in (1, 2)]
+        self.assertEqual(['available', 'available'],
+                         [f.result(5) for f in futures])
+        self.assertFalse(self.fake_manager.get.called)
+
+    def test_single_get(self):
+        self.fake_manager.get.return_value = mock.Mock(status='in-use')
+        callback = mock.Mock()
+        future = self.waiter.wait(self.fake_manager, 'fake_id', 'in-use',
+                                  callback=callback)
+        self.assertEqual('in-use', future.result(5))
+        self.fake_manager.get.assert_called_with('fake_id')
+        callback.assert_called_once_with(future)
+
+    def test_timeout(self):
+        self.fake_manager.get.return_value = mock.Mock(status='creating')
+        future = self.waiter.wait(self.fake_manager, 'fake_id', 'available',
+                                  timeout=0)
+        self.assertRaises(waiter.TimeoutException, future.result, 5)
+
+    def test_error_status(self):
+        self.fake_manager.get.return_value = mock.Mock(status='error')
+        future = self.waiter.wait(self.fake_manager, 'fake_id', 'available')
+        self.assertRaises(waiter.ErrorStatusException, future.result, 5)
+
+    def test_error_status_is_not_timeout(self):
+        self.fake_manager.get.return_value = mock.Mock(status='error')
+        future = self.waiter.wait(self.fake_manager, 'fake_id', 'available')
+        self.assertRaises(waiter.WaitException, future.result, 5)
+        self.assertFalse(issubclass(waiter.ErrorStatusException,
+                                    waiter.TimeoutException))
+
+    def test_wait_indefinitely(self):
+        w = waiter.Wait('fake_id', 'available', None)
+        self.assertIsNone(w.deadline)
+        self.assertFalse(w.check('creating', w.next_check + 10 ** 9))
+        self.assertFalse(w.future.done())
+
+    def test_configured_timeout(self):
+        self.addCleanup(waiter.init_waiter, waiter.DEFAULT_TIMEOUT)
+        fake_waiter = mock.patch.object(waiter, 'get_waiter').start()
+        waiter.init_waiter(0)
+        waiter.wait_for_status_async(self.fake_manager, 'fake_id', 'available')
+        waiter.init_waiter(10)
+        waiter.wait_for_status_async(self.fake_manager, 'fake_id', 'available')
+        self.assertEqual([None, 10], [c[0][3] for c in
+                                      fake_waiter.return_value.wait.call_args_list])
+
+    def test_large_listing_is_not_repeated(self):
+        self.fake_manager.list.return_value = [
+            mock.Mock(id='fake_id_%d' % i, status='creating')
+            for i in xrange(waiter.LIST_ITEMS_PER_GET * 2 + 1)]
+        self.fake_manager.get.return_value = mock.Mock(status='available')
+        with self.waiter.cond:
+            futures = [self.waiter.wait(self.fake_manager, 'fake_id_%d' % i,
+                                        'available')
+                       for i in (1, 2)]
+        self.assertEqual(['available', 'available'],
+                         [f.result(5) for f in futures])
+        self.assertEqual(1, self.fake_manager.list.call_count)
+
+    def test_check_is_cut_at_deadline(self):
+        w = waiter.Wait('fake_id', 'available', 3)
+        w.interval = waiter.MAX_INTERVAL
+        self.assertFalse(w.check('creating', w.deadline - 1))
+        self.assertEqual(w.deadline, w.next_check)
+        self.assertTrue(w.check('creating', w.next_check))
+        self.assertRaises(waiter.TimeoutException, w.future.result, 0)
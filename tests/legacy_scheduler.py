@@ -0,0 +1,67 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+"""
+    Stand-ins for the legacy scheduler package, which tasks import but
+    which is not part of this tree. install() adds only the modules that
+    can't be imported, modules already loaded are left as they are.
+"""
+
+from __future__ import absolute_import
+
+import sys
+import types
+
+
+class SuperTask(object):
+    def __init__(self, namespace=None, **kwargs):
+        self.namespace = namespace
+
+
+class Scheduler(object):
+    def __init__(self, namespace=None):
+        self.namespace = namespace
+        self.tasks = []
+
+    def addTask(self, task):
+        self.tasks.append(task)
+
+    def run(self):
+        raise NotImplementedError()
+
+
+def module(name, **attrs):
+    result = types.ModuleType(name)
+    result.__dict__.update(attrs)
+    return result
+
+
+def legacy_modules():
+    transaction = dict((name, type(name, (object,), {}))
+                       for name in ('TransactionsListener', 'TaskTransactionBegin', 'TaskTransactionEnd'))
+    return [module('scheduler'),
+            module('scheduler.Scheduler', Scheduler=Scheduler),
+            module('scheduler.SuperTask', SuperTask=SuperTask),
+            module('scheduler.transaction'),
+            module('scheduler.transaction.TaskTransaction', ERROR='error', NO_ERROR='no error', **transaction)]
+
+
+def install():
+    try:
+        import scheduler.Scheduler
+        import scheduler.SuperTask
+        import scheduler.transaction.TaskTransaction
+    except ImportError:
+        for legacy in legacy_modules():
+            sys.modules.setdefault(legacy.__name__, legacy)
@@ -0,0 +1,65 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+import shutil
+import tempfile
+
+import mock
+
+from cloudferrylib.utils import journal
+from tests import legacy_scheduler
+from tests import test
+
+legacy_scheduler.install()
+
+from migrationlib.os.utils.rollback import RollbackOpenStack
+
+
+class GetSnapshotsTestCase(test.TestCase):
+    def setUp(self):
+        super(GetSnapshotsTestCase, self).setUp()
+        self.path = tempfile.mkdtemp() + '/'
+        self.addCleanup(shutil.rmtree, self.path)
+        self.transaction = mock.Mock(prefix_path=self.path)
+        self.load = mock.patch.object(RollbackOpenStack, 'load_snapshot',
+                                      side_effect=lambda path: path).start()
+        self.rollback = RollbackOpenStack.RollbackOpenStack('id', None, None)
+
+    def write(self, *records):
+        writer = journal.JournalWriter(self.path + "tasks.trans")
+        for record in records:
+            writer.write(record)
+        writer.close()
+
+    def test_begin_and_end_from_journal(self):
+        self.write({'type': 'TransactionsListenerOs',
+                    journal.SNAPSHOTS: {'source': 'source/base-1.5.snapshot',
+                                        'dest': 'dest/base-1.5.snapshot'}},
+                   {'event': 'event task', journal.CHANGES: {}},
+                   {'event': 'event end',
+                    journal.SNAPSHOTS: {'source': 'source/12.25.snapshot',
+                                        'dest': 'dest/12.25.snapshot'}})
+        one, two = self.rollback.get_snapshots(self.transaction, None, 'dest', True)
+        self.assertEqual(self.path + 'dest/base-1.5.snapshot', one)
+        self.assertEqual(self.path + 'dest/12.25.snapshot', two)
+
+    @mock.patch.object(RollbackOpenStack, 'SnapshotStateOpenStack')
+    def test_no_end_record(self, state):
+        self.write({'type': 'TransactionsListenerOs',
+                    journal.SNAPSHOTS: {'source': 'source/base-1.5.snapshot',
+                                        'dest': 'dest/base-1.5.snapshot'}})
+        one, two = self.rollback.get_snapshots(self.transaction, 'cloud', 'source', True)
+        self.assertEqual(self.path + 'source/base-1.5.snapshot', one)
+        state.assert_called_once_with('cloud')
+        self.assertEqual(state.return_value.create_snapshot.return_value, two)
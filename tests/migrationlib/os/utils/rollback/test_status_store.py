@@ -0,0 +1,85 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import json
+import os
+import shutil
+import tempfile
+
+from migrationlib.os.utils.rollback import StatusStore
+from tests import test
+
+
+def commit(id, event, status='no error'):
+    return {'id_transaction': id, 'status': status, 'event': event}
+
+
+class StatusStoreTestCase(test.TestCase):
+    def setUp(self):
+        super(StatusStoreTestCase, self).setUp()
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        self.path = os.path.join(self.dir, StatusStore.STATUS_FILE)
+
+    def lines(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_get_and_delete(self):
+        store = StatusStore.StatusStore(self.path)
+        store.add(commit('1', 'event_begin'))
+        store.add(commit('2', 'event_begin'))
+        store.add(commit('1', 'event_end'))
+        self.assertEqual(['event_begin', 'event_end'],
+                         [r['event'] for r in store.get('1')])
+
+        store.delete('1')
+        self.assertEqual([], store.get('1'))
+        self.assertEqual(1, len(store.get('2')))
+        store.add(commit('1', 'event_begin', 'error'))
+        self.assertEqual(['error'], [r['status'] for r in store.get('1')])
+        self.assertEqual(5, len(self.lines()))
+
+    def test_reads_appends_of_other_writers(self):
+        store = StatusStore.StatusStore(self.path)
+        self.assertFalse(store.exists())
+        StatusStore.StatusStore(self.path).add(commit('1', 'event_begin'))
+        self.assertEqual(1, len(store.get('1')))
+
+    def test_former_status_file(self):
+        with open(self.path, 'w') as f:
+            f.write(json.dumps(commit('1', 'event_begin')) + "\n")
+            f.write(json.dumps(commit('1', 'event_end')) + "\n")
+            f.write('{"id_transaction": "2", "sta')
+        store = StatusStore.StatusStore(self.path)
+        self.assertEqual(2, len(store.get('1')))
+        self.assertEqual([], store.get('2'))
+        store.add(commit('3', 'event_begin'))
+        self.assertEqual(1, len(store.get('3')))
+
+    def test_compact_on_open(self):
+        store = StatusStore.StatusStore(self.path)
+        store.add(commit('1', 'event_begin'))
+        store.add(commit('1', 'event_end'))
+        store.delete('1')
+        store.add(commit('1', 'event_begin'))
+        store.add(commit('2', 'event_begin'))
+
+        store = StatusStore.StatusStore(self.path)
+
+        self.assertEqual([commit('1', 'event_begin'), commit('2', 'event_begin')],
+                         self.lines())
+        self.assertEqual(1, len(store.get('1')))
+        self.assertEqual(0, store.dead)
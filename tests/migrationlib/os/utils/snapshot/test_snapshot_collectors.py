@@ -0,0 +1,114 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import threading
+import time
+
+import mock
+
+from migrationlib.os.utils.snapshot.Snapshot import Snapshot
+from migrationlib.os.utils.snapshot.SnapshotDelta import SnapshotBase
+from migrationlib.os.utils.snapshot.SnapshotSecurityGroups import SnapshotSecurityGroups
+from migrationlib.os.utils.snapshot.SnapshotState import SnapshotState
+from migrationlib.os.utils.snapshot.SnapshotStateOpenStack import SnapshotStateOpenStack
+from migrationlib.os.utils.snapshot.SnapshotTenants import SnapshotTenants
+from migrationlib.os.utils.snapshot.SnapshotUsers import SnapshotUsers
+from tests import test
+
+
+def named(name, **kwargs):
+    resource = mock.Mock(**kwargs)
+    resource.name = name
+    return resource
+
+
+def rendezvous(count):
+
+    """ Collector classes, every create_snapshot returns only once all
+    count of them run at the same time. """
+
+    lock = threading.Condition()
+    running = []
+
+    def wait_all():
+        with lock:
+            running.append(1)
+            lock.notify_all()
+            deadline = time.time() + 5
+            while len(running) < count:
+                if time.time() >= deadline:
+                    raise AssertionError("Collectors are run one by one")
+                lock.wait(deadline - time.time())
+
+    def collector(category):
+        class Collector(SnapshotState):
+            def create_snapshot(self):
+                wait_all()
+                snapshot = Snapshot()
+                snapshot.add(category, category, {'name': category})
+                return snapshot
+        Collector.category = category
+        return Collector
+
+    return [collector(category) for category in ('instances', 'volumes', 'images')]
+
+
+class SnapshotCollectorsTestCase(test.TestCase):
+    def setUp(self):
+        super(SnapshotCollectorsTestCase, self).setUp()
+        self.cloud = mock.Mock()
+
+    def test_collectors_run_concurrently(self):
+        snapshot = SnapshotStateOpenStack(self.cloud, rendezvous(3)).create_snapshot()
+        self.assertEqual({'name': 'volumes'}, snapshot.volumes['volumes'])
+        self.assertEqual(['images'], snapshot.images.keys())
+
+    def test_delta_collectors_run_concurrently(self):
+        base = SnapshotBase('base', Snapshot())
+        delta = SnapshotStateOpenStack(self.cloud, rendezvous(3)).create_delta(base)
+        self.assertEqual(['instances'], delta.changes['instances'].keys())
+
+    def test_collector_error(self):
+        self.cloud.keystone_client.users.list.side_effect = RuntimeError()
+        state = SnapshotStateOpenStack(self.cloud, [SnapshotUsers, SnapshotTenants])
+        self.assertRaises(RuntimeError, state.create_snapshot)
+
+    def test_identity(self):
+        self.cloud.keystone_client.users.list.return_value = [
+            named('admin', id='user_id', enabled=True, email='admin@example.com')]
+        self.cloud.keystone_client.tenants.list.return_value = [
+            named('admin', id='tenant_id', enabled=False, description='Admin')]
+
+        snapshot = SnapshotStateOpenStack(self.cloud, [SnapshotUsers, SnapshotTenants]).create_snapshot()
+
+        self.assertEqual({'user_id': {'name': 'admin', 'enabled': True, 'email': 'admin@example.com'}},
+                         snapshot.users)
+        self.assertEqual({'tenant_id': {'name': 'admin', 'enabled': False, 'description': 'Admin'}},
+                         snapshot.tenants)
+
+    def test_security_groups(self):
+        rules = [{'id': 'rule_id', 'protocol': 'tcp'}]
+        self.cloud.network_service.return_value = 'neutron'
+        self.cloud.network_client.list_security_groups.return_value = {
+            'security_groups': [{'id': 'sg_id', 'name': 'default', 'description': '',
+                                 'tenant_id': 'tenant_id', 'security_group_rules': rules}]}
+        self.assertEqual({'sg_id': {'name': 'default', 'description': '', 'tenant_id': 'tenant_id',
+                                    'rules': rules}},
+                         SnapshotSecurityGroups(self.cloud).create_snapshot().security_groups)
+
+        self.cloud.network_service.return_value = 'nova'
+        self.cloud.nova_client.security_groups.list.return_value = [
+            named('default', id=1, description='', tenant_id='tenant_id', rules=rules)]
+        self.assertEqual(['1'], SnapshotSecurityGroups(self.cloud).create_snapshot().security_groups.keys())
@@ -0,0 +1,119 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import mock
+
+from migrationlib.os.utils.restore.Report import ReportObjConflict, FIX
+from migrationlib.os.utils.restore.RestoreInstances import RestoreInstances
+from migrationlib.os.utils.restore.RestoreStateOpenStack import RestoreStateOpenStack
+from migrationlib.os.utils.snapshot import Snapshot
+from migrationlib.os.utils.snapshot import SnapshotDelta
+from migrationlib.os.utils.snapshot.SnapshotState import SnapshotState
+from tests import test
+
+
+def make_snapshot(instances, volumes=None, timestamp=0):
+    snapshot = Snapshot.Snapshot()
+    snapshot.instances = instances
+    snapshot.volumes = volumes or {}
+    snapshot.timestamp = timestamp
+    return snapshot
+
+
+class SnapshotDiffTestCase(test.TestCase):
+    def setUp(self):
+        super(SnapshotDiffTestCase, self).setUp()
+        self.one = make_snapshot({'1': {'status': 'ACTIVE'},
+                                  '2': {'status': 'ACTIVE'},
+                                  '3': {'status': 'ACTIVE'}},
+                                 {'1': {'status': 'available'}}, 10)
+        self.two = make_snapshot({'1': {'status': 'ACTIVE'},
+                                  '2': {'status': 'SHUTOFF'},
+                                  '4': {'status': 'ACTIVE'}},
+                                 {'1': {'status': 'available'}}, 15)
+
+    def test_iter_diff(self):
+        diff = dict((id, diff_obj) for category, id, diff_obj
+                    in SnapshotState.iter_diff(self.one, self.two))
+        self.assertEqual(set(['2', '3', '4']), set(diff))
+        self.assertTrue(diff['2'].isChange())
+        self.assertEqual('SHUTOFF', diff['2'].value.curr['status'])
+        self.assertEqual('ACTIVE', diff['2'].value.was['status'])
+        self.assertTrue(diff['3'].isDelete())
+        self.assertTrue(diff['4'].isAdd())
+
+    def test_iter_diff_is_lazy(self):
+        diff = SnapshotState.iter_diff(self.one, self.two)
+        self.assertEqual('instances', next(diff)[0])
+
+    def test_diff_snapshot(self):
+        diff_snapshot = SnapshotState.diff_snapshot(self.one, self.two)
+        self.assertEqual(5, diff_snapshot.timestamp)
+        self.assertEqual(set(['2', '3', '4']), set(diff_snapshot.instances))
+        self.assertEqual({}, diff_snapshot.volumes)
+
+    def test_deltas_of_different_bases(self):
+        base_one = SnapshotDelta.SnapshotBase('one', self.one)
+        base_two = SnapshotDelta.SnapshotBase('two', self.two)
+        one = SnapshotDelta.SnapshotDelta(base_one, {'instances': {'3': None}})
+        two = SnapshotDelta.SnapshotDelta(base_two)
+        two.update('instances', {'1': {'status': 'ERROR'},
+                                 '2': {'status': 'SHUTOFF'},
+                                 '4': {'status': 'ACTIVE'}})
+
+        diff = dict((id, diff_obj) for category, id, diff_obj
+                    in SnapshotState.iter_diff(one, two))
+
+        self.assertEqual(set(['1', '2', '4']), set(diff))
+        self.assertTrue(diff['1'].isChange())
+        self.assertTrue(diff['4'].isAdd())
+
+    def test_union(self):
+        snapshot = make_snapshot({'1': {}})
+        snapshot.union(make_snapshot({'2': {}}, {'3': {}}, 100))
+        self.assertEqual(set(['1', '2']), set(snapshot.instances))
+        self.assertEqual(['3'], snapshot.volumes.keys())
+        self.assertEqual(0, snapshot.timestamp)
+
+
+class RestoreStreamTestCase(test.TestCase):
+    def setUp(self):
+        super(RestoreStreamTestCase, self).setUp()
+        self.cloud = mock.Mock()
+        self.fix = self.patch(RestoreInstances, 'fix')
+
+    def patch(self, cls, name):
+        patcher = mock.patch.object(cls, name, autospec=True,
+                                    side_effect=lambda self, id_obj, obj:
+                                    ReportObjConflict(id_obj, obj, "", FIX))
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def test_restore_consumes_generator(self):
+        diffs = iter([('instances', '1', Snapshot.DiffObject(Snapshot.ADD, {})),
+                      ('tenants', '2', Snapshot.DiffObject(Snapshot.ADD, {}))])
+
+        report = RestoreStateOpenStack(self.cloud).restore(diffs)
+
+        self.assertEqual(['1'], report.instances.keys())
+        self.assertEqual({}, report.tenants)
+        self.assertEqual(1, self.fix.call_count)
+        self.assertEqual([], list(diffs))
+
+    def test_restore_diff_snapshot(self):
+        diff_snapshot = SnapshotState.diff_snapshot(
+            make_snapshot({}), make_snapshot({'1': {}, '2': {}}))
+        report = RestoreInstances(self.cloud).restore(diff_snapshot)
+        self.assertEqual(set(['1', '2']), set(report.instances))
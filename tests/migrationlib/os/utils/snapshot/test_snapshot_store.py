@@ -0,0 +1,185 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import os
+import shutil
+import tempfile
+
+import mock
+
+from migrationlib.os.utils.snapshot import Snapshot
+from migrationlib.os.utils.snapshot import SnapshotDelta
+from migrationlib.os.utils.snapshot import SnapshotStore
+from migrationlib.os.utils.snapshot.SnapshotStateOpenStack import SnapshotStateOpenStack
+from tests import test
+
+
+def named(name, **kwargs):
+    resource = mock.Mock(**kwargs)
+    resource.name = name
+    return resource
+
+
+def fake_server(id, status='ACTIVE'):
+    server = mock.Mock(id=id, status=status)
+    server.name = 'server_' + id
+    return server
+
+
+def fake_volume(id, status='available'):
+    return mock.Mock(id=id, status=status, display_name='volume_' + id,
+                     attachments=[])
+
+
+def fake_image(id):
+    image = mock.Mock(id=id, disk_format='qcow2', checksum='md5_' + id)
+    image.name = 'image_' + id
+    return image
+
+
+class FakeCloud(object):
+    def __init__(self, count):
+        self.servers = dict((str(i), fake_server(str(i))) for i in xrange(count))
+        self.deleted = {}
+        self.volumes = dict((str(i), fake_volume(str(i))) for i in xrange(count))
+        self.images = dict((str(i), fake_image(str(i))) for i in xrange(count))
+        self.changed = set()
+        self.network_client = mock.Mock()
+        self.keystone_client = mock.Mock()
+        self.keystone_client.users.list.return_value = [
+            named('user', id='user', enabled=True, email=None)]
+        self.keystone_client.tenants.list.return_value = [
+            named('tenant', id='tenant', enabled=True, description='')]
+        self.nova_client = mock.Mock()
+        self.nova_client.servers.list.side_effect = self.list_servers
+        self.nova_client.security_groups.list.return_value = [
+            named('default', id=1, description='', tenant_id='tenant', rules=[])]
+        self.cinder_client = mock.Mock()
+        self.cinder_client.volumes.list.side_effect = lambda: self.volumes.values()
+        self.glance_client = mock.Mock()
+        self.glance_client.images.list.side_effect = lambda: self.images.values()
+
+    def network_service(self):
+        return 'nova'
+
+    def list_servers(self, search_opts=None):
+        if search_opts is None:
+            return self.servers.values()
+        return [self.servers[id] for id in self.changed] + self.deleted.values()
+
+    def set_status(self, id, status):
+        self.servers[id].status = status
+        self.changed.add(id)
+
+    def delete(self, id):
+        self.deleted[id] = fake_server(id, SnapshotDelta.DELETED)
+        del self.servers[id]
+
+
+class SnapshotStoreTestCase(test.TestCase):
+    def setUp(self):
+        super(SnapshotStoreTestCase, self).setUp()
+        self.path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.path)
+        self.cloud = FakeCloud(10)
+        self.store = SnapshotStore.SnapshotStore(self.path)
+
+    def take(self):
+        return self.store.take(SnapshotStateOpenStack(self.cloud))
+
+    def test_first_snapshot_is_base(self):
+        record = self.take()
+        self.assertTrue(os.path.basename(record['path']).startswith(
+            SnapshotStore.BASE_PREFIX))
+        snapshot = SnapshotDelta.load_snapshot(record['path'])
+        self.assertIsInstance(snapshot, Snapshot.Snapshot)
+        self.assertEqual(10, len(snapshot.instances))
+
+    def test_delta_stores_changes_only(self):
+        self.take()
+        self.cloud.set_status('1', 'SHUTOFF')
+        self.cloud.delete('2')
+        self.cloud.volumes['3'].status = 'in-use'
+        del self.cloud.images['4']
+        self.cloud.images['new'] = fake_image('new')
+
+        delta = SnapshotDelta.load_snapshot(self.take()['path'])
+
+        self.assertIsInstance(delta, SnapshotDelta.SnapshotDelta)
+        self.assertEqual({'1': {'status': 'SHUTOFF', 'name': 'server_1'},
+                          '2': None}, delta.changes['instances'])
+        self.assertEqual(['3'], delta.changes['volumes'].keys())
+        self.assertEqual(set(['4', 'new']), set(delta.changes['images']))
+        snapshot = delta.materialize()
+        self.assertEqual(9, len(snapshot.instances))
+        self.assertEqual('SHUTOFF', snapshot.instances['1']['status'])
+        self.assertNotIn('4', snapshot.images)
+
+    def test_filtered_listing_failure_falls_back(self):
+        self.take()
+        self.cloud.nova_client.servers.list.side_effect = \
+            lambda search_opts=None: self.cloud.list_servers() \
+            if search_opts is None else 1 / 0
+        del self.cloud.servers['5']
+        delta = SnapshotDelta.load_snapshot(self.take()['path'])
+        self.assertEqual({'5': None}, delta.changes['instances'])
+
+    def test_rebase(self):
+        self.take()
+        for id in self.cloud.servers.keys():
+            self.cloud.set_status(id, 'ERROR')
+        for volume in self.cloud.volumes.values():
+            volume.status = 'in-use'
+        record = self.take()
+        self.assertTrue(os.path.basename(record['path']).startswith(
+            SnapshotStore.BASE_PREFIX))
+        self.assertEqual(record['path'], self.store.get_base().path)
+
+    def test_diff_of_deltas(self):
+        self.take()
+        self.cloud.set_status('1', 'SHUTOFF')
+        one = SnapshotDelta.load_snapshot(self.take()['path'])
+        self.cloud.set_status('1', 'ACTIVE')
+        self.cloud.set_status('6', 'ERROR')
+        self.cloud.delete('7')
+        two = SnapshotDelta.load_snapshot(self.take()['path'])
+
+        diff = SnapshotStateOpenStack.diff_snapshot(one, two)
+        full_diff = SnapshotStateOpenStack.diff_snapshot(one.materialize(),
+                                                         two.materialize())
+
+        for diff_snapshot in (diff, full_diff):
+            self.assertEqual(set(['1', '6', '7']),
+                             set(diff_snapshot.instances))
+            self.assertTrue(diff_snapshot.instances['1'].isChange())
+            self.assertEqual('ACTIVE',
+                             diff_snapshot.instances['1'].value.curr['status'])
+            self.assertTrue(diff_snapshot.instances['7'].isDelete())
+            self.assertEqual({}, diff_snapshot.volumes)
+
+    def test_copy_delta_with_base(self):
+        self.take()
+        self.cloud.set_status('1', 'SHUTOFF')
+        record = self.take()
+        copy_path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, copy_path)
+
+        copy = SnapshotStore.SnapshotStore(copy_path).copy(record)
+
+        self.assertEqual(os.path.basename(record['path']),
+                         os.path.basename(copy['path']))
+        delta = SnapshotDelta.load_snapshot(copy['path'])
+        self.assertEqual(copy_path, os.path.dirname(delta.base.path))
+        self.assertEqual('SHUTOFF', delta.materialize().instances['1']['status'])
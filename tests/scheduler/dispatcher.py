@@ -0,0 +1,76 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+__author__ = 'mirrorcoder'
+
+import threading
+import time
+
+from cloudferrylib.scheduler import executor
+from cloudferrylib.scheduler.dispatcher import Dispatcher
+from tests import test
+
+
+class DispatcherTestCase(test.TestCase):
+    def setUp(self):
+        super(DispatcherTestCase, self).setUp()
+        self.lock = threading.Lock()
+        self.running = {}
+        self.max_running = {}
+
+    def job(self, host):
+        with self.lock:
+            self.running[host] = self.running.get(host, 0) + 1
+            self.max_running[host] = max(self.max_running.get(host, 0),
+                                         self.running[host])
+        time.sleep(0.01)
+        with self.lock:
+            self.running[host] -= 1
+        return host
+
+    def test_limit_per_key(self):
+        dispatcher = Dispatcher(executor.get_executor(executor.THREAD, 8),
+                                {'host': 2})
+        futures = [dispatcher.submit(self.job, {'host': host}, host)
+                   for host in ['a', 'b'] * 5]
+        dispatcher.join(futures)
+        self.assertEqual(['a', 'b'] * 5, [f.result() for f in futures])
+        self.assertEqual({'a': 2, 'b': 2}, self.max_running)
+
+    def test_unlimited_key(self):
+        dispatcher = Dispatcher(executor.get_executor(executor.THREAD, 4),
+                                {'host': 1})
+        futures = [dispatcher.submit(self.job, {'pool': 'p'}, 'a')
+                   for _ in range(4)]
+        dispatcher.join(futures)
+        self.assertEqual(['a'] * 4, [f.result() for f in futures])
+        self.assertEqual({}, dispatcher.running)
+
+    def test_on_start(self):
+        started = []
+        finished = []
+
+        def on_start(keys, kwargs):
+            started.append(keys['host'])
+            kwargs['host'] = keys['host'] * 2
+            return lambda: finished.append(keys['host'])
+
+        dispatcher = Dispatcher(executor.get_executor(executor.THREAD, 2),
+                                {'host': 1}, on_start)
+        futures = [dispatcher.submit(self.job, {'host': host})
+                   for host in ['a', 'b']]
+        dispatcher.join(futures)
+        self.assertEqual(['aa', 'bb'], [f.result() for f in futures])
+        self.assertEqual(['a', 'b'], started)
+        self.assertEqual(['a', 'b'], sorted(finished))
@@ -0,0 +1,112 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+__author__ = 'mirrorcoder'
+
+import sys
+import threading
+import time
+
+from cloudferrylib.scheduler import executor
+from tests import test
+from oslotest import mockpatch
+import mock
+
+
+class ExecutorTestCase(test.TestCase):
+    def test_thread_executor_result(self):
+        e = executor.get_executor(executor.THREAD, 2)
+        futures = [e.submit(lambda x: x * 2, i) for i in range(5)]
+        self.assertEqual([0, 2, 4, 6, 8], [f.result() for f in futures])
+        self.assertTrue(len(e.workers) <= 2)
+        e.shutdown()
+
+    def test_thread_executor_exception(self):
+        e = executor.get_executor(executor.THREAD)
+
+        def fail():
+            raise ValueError("fail")
+
+        f = e.submit(fail)
+        f.join()
+        self.assertIsInstance(f.exception(), ValueError)
+        self.assertRaises(ValueError, f.result)
+        e.shutdown()
+
+    def test_thread_executor_nested_submit(self):
+        e = executor.get_executor(executor.THREAD, 1)
+
+        def parent():
+            children = [e.submit(lambda x: x + 1, i) for i in range(3)]
+            return [f.result() for f in children]
+
+        f = e.submit(parent)
+        f.join(5)
+        self.assertEqual([1, 2, 3], f.result())
+        e.shutdown()
+
+    def test_thread_executor_nested_jobs_run_on_workers(self):
+        e = executor.get_executor(executor.THREAD, 2)
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def child():
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return threading.current_thread()
+
+        def parent():
+            children = [e.submit(child) for _ in range(4)]
+            return threading.current_thread(), [f.result() for f in children]
+
+        parents = [e.submit(parent) for _ in range(2)]
+        for f in parents:
+            f.join(5)
+            thread, children = f.result()
+            self.assertNotIn(thread, children)
+        self.assertTrue(running[1] <= 2)
+        e.shutdown()
+
+    def test_thread_executor_reuses_idle_worker(self):
+        e = executor.get_executor(executor.THREAD, 4)
+        for i in range(3):
+            self.assertEqual(i, e.submit(lambda: i).result())
+            while e.idle < len(e.workers):
+                time.sleep(0.001)
+        self.assertEqual(1, len(e.workers))
+        e.shutdown()
+
+    def test_process_executor_exitcode(self):
+        fake_process = mock.MagicMock()
+        fake_process.return_value.exitcode = 0
+        self.useFixture(mockpatch.PatchObject(executor, 'Process',
+                                              new=fake_process))
+        e = executor.get_executor(executor.PROCESS, 1)
+        futures = [e.submit(lambda: None) for _ in range(3)]
+        self.assertEqual([0, 0, 0], [f.result() for f in futures])
+        self.assertEqual(3, fake_process.return_value.start.call_count)
+        e.shutdown()
+
+    def test_process_executor_nested_job_gets_slot(self):
+        e = executor.get_executor(executor.PROCESS, 1)
+
+        def parent():
+            sys.exit(e.submit(sys.exit, 3).result(5))
+
+        self.assertEqual(3, e.submit(parent).result(10))
+        e.shutdown()
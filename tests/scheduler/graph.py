@@ -0,0 +1,136 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+__author__ = 'mirrorcoder'
+
+from cloudferrylib.scheduler import graph
+from cloudferrylib.scheduler import task
+from cloudferrylib.scheduler.cursor import Cursor
+from cloudferrylib.scheduler.namespace import Namespace
+from cloudferrylib.scheduler.scheduler import GraphScheduler
+from tests import test
+
+
+class TaskA(task.Task):
+    def run(self, **kwargs):
+        return {'a': 1}
+
+
+class TaskB(task.Task):
+    def run(self, **kwargs):
+        return {'b': 2}
+
+
+class TaskC(task.Task):
+    def run(self, a=None, b=None, **kwargs):
+        return {'c': a + b}
+
+
+class TaskUnknown(task.Task):
+    def run(self, **kwargs):
+        result = {'d': 4}
+        return result
+
+
+class TaskSideEffect(task.Task):
+    def __init__(self, log):
+        super(TaskSideEffect, self).__init__()
+        self.log = log
+
+    def run(self, **kwargs):
+        self.log.append('side effect')
+
+
+class TaskLogC(task.Task):
+    def __init__(self, log):
+        super(TaskLogC, self).__init__()
+        self.log = log
+
+    def run(self, a=None, **kwargs):
+        self.log.append('c')
+        return {'c': a}
+
+
+class TaskCond(task.Task):
+    def run(self, **kwargs):
+        self.set_next_path(1)
+
+
+class TaskGraphTestCase(test.TestCase):
+    def test_infer_keys(self):
+        self.assertEqual(set(['a', 'b']), graph.get_reads(TaskC()))
+        self.assertEqual(set(['c']), graph.get_writes(TaskC()))
+        self.assertIsNone(graph.get_writes(TaskUnknown()))
+
+    def test_independent_tasks(self):
+        a, b, c = TaskA(), TaskB(), TaskC()
+        a >> b >> c
+        g = graph.TaskGraph.from_net(c)
+        self.assertEqual([a, b], [n.task for n in g.roots()])
+        self.assertEqual(set([a, b]), set(n.task for n in g.nodes[2].deps))
+        self.assertEqual(2, g.nodes[0].rank)
+        self.assertIsNone(g.next_segment())
+
+    def test_barrier(self):
+        a, u, b = TaskA(), TaskUnknown(), TaskB()
+        a >> u >> b
+        g = graph.TaskGraph.from_net(a)
+        self.assertEqual([g.nodes[0]], list(g.nodes[1].deps))
+        self.assertEqual([g.nodes[1]], list(g.nodes[2].deps))
+        self.assertEqual(g.nodes, g.critical_path())
+
+    def test_side_effect_task_keeps_order(self):
+        log = []
+        a, s, c = TaskA(), TaskSideEffect(log), TaskLogC(log)
+        a >> s >> c
+        g = graph.TaskGraph.from_net(a)
+        self.assertTrue(g.nodes[1].is_barrier())
+        self.assertEqual([g.nodes[0]], list(g.nodes[1].deps))
+        self.assertEqual([g.nodes[1]], list(g.nodes[2].deps))
+
+    def test_declared_independent_task(self):
+        s = TaskSideEffect([])
+        s.reads, s.provides = (), ()
+        a, b = TaskA(), TaskB()
+        a >> s >> b
+        g = graph.TaskGraph.from_net(a)
+        self.assertEqual(3, len(g.roots()))
+
+    def test_segments(self):
+        cond, a, b, c = TaskCond(), TaskA(), TaskB(), TaskC()
+        (cond | (a - c) | (b - c)) >> c
+        g = graph.TaskGraph.from_net(cond)
+        self.assertEqual([cond], [n.task for n in g.nodes])
+        cond.set_next_path(1)
+        self.assertEqual([a, c], [n.task for n in g.next_segment().nodes])
+
+
+class GraphSchedulerTestCase(test.TestCase):
+    def test_start(self):
+        a, b, c = TaskA(), TaskB(), TaskC()
+        a >> b >> c
+        namespace = Namespace({})
+        s = GraphScheduler(namespace=namespace, cursor=Cursor(a))
+        s.start()
+        self.assertEqual(3, namespace.vars['c'])
+        self.assertEqual(0, s.status_error)
+
+    def test_side_effect_task_order(self):
+        log = []
+        a, s, c = TaskA(), TaskSideEffect(log), TaskLogC(log)
+        a >> s >> c
+        namespace = Namespace({})
+        GraphScheduler(namespace=namespace, cursor=Cursor(a)).start()
+        self.assertEqual(['side effect', 'c'], log)
+        self.assertEqual(1, namespace.vars['c'])
@@ -0,0 +1,62 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+__author__ = 'mirrorcoder'
+
+import copy
+
+from cloudferrylib.scheduler import namespace
+from tests import test
+
+
+class NamespaceTestCase(test.TestCase):
+    def setUp(self):
+        super(NamespaceTestCase, self).setUp()
+        self.parent = namespace.Namespace({'v1': 1, 'v2': [2]})
+
+    def test_fork_reads_parent(self):
+        child = self.parent.fork()
+        self.assertEqual(1, child.vars['v1'])
+        self.assertIs(self.parent.vars['v2'], child.vars['v2'])
+        self.assertIn(namespace.CHILDREN, child.vars)
+
+    def test_fork_writes_own_layer(self):
+        child = self.parent.fork()
+        child.vars['v1'] = 10
+        child.vars['v3'] = 3
+        del child.vars['v2']
+        self.assertEqual({'v1': 10, 'v3': 3, namespace.CHILDREN: {}},
+                         dict(child.vars))
+        self.assertEqual({'v1': 1, 'v2': [2], namespace.CHILDREN: {}},
+                         self.parent.vars)
+        self.assertRaises(KeyError, child.vars.__getitem__, 'v2')
+
+    def test_merge(self):
+        child = self.parent.fork()
+        child.vars.update({'v1': 10, 'v3': 3})
+        del child.vars['v2']
+        self.parent.merge(child, keys=['v3'])
+        self.assertEqual(1, self.parent.vars['v1'])
+        self.assertEqual(3, self.parent.vars['v3'])
+        self.parent.merge(child)
+        self.assertEqual(10, self.parent.vars['v1'])
+        self.assertNotIn('v2', self.parent.vars)
+
+    def test_copy_does_not_share_layer(self):
+        child = self.parent.fork()
+        other = copy.copy(child.vars)
+        del other['v1']
+        self.assertEqual(1, child.vars['v1'])
+        self.assertEqual({'v1': 1, 'v2': [2], namespace.CHILDREN: {}},
+                         copy.deepcopy(child.vars))
@@ -15,6 +15,11 @@
 __author__ = 'mirrorcoder'
 
 from cloudferrylib.scheduler import scheduler
+from cloudferrylib.scheduler import executor
+from cloudferrylib.scheduler.namespace import Namespace
+from cloudferrylib.scheduler.task import Task
+from cloudferrylib.scheduler.thread_tasks import WrapThreadTask, WaitThreadTask, WaitThreadAllTask
+from cloudferrylib.scheduler.cursor import Cursor
 from tests import test
 from oslotest import mockpatch
 import mock
@@ -28,10 +33,11 @@ class SchedulerTestCase(test.TestCase):
                                                   new=self.fake_cursor)
         self.useFixture(self.cursor_patch)
 
-        self.fake_process = mock.MagicMock()
-        self.process_patch = mockpatch.PatchObject(scheduler, 'Process',
-                                                   new=self.fake_process)
-        self.useFixture(self.process_patch)
+        self.fake_executor = mock.MagicMock()
+        self.executor_patch = mockpatch.PatchObject(scheduler.executors,
+                                                    'get_executor',
+                                                    new=self.fake_executor)
+        self.useFixture(self.executor_patch)
         self.fake_wrap_tt = mock.MagicMock()
         self.fake_wrap_tt.__name__ = 'WrapThreadTask'
         self.wrap_tt_patch = mockpatch.PatchObject(scheduler, 'WrapThreadTask',
@@ -62,3 +68,74 @@ class SchedulerTestCase(test.TestCase):
         self.assertTrue(fake_cursor[0].called)
         self.assertTrue(fake_cursor[2].called)
 
+
+
+class TaskWrite(Task):
+    def __init__(self, **values):
+        super(TaskWrite, self).__init__()
+        self.values = values
+
+    def run(self, **kwargs):
+        return self.values
+
+
+class TaskRead(Task):
+    def __init__(self, result):
+        super(TaskRead, self).__init__()
+        self.result = result
+
+    def run(self, **kwargs):
+        self.result.update(kwargs)
+
+
+class SchedulerJoinTestCase(test.TestCase):
+    def setUp(self):
+        super(SchedulerJoinTestCase, self).setUp()
+        self.executor = executor.get_executor(executor.THREAD, 2)
+        self.namespace = Namespace({'v': 0})
+        self.result = {}
+
+    def start(self, net):
+        scheduler.Scheduler(namespace=self.namespace, cursor=Cursor(net),
+                            executor=self.executor).start()
+
+    def test_wait_thread_merges_namespace(self):
+        tt = WrapThreadTask(TaskWrite(v=1, w=2))
+        start = TaskWrite()
+        start & tt
+        start >> WaitThreadTask(tt, merge=True) >> TaskRead(self.result)
+        self.start(start)
+        self.assertEqual(1, self.result['v'])
+        self.assertEqual(2, self.result['w'])
+
+    def test_wait_all_threads_merges_namespace(self):
+        start = TaskWrite()
+        branch = TaskWrite(v=1)
+        branch >> TaskWrite(w=2)
+        start & WrapThreadTask(branch)
+        start >> WaitThreadAllTask(merge=True) >> TaskRead(self.result)
+        self.start(start)
+        self.assertEqual(1, self.result['v'])
+        self.assertEqual(2, self.result['w'])
+
+    def test_not_joined_thread_is_not_merged(self):
+        start = TaskWrite()
+        start & WrapThreadTask(TaskWrite(v=1))
+        start >> TaskRead(self.result)
+        self.start(start)
+        self.namespace.vars[scheduler.CHILDREN].values()[0]['future'].join()
+        self.assertEqual(0, self.namespace.vars['v'])
+
+    def test_wait_thread_keeps_namespace_by_default(self):
+        tt = WrapThreadTask(TaskWrite(v=1))
+        start = TaskWrite()
+        start & tt
+        start >> WaitThreadTask(tt) >> TaskRead(self.result)
+        self.start(start)
+        self.assertEqual(0, self.result['v'])
+
+    def test_merge_of_process_branch_fails(self):
+        child = scheduler.Scheduler(namespace=self.namespace.fork(),
+                                    scheduler_parent=mock.Mock(),
+                                    executor=executor.get_executor(executor.PROCESS, 1))
+        self.assertRaises(RuntimeError, child.join, True)
@@ -0,0 +1,152 @@
+# Copyright (c) 2014 Mirantis Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the License);
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an AS IS BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or
+# implied.
+# See the License for the specific language governing permissions and#
+# limitations under the License.
+
+
+import threading
+import time
+
+import mock
+
+from cloudferrylib.scheduler.executor import Future
+from cloudferrylib.scheduler.namespace import Namespace
+from tests import legacy_scheduler
+from tests import test
+
+legacy_scheduler.install()
+
+from tasks import SuperTaskMigrateInstances
+
+
+class FakeExecutor(object):
+
+    """ Runs every job in a thread, the result of its future is an exit
+    code like the one of ProcessPoolExecutor. """
+
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, func, *args, **kwargs):
+        self.submitted += 1
+        future = Future()
+
+        def run():
+            try:
+                func(*args, **kwargs)
+                future.set_result(0)
+            except Exception:
+                future.set_result(1)
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return future
+
+
+class FakeScheduler(object):
+
+    """ Runs tasks in order like the legacy Scheduler, recording each
+    pipeline it was given. """
+
+    pipelines = []
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.tasks = []
+        FakeScheduler.pipelines.append(self.tasks)
+
+    def addTask(self, task):
+        self.tasks.append(task)
+
+    def run(self):
+        for task in self.tasks:
+            self.namespace.vars.update(task.run(**self.namespace.vars))
+
+
+class FakeTask(object):
+    def __init__(self, migration, instance):
+        self.migration = migration
+        self.instance = instance
+
+    def run(self, **kwargs):
+        self.migration.enter(self.instance)
+        time.sleep(0.01)
+        self.migration.leave(self.instance)
+        if self.instance.id == 'broken':
+            raise RuntimeError()
+        return {'migrated': self.instance.id}
+
+
+def instance(id, host):
+    return mock.Mock(id=id, **{'OS-EXT-SRV-ATTR:host': host})
+
+
+class MigrateParallelTestCase(test.TestCase):
+    def setUp(self):
+        super(MigrateParallelTestCase, self).setUp()
+        self.executor = FakeExecutor()
+        mock.patch.object(SuperTaskMigrateInstances, 'get_executor',
+                          return_value=self.executor).start()
+        self.log = mock.patch.object(SuperTaskMigrateInstances, 'LOG').start()
+        mock.patch.object(SuperTaskMigrateInstances, 'Scheduler', FakeScheduler).start()
+        mock.patch.object(FakeScheduler, 'pipelines', []).start()
+        self.lock = threading.Lock()
+        self.running = {}
+        self.max_running = {}
+        self.namespaces = []
+        self.task = SuperTaskMigrateInstances.SuperTaskMigrateInstances(
+            namespace=Namespace({'config': {}}))
+        self.task.get_pipeline = lambda instance, exporter, importer: \
+            [FakeTask(self, instance)]
+        self.config = {'clouds': {'source': {}}}
+
+    def enter(self, instance):
+        host = getattr(instance, 'OS-EXT-SRV-ATTR:host')
+        with self.lock:
+            self.running[host] = self.running.get(host, 0) + 1
+            self.max_running[host] = max(self.max_running.get(host, 0),
+                                         self.running[host])
+
+    def leave(self, instance):
+        with self.lock:
+            self.running[getattr(instance, 'OS-EXT-SRV-ATTR:host')] -= 1
+
+    def migrate(self, instances, parallel):
+        run_pipeline = SuperTaskMigrateInstances.SuperTaskMigrateInstances.run_pipeline
+
+        def record(namespace, tasks):
+            self.namespaces.append(namespace)
+            run_pipeline(namespace, tasks)
+
+        with mock.patch.object(self.task, 'run_pipeline', side_effect=record):
+            self.task.migrate_parallel(self.config, parallel, instances, None, None)
+
+    def test_limit_per_compute_host(self):
+        instances = [instance('%s_%s' % (host, i), host)
+                     for i in range(4) for host in ('a', 'b')]
+
+        self.migrate(instances, {'instances': 4, 'per_compute_host': 2})
+
+        self.assertEqual(8, self.executor.submitted)
+        self.assertEqual(8, len(FakeScheduler.pipelines))
+        self.assertEqual({'a': 2, 'b': 2}, self.max_running)
+        self.assertEqual(sorted(i.id for i in instances),
+                         sorted(ns.vars['migrated'] for ns in self.namespaces))
+        self.assertNotIn('migrated', self.task.namespace.vars)
+        self.assertFalse(self.log.error.called)
+
+    def test_failed_pipeline_is_reported(self):
+        self.migrate([instance('broken', 'a'), instance('ok', 'b')],
+                     {'instances': 2, 'per_compute_host': 1})
+        self.assertEqual(1, self.log.error.call_count)
+        self.assertEqual('broken', self.log.error.call_args[0][1])
@@ -14,7 +14,6 @@
 
 import logging
 import sys
-import time
 import random
 import string
 import smtplib
@@ -26,6 +25,8 @@ from fabric.api import local, run, settings, env
 from jinja2 import Environment, FileSystemLoader
 import os
 import inspect
+from cloudferrylib.utils.utils import forward_agent, ssh_command
+from cloudferrylib.utils import utils as cf_utils
 
 
 
@@ -242,50 +243,15 @@ def log_step(log):
     return decorator
 
 
-class forward_agent:
+def up_ssh_tunnel(address_dest_compute, address_dest_controller, port=None):
 
     """
-        Forwarding ssh-key for access on to source and destination clouds via ssh
+        Up ssh tunnel on dest controller node for transferring data,
+        taken from the pool of cloudferrylib.utils.utils. Returns
+        the context manager giving the port of the tunnel.
     """
 
-    def __init__(self, key_file):
-        self.key_file = key_file
-
-    def __enter__(self):
-        info_agent = local("eval `ssh-agent` && echo $SSH_AUTH_SOCK && ssh-add %s" %
-                           (self.key_file), capture=True).split("\n")
-        self.pid = info_agent[0].split(" ")[-1]
-        self.ssh_auth_sock = info_agent[1]
-        os.environ["SSH_AGENT_PID"] = self.pid
-        os.environ["SSH_AUTH_SOCK"] = self.ssh_auth_sock
-
-    def __exit__(self, type, value, traceback):
-        local("kill -9 %s"%(self.pid))
-        del os.environ["SSH_AGENT_PID"]
-        del os.environ["SSH_AUTH_SOCK"]
-
-
-class up_ssh_tunnel:
-
-    """
-        Up ssh tunnel on dest controller node for transferring data
-    """
-
-    def __init__(self, address_dest_compute, address_dest_controller, interval_ssh="9000-9999"):
-        self.address_dest_compute = address_dest_compute
-        self.address_dest_controller = address_dest_controller
-        self.interval_ssh = interval_ssh
-        self.busy_port = []
-        self.cmd = "ssh -oStrictHostKeyChecking=no -L %s:%s:22 -R %s:localhost:%s %s -Nf"
-
-    def __enter__(self):
-        run(self.cmd % (self.ssh_port, self.address_dest_compute, self.ssh_port, self.ssh_port,
-                        self.address_dest_controller) + " && sleep 2")
-
-    def __exit__(self, type, value, traceback):
-        run(("pkill -f '"+self.cmd+"'") % (self.ssh_port, self.address_dest_compute, self.ssh_port, self.ssh_port,
-                                           self.address_dest_controller))
-        time.sleep(2)
+    return cf_utils.up_ssh_tunnel(address_dest_compute, address_dest_controller, port=port)
 
 
 class ChecksumImageInvalid(Exception):
@@ -312,7 +278,6 @@ def write_info(rendered_info, info_file = "source_info.html"):
 def get_libvirt_block_info(libvirt_name, init_host, compute_host):
     with settings(host_string=init_host):
         with forward_agent(env.key_filename):
-            out = run("ssh -oStrictHostKeyChecking=no %s 'virsh domblklist %s'" %
-                      (compute_host, libvirt_name))
+            out = run(ssh_command(compute_host, "'virsh domblklist %s'" % libvirt_name))
             libvirt_output = out.split()
     return libvirt_output